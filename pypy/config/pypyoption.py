@@ -222,6 +222,9 @@ pypy_optiondescription = OptionDescription("objspace", "Object Space Options", [
         BoolOption("withsmalllong", "use a version of 'long' in a C long long",
                    default=False),
 
+        BoolOption("withstrbuf", "use strings optimized for addition (ver 2)",
+                   default=False),
+
         BoolOption("withspecialisedtuple",
                    "use specialised tuples",
                    default=False),
@@ -230,6 +233,18 @@ pypy_optiondescription = OptionDescription("objspace", "Object Space Options", [
                    "enable optimized ways to store lists of primitives ",
                    default=True),
 
+        BoolOption("withint32list",
+                   "store lists of ints that fit in 32 bits in half the "
+                   "space on 64-bit machines",
+                   default=False,
+                   requires=[("objspace.std.withliststrategies", True)]),
+
+        BoolOption("withintpairlist",
+                   "store lists of pairs of small ints packed in one word "
+                   "per pair",
+                   default=False,
+                   requires=[("objspace.std.withliststrategies", True)]),
+
         BoolOption("withmethodcachecounter",
                    "try to cache methods and provide a counter in __pypy__. "
                    "for testing purposes only.",
@@ -244,6 +259,13 @@ pypy_optiondescription = OptionDescription("objspace", "Object Space Options", [
         BoolOption("optimized_list_getitem",
                    "special case the 'list[integer]' expressions",
                    default=False),
+        BoolOption("optimized_comparison_op",
+                   "special case the comparison of two integers in COMPARE_OP",
+                   default=False),
+        BoolOption("superinstructions",
+                   "execute COMPARE_OP+POP_JUMP_IF_xxx and LOAD_FAST+LOAD_ATTR "
+                   "as one opcode when not jitted",
+                   default=False),
         BoolOption("newshortcut",
                    "cache and shortcut calling __new__ from builtin types",
                    default=False),
@@ -42,6 +42,9 @@ def test_set_pypy_opt_level():
     conf = get_pypy_config()
     set_pypy_opt_level(conf, '2')
     assert conf.objspace.std.intshortcut
+    # not measured in JIT traces yet: must be enabled explicitly
+    assert not conf.objspace.std.superinstructions
+    assert not conf.objspace.std.optimized_comparison_op
     conf = get_pypy_config()
     set_pypy_opt_level(conf, '0')
     assert not conf.objspace.std.intshortcut
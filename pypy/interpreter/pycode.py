@@ -53,6 +53,8 @@ def cpython_code_signature(code):
 class CodeHookCache(object):
     def __init__(self, space):
         self._code_hook = None
+        # set by pypyjit.load_warm_start()
+        self._warm_start = None
 
 class PyCode(eval.Code):
     "CPython-style code objects."
@@ -106,7 +108,10 @@ class PyCode(eval.Code):
         return True
 
     def new_code_hook(self):
-        code_hook = self.space.fromcache(CodeHookCache)._code_hook
+        cache = self.space.fromcache(CodeHookCache)
+        if cache._warm_start is not None:
+            cache._warm_start.new_code(self)
+        code_hook = cache._code_hook
         if code_hook is not None:
             try:
                 self.space.call_function(code_hook, self)
@@ -270,7 +270,7 @@ class __extend__(pyframe.PyFrame):
             elif opcode == opcodedesc.CALL_METHOD.index:
                 self.CALL_METHOD(oparg, next_instr)
             elif opcode == opcodedesc.COMPARE_OP.index:
-                self.COMPARE_OP(oparg, next_instr)
+                next_instr = self.COMPARE_OP(oparg, next_instr)
             elif opcode == opcodedesc.DELETE_ATTR.index:
                 self.DELETE_ATTR(oparg, next_instr)
             elif opcode == opcodedesc.DELETE_FAST.index:
@@ -340,7 +340,7 @@ class __extend__(pyframe.PyFrame):
             elif opcode == opcodedesc.LOAD_DEREF.index:
                 self.LOAD_DEREF(oparg, next_instr)
             elif opcode == opcodedesc.LOAD_FAST.index:
-                self.LOAD_FAST(oparg, next_instr)
+                next_instr = self.LOAD_FAST(oparg, next_instr)
             elif opcode == opcodedesc.LOAD_GLOBAL.index:
                 self.LOAD_GLOBAL(oparg, next_instr)
             elif opcode == opcodedesc.LOAD_LOCALS.index:
@@ -491,6 +491,7 @@ class __extend__(pyframe.PyFrame):
         if w_value is None:
             self._load_fast_failed(varindex)
         self.pushvalue(w_value)
+        return next_instr
 
     @dont_inline
     def _load_fast_failed(self, varindex):
@@ -945,7 +946,8 @@ class __extend__(pyframe.PyFrame):
         w_obj = self.popvalue()
         if not jit.we_are_jitted():
             from pypy.objspace.std.mapdict import LOAD_ATTR_caching
-            w_value = LOAD_ATTR_caching(self.getcode(), w_obj, nameindex)
+            w_value = LOAD_ATTR_caching(self.getcode(), w_obj, nameindex,
+                                        next_instr)
         else:
             w_attributename = self.getname_w(nameindex)
             w_value = self.space.getattr(w_obj, w_attributename)
@@ -992,6 +994,7 @@ class __extend__(pyframe.PyFrame):
         else:
             raise BytecodeCorruption("bad COMPARE_OP oparg")
         self.pushvalue(w_result)
+        return next_instr
 
     def IMPORT_NAME(self, nameindex, next_instr):
         space = self.space
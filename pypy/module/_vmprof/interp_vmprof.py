@@ -51,14 +51,20 @@ def VMProfError(space, e):
     return OperationError(w_VMProfError, space.newtext(e.msg))
 
 
-@unwrap_spec(fileno=int, period=float, memory=int, lines=int, native=int, real_time=int)
-def enable(space, fileno, period, memory, lines, native, real_time):
+@unwrap_spec(fileno=int, period=float, memory=int, lines=int, native=int,
+             real_time=int, alloc_interval=int)
+def enable(space, fileno, period, memory, lines, native, real_time,
+           alloc_interval=0):
     """Enable vmprof.  Writes go to the given 'fileno', a file descriptor
     opened for writing.  *The file descriptor must remain open at least
     until disable() is called.*
 
     'interval' is a float representing the sampling interval, in seconds.
     Must be smaller than 1.0
+
+    If 'alloc_interval' is positive, profile the allocations instead: a
+    sample is taken about every 'alloc_interval' bytes allocated in the
+    nursery of the GC.
     """
     w_modules = space.sys.get('modules')
     #if space.contains_w(w_modules, space.newtext('_continuation')):
@@ -66,7 +72,8 @@ def enable(space, fileno, period, memory, lines, native, real_time):
     #                             "with vmprof will crash"),
     #               space.w_RuntimeWarning)
     try:
-        rvmprof.enable(fileno, period, memory, native, real_time)
+        rvmprof.enable(fileno, period, memory, native, real_time,
+                       alloc_interval)
     except rvmprof.VMProfError as e:
         raise VMProfError(space, e)
 
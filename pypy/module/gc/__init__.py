@@ -7,6 +7,7 @@ class Module(MixedModule):
         'enable': 'interp_gc.enable',
         'disable': 'interp_gc.disable',
         'isenabled': 'interp_gc.isenabled',
+        'freeze': 'interp_gc.freeze',
         'enable_finalizers': 'interp_gc.enable_finalizers',
         'disable_finalizers': 'interp_gc.disable_finalizers',
         'garbage': 'space.newlist([])',
@@ -32,5 +33,7 @@ class Module(MixedModule):
                 'get_typeids_z': 'referents.get_typeids_z',
                 'get_typeids_list': 'referents.get_typeids_list',
                 'GcRef': 'referents.W_GcRef',
+                'get_stats': 'hook.get_stats',
+                'set_hooks': 'hook.set_hooks',
                 })
         MixedModule.__init__(self, space, w_name)
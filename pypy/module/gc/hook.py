@@ -0,0 +1,194 @@
+"""Statistics about the GC, and hooks called after collections.
+
+The GC itself only counts the collections and their durations (see
+rgc.get_stats()).  When a hook is set, we also ask the GC to call back
+after every collection; the callback only fires an AsyncAction, and the
+app-level hooks are called from there, between two bytecodes, with the
+collections done since the last call summed up.
+"""
+
+from rpython.rlib import rgc
+from rpython.rlib.unroll import unrolling_iterable
+from rpython.rtyper.annlowlevel import llhelper
+from rpython.rtyper.lltypesystem import lltype
+from pypy.interpreter.error import OperationError
+from pypy.interpreter.executioncontext import AsyncAction
+
+STATS = unrolling_iterable([
+    ('total_memory', rgc.TOTAL_MEMORY, False),
+    ('arena_memory', rgc.ARENA_MEMORY, False),
+    ('arena_allocated', rgc.ARENA_ALLOCATED, False),
+    ('rawmalloced_memory', rgc.RAWMALLOCED_MEMORY, False),
+    ('nursery_size', rgc.NURSERY_SIZE, False),
+    ('nursery_used', rgc.NURSERY_USED, False),
+    ('pinned_objects', rgc.PINNED_OBJECTS, False),
+    ('minor_collections', rgc.MINOR_COLLECTIONS, False),
+    ('minor_collections_time', rgc.MINOR_COLLECTIONS_TIME, True),
+    ('major_steps', rgc.MAJOR_STEPS, False),
+    ('major_steps_time', rgc.MAJOR_STEPS_TIME, True),
+    ('major_collections', rgc.MAJOR_COLLECTIONS, False),
+    ('major_collections_time', rgc.MAJOR_COLLECTIONS_TIME, True),
+    ('gc_state', rgc.GC_STATE, False),
+    ])
+
+
+class GcHookAction(AsyncAction):
+    def perform(self, executioncontext, frame):
+        self.space.fromcache(GcHooks).call_hooks()
+
+
+class GcHooks(object):
+    def __init__(self, space):
+        self.space = space
+        self.w_on_gc_minor = space.w_None
+        self.w_on_gc_collect_step = space.w_None
+        self.w_on_gc_collect = space.w_None
+        self.in_recursion = False
+        self.callback_installed = False
+        self.action = GcHookAction(space)
+        self.gc_event_callback = lambda: self.action.fire()
+        self.reset_counters()
+
+    def reset_counters(self):
+        self.last_minor = rgc.get_stats(rgc.MINOR_COLLECTIONS)
+        self.last_minor_time = rgc.get_stats(rgc.MINOR_COLLECTIONS_TIME)
+        self.last_steps = rgc.get_stats(rgc.MAJOR_STEPS)
+        self.last_steps_time = rgc.get_stats(rgc.MAJOR_STEPS_TIME)
+        self.last_major = rgc.get_stats(rgc.MAJOR_COLLECTIONS)
+        self.last_major_time = rgc.get_stats(rgc.MAJOR_COLLECTIONS_TIME)
+
+    def update_callback(self):
+        space = self.space
+        needed = (not space.is_w(self.w_on_gc_minor, space.w_None) or
+                  not space.is_w(self.w_on_gc_collect_step, space.w_None) or
+                  not space.is_w(self.w_on_gc_collect, space.w_None))
+        if needed and not self.callback_installed:
+            self.reset_counters()
+            rgc.set_gc_event_callback(llhelper(rgc.GC_EVENT_CALLBACK,
+                                               self.gc_event_callback))
+            self.callback_installed = True
+        elif not needed and self.callback_installed:
+            rgc.set_gc_event_callback(
+                lltype.nullptr(rgc.GC_EVENT_CALLBACK.TO))
+            self.callback_installed = False
+
+    def call_hooks(self):
+        if self.in_recursion:
+            # a hook is running; these events will be reported together
+            # with the next ones
+            return
+        self.in_recursion = True
+        try:
+            self._call_hooks()
+        finally:
+            self.in_recursion = False
+
+    def _call_hooks(self):
+        space = self.space
+        minor = rgc.get_stats(rgc.MINOR_COLLECTIONS)
+        if minor != self.last_minor:
+            minor_time = rgc.get_stats(rgc.MINOR_COLLECTIONS_TIME)
+            count = minor - self.last_minor
+            duration = minor_time - self.last_minor_time
+            self.last_minor = minor
+            self.last_minor_time = minor_time
+            if not space.is_w(self.w_on_gc_minor, space.w_None):
+                w_stats = space.newdict()
+                self._setitem(w_stats, 'count', space.newint(count))
+                self._setitem(w_stats, 'duration', _seconds(space, duration))
+                self._setstat(w_stats, 'total_memory', rgc.TOTAL_MEMORY)
+                self._setstat(w_stats, 'pinned_objects', rgc.PINNED_OBJECTS)
+                self._call(self.w_on_gc_minor, w_stats)
+        #
+        steps = rgc.get_stats(rgc.MAJOR_STEPS)
+        if steps != self.last_steps:
+            steps_time = rgc.get_stats(rgc.MAJOR_STEPS_TIME)
+            count = steps - self.last_steps
+            duration = steps_time - self.last_steps_time
+            self.last_steps = steps
+            self.last_steps_time = steps_time
+            if not space.is_w(self.w_on_gc_collect_step, space.w_None):
+                w_stats = space.newdict()
+                self._setitem(w_stats, 'count', space.newint(count))
+                self._setitem(w_stats, 'duration', _seconds(space, duration))
+                self._setstat(w_stats, 'gc_state', rgc.GC_STATE)
+                self._call(self.w_on_gc_collect_step, w_stats)
+        #
+        major = rgc.get_stats(rgc.MAJOR_COLLECTIONS)
+        if major != self.last_major:
+            major_time = rgc.get_stats(rgc.MAJOR_COLLECTIONS_TIME)
+            count = major - self.last_major
+            duration = major_time - self.last_major_time
+            self.last_major = major
+            self.last_major_time = major_time
+            if not space.is_w(self.w_on_gc_collect, space.w_None):
+                w_stats = space.newdict()
+                self._setitem(w_stats, 'count', space.newint(count))
+                self._setitem(w_stats, 'duration', _seconds(space, duration))
+                self._setstat(w_stats, 'total_memory', rgc.TOTAL_MEMORY)
+                self._setstat(w_stats, 'arena_memory', rgc.ARENA_MEMORY)
+                self._setstat(w_stats, 'arena_allocated',
+                              rgc.ARENA_ALLOCATED)
+                self._setstat(w_stats, 'rawmalloced_memory',
+                              rgc.RAWMALLOCED_MEMORY)
+                self._call(self.w_on_gc_collect, w_stats)
+
+    def _setitem(self, w_stats, key, w_value):
+        self.space.setitem_str(w_stats, key, w_value)
+
+    def _setstat(self, w_stats, key, stat_no):
+        self._setitem(w_stats, key, self.space.newint(rgc.get_stats(stat_no)))
+
+    def _call(self, w_hook, w_stats):
+        space = self.space
+        try:
+            space.call_function(w_hook, w_stats)
+        except OperationError as e:
+            e.write_unraisable(space, "gc hook ", w_hook)
+
+
+def _seconds(space, microseconds):
+    return space.newfloat(microseconds / 1000000.0)
+
+
+def _hook_or_none(space, w_hook):
+    if w_hook is None:
+        return space.w_None
+    return w_hook
+
+
+def get_stats(space):
+    """get_stats() -> dict
+
+    Return a snapshot of the statistics of the GC: memory used in the
+    arenas, by raw-malloced objects and in the nursery (in bytes), number
+    of pinned objects, and number and total duration (in seconds) of the
+    minor collections, major collection steps and major collections so
+    far.  The durations have a resolution of one microsecond.  Values
+    that the GC doesn't provide are -1."""
+    w_stats = space.newdict()
+    for key, stat_no, is_time in STATS:
+        value = rgc.get_stats(stat_no)
+        if is_time and value >= 0:
+            w_value = _seconds(space, value)
+        else:
+            w_value = space.newint(value)
+        space.setitem_str(w_stats, key, w_value)
+    return w_stats
+
+def set_hooks(space, w_on_gc_minor=None, w_on_gc_collect_step=None,
+              w_on_gc_collect=None):
+    """set_hooks(on_gc_minor=None, on_gc_collect_step=None,
+              on_gc_collect=None)
+
+    Set the functions called after minor collections, after steps of the
+    incremental major collection, and after a major collection finished.
+    Each function receives a dict of statistics; 'count' is the number
+    of events since the previous call, and 'duration' their total
+    duration in seconds.  Hooks are not called from the collection
+    itself but at the next bytecode.  Pass None to remove a hook."""
+    hooks = space.fromcache(GcHooks)
+    hooks.w_on_gc_minor = _hook_or_none(space, w_on_gc_minor)
+    hooks.w_on_gc_collect_step = _hook_or_none(space, w_on_gc_collect_step)
+    hooks.w_on_gc_collect = _hook_or_none(space, w_on_gc_collect)
+    hooks.update_callback()
@@ -6,6 +6,12 @@ from rpython.rlib import rgc
 @unwrap_spec(generation=int)
 def collect(space, generation=0):
     "Run a full collection.  The optional argument is ignored."
+    _clear_caches(space)
+    rgc.collect()
+    _run_finalizers(space)
+    return space.newint(0)
+
+def _clear_caches(space):
     # First clear the method and the map cache.
     # See test_gc for an example of why.
     from pypy.objspace.std.typeobject import MethodCache
@@ -15,8 +21,7 @@ def collect(space, generation=0):
     cache = space.fromcache(MapAttrCache)
     cache.clear()
 
-    rgc.collect()
-
+def _run_finalizers(space):
     # if we are running in gc.disable() mode but gc.collect() is called,
     # we should still call the finalizers now.  We do this as an attempt
     # to get closer to CPython's behavior: in Py3.5 some tests
@@ -28,16 +33,14 @@ def collect(space, generation=0):
         enable_finalizers(space)
     try:
         # fetch the pending finalizers from the queue, where they are
-        # likely to have been added by rgc.collect() above, and actually
-        # run them now.  This forces them to run before this function
+        # likely to have been added by the full collection just done, and
+        # actually run them now.  This forces them to run before this function
         # returns, and also always in the enable_finalizers() mode.
         space.user_del_action._run_finalizers()
     finally:
         if temp_reenable:
             disable_finalizers(space)
 
-    return space.newint(0)
-
 def enable(space):
     """Non-recursive version.  Enable finalizers now.
     If they were already enabled, no-op.
@@ -58,6 +61,17 @@ def disable(space):
 def isenabled(space):
     return space.newbool(space.user_del_action.enabled_at_app_level)
 
+def freeze(space):
+    """Do a full collection, then make all the objects still alive
+    immortal: the next collections will not look at them any more, and
+    so will not write to their memory unless they are modified.  Call it
+    in a process that is about to fork() workers, to keep these objects
+    shared with copy-on-write.  Their finalizers will never be called.
+    """
+    _clear_caches(space)
+    rgc.freeze()     # does the full collection itself
+    _run_finalizers(space)
+
 def enable_finalizers(space):
     uda = space.user_del_action
     if uda.finalizers_lock_count == 0:
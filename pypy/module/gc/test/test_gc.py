@@ -7,6 +7,14 @@ class AppTestGC(object):
         gc.collect() # mostly a "does not crash" kind of test
         gc.collect(0) # mostly a "does not crash" kind of test
 
+    def test_freeze(self):
+        import gc
+        lst = [[i] for i in range(100)]
+        gc.freeze() # mostly a "does not crash" kind of test
+        assert lst[42] == [42]
+        gc.collect()
+        assert lst[99] == [99]
+
     def test_disable_finalizers(self):
         import gc
 
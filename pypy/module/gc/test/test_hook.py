@@ -0,0 +1,83 @@
+import py
+from rpython.rlib import rgc
+from pypy.interpreter.gateway import interp2app, unwrap_spec
+from pypy.module.gc.hook import GcHooks
+
+
+class AppTestGcHooks(object):
+
+    def setup_class(cls):
+        if cls.runappdirect:
+            py.test.skip("Can't run this test with -A")
+        space = cls.space
+        stats = {rgc.MINOR_COLLECTIONS: 0,
+                 rgc.MINOR_COLLECTIONS_TIME: 0,
+                 rgc.MAJOR_STEPS: 0,
+                 rgc.MAJOR_STEPS_TIME: 0,
+                 rgc.MAJOR_COLLECTIONS: 0,
+                 rgc.MAJOR_COLLECTIONS_TIME: 0,
+                 rgc.TOTAL_MEMORY: 1000,
+                 rgc.NURSERY_SIZE: 4096}
+        cls.orig_get_stats = (rgc.get_stats,)
+        rgc.get_stats = lambda stat_no: stats.get(stat_no, -1)
+
+        @unwrap_spec(minor=int, minor_time=int, steps=int, major=int,
+                     major_time=int)
+        def interp_fire(space, minor, minor_time, steps, major,
+                        major_time=0):
+            stats[rgc.MINOR_COLLECTIONS] += minor
+            stats[rgc.MINOR_COLLECTIONS_TIME] += minor_time
+            stats[rgc.MAJOR_STEPS] += steps
+            stats[rgc.MAJOR_COLLECTIONS] += major
+            stats[rgc.MAJOR_COLLECTIONS_TIME] += major_time
+            # what GcHookAction.perform() does
+            space.fromcache(GcHooks).call_hooks()
+
+        cls.w_fire = space.wrap(interp2app(interp_fire))
+
+    def teardown_class(cls):
+        rgc.get_stats, = cls.orig_get_stats
+
+    def test_get_stats(self):
+        import gc
+        stats = gc.get_stats()
+        assert stats['total_memory'] == 1000
+        assert stats['nursery_size'] == 4096
+        assert stats['arena_allocated'] == -1
+        assert isinstance(stats['minor_collections_time'], float)
+        assert isinstance(stats['major_collections_time'], float)
+
+    def test_hooks(self):
+        import gc
+        minor = []
+        steps = []
+        collects = []
+        gc.set_hooks(on_gc_minor=minor.append,
+                     on_gc_collect_step=steps.append,
+                     on_gc_collect=collects.append)
+        try:
+            self.fire(3, 15000, 0, 0)
+            assert minor == [{'count': 3, 'duration': 0.015,
+                              'total_memory': 1000, 'pinned_objects': -1}]
+            assert steps == collects == []
+            self.fire(1, 5, 2, 1, 250000)
+            assert minor[1]['count'] == 1
+            assert minor[1]['duration'] == 0.000005
+            assert steps == [{'count': 2, 'duration': 0.0, 'gc_state': -1}]
+            assert collects[0]['count'] == 1
+            assert collects[0]['duration'] == 0.25
+            assert collects[0]['total_memory'] == 1000
+        finally:
+            gc.set_hooks()
+        self.fire(1, 0, 0, 0)
+        assert len(minor) == 2
+
+    def test_hook_exception(self):
+        import gc
+        def on_gc_minor(stats):
+            raise ValueError
+        gc.set_hooks(on_gc_minor=on_gc_minor)
+        try:
+            self.fire(1, 0, 0, 0)     # doesn't raise
+        finally:
+            gc.set_hooks()
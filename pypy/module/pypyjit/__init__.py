@@ -17,6 +17,10 @@ class Module(MixedModule):
         'set_trace_too_long_hook': 'interp_resop.set_trace_too_long_hook',
         'get_stats_snapshot': 'interp_resop.get_stats_snapshot',
         'get_stats_asmmemmgr': 'interp_resop.get_stats_asmmemmgr',
+        'get_stats_memmgr': 'interp_resop.get_stats_memmgr',
+        'get_loop_profile': 'interp_resop.get_loop_profile',
+        'save_warm_start': 'interp_warmstart.save_warm_start',
+        'load_warm_start': 'interp_warmstart.load_warm_start',
         # those things are disabled because they have bugs, but if
         # they're found to be useful, fix test_ztranslation_jit_stats
         # in the backend first. get_stats_snapshot still produces
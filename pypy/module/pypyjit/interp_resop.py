@@ -388,6 +388,60 @@ def get_stats_asmmemmgr(space):
     m2 = jit_hooks.stats_asmmemmgr_used(None)
     return space.newtuple([space.newint(m1), space.newint(m2)])
 
+def get_stats_memmgr(space):
+    """Returns the number of loops dropped because of the 'max_code_memory'
+    budget, and the number of bytes of machine code they used, as a pair
+    (dropped_loops, dropped_bytes).  The machine code of a dropped loop is
+    freed as soon as nothing else references it."""
+    n1 = jit_hooks.stats_memmgr_dropped_loops(None)
+    n2 = jit_hooks.stats_memmgr_dropped_bytes(None)
+    return space.newtuple([space.newint(n1), space.newint(n2)])
+
+CODE_TYPES = {'l': 'loop', 'e': 'entry bridge', 'b': 'bridge'}
+
+def get_loop_profile(space):
+    """ get_loop_profile() -> list of tuples
+
+    Return the execution profile of all the loops and bridges that are
+    currently alive, as a list of tuples (type, loop_no, bridge_no,
+    location, entries, asmlen, guard_failures).  'type' is 'loop',
+    'entry bridge' or 'bridge'.  For loops, 'bridge_no' is None and
+    'entries' is the number of times the loop was entered from the
+    interpreter.  For bridges, 'location' and 'entries' are None and
+    'bridge_no' is the same as JitLoopInfo.bridge_no.  'guard_failures'
+    is a dict mapping GuardOp.hash to the number of failures of this
+    guard; guards that never failed are not listed.  Note that a guard
+    doesn't fail any more once a bridge is attached to it.  The guards
+    are only known for the code compiled while the JIT parameter
+    'profile_guards' is set; otherwise 'guard_failures' is empty.
+    """
+    ll_loops = jit_hooks.stats_get_loop_profile(None)
+    ll_guards = jit_hooks.stats_get_guard_profile(None)
+    guards_w = [space.newdict() for i in range(len(ll_loops))]
+    for i in range(len(ll_guards)):
+        space.setitem(guards_w[ll_guards[i].index],
+                      space.newint(ll_guards[i].hash),
+                      space.newint(ll_guards[i].failures))
+    result_w = []
+    for i in range(len(ll_loops)):
+        if ll_loops[i].bridge_no == 0:
+            w_bridge_no = space.w_None
+            w_location = space.newtext(hlstr(ll_loops[i].location))
+            w_entries = space.newint(ll_loops[i].entries)
+        else:
+            w_bridge_no = space.newint(ll_loops[i].bridge_no)
+            w_location = space.w_None
+            w_entries = space.w_None
+        result_w.append(space.newtuple([
+            space.newtext(CODE_TYPES[ll_loops[i].type]),
+            space.newint(ll_loops[i].number),
+            w_bridge_no,
+            w_location,
+            w_entries,
+            space.newint(ll_loops[i].asmlen),
+            guards_w[i]]))
+    return space.newlist(result_w)
+
 def enable_debug(space):
     """ Set the jit debugging - completely necessary for some stats to work,
     most notably assembler counters.
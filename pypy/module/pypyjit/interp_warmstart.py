@@ -0,0 +1,155 @@
+"""Warm start of the JIT across processes.
+
+We remember the greenkeys of all loops compiled in this process, as
+stable (filename, name, firstlineno, next_instr) keys instead of hashes,
+which depend on the identity of the code objects.  A later process can
+load these keys; whenever a matching code object is created, we tell the
+JIT to trace the corresponding loop as soon as it runs a few iterations,
+instead of waiting for the full 'threshold'.
+"""
+
+import os
+
+from rpython.rlib import jit_hooks
+from rpython.rlib.jit import dont_look_inside
+from rpython.rlib.rarithmetic import r_uint
+from rpython.rtyper.annlowlevel import (cast_base_ptr_to_instance,
+    cast_instance_to_gcref)
+from rpython.rtyper.lltypesystem import lltype
+from rpython.rtyper.rclass import OBJECT
+from pypy.interpreter.error import wrap_oserror
+from pypy.interpreter.gateway import unwrap_spec
+from pypy.interpreter.pycode import PyCode, CodeHookCache
+
+
+class WarmStart(object):
+    # upper bound on the number of keys we remember, so that programs
+    # that keep compiling new code don't grow this forever
+    MAX_KEYS = 20000
+
+    def __init__(self, space):
+        self.space = space
+        # set of lines in the file format, for the loops we know about
+        self.keys = {}
+        # (co_filename, co_name, co_firstlineno) -> list of
+        # (next_instr, is_being_profiled) loaded from a file
+        self.pending = {}
+
+    def record_loop(self, next_instr, is_being_profiled, pycode):
+        if len(self.keys) >= self.MAX_KEYS:
+            return
+        line = '%d\t%d\t%d\t%s\t%s\n' % (next_instr, is_being_profiled,
+                                         pycode.co_firstlineno,
+                                         pycode.co_name, pycode.co_filename)
+        self.keys[line] = None
+
+    def load_line(self, line):
+        parts = line.split('\t', 4)
+        if len(parts) != 5:
+            return False
+        try:
+            next_instr = int(parts[0])
+            is_being_profiled = int(parts[1])
+            firstlineno = int(parts[2])
+        except ValueError:
+            return False
+        if next_instr < 0:
+            return False
+        key = (parts[4], parts[3], firstlineno)
+        lst = self.pending.get(key, None)
+        if lst is None:
+            lst = []
+            self.pending[key] = lst
+        lst.append((next_instr, bool(is_being_profiled)))
+        if len(self.keys) < self.MAX_KEYS:
+            self.keys[line + '\n'] = None
+        return True
+
+    def new_code(self, pycode):
+        """Called for every new code object once a file was loaded."""
+        key = (pycode.co_filename, pycode.co_name, pycode.co_firstlineno)
+        lst = self.pending.get(key, None)
+        if lst is None:
+            return
+        for next_instr, is_being_profiled in lst:
+            if next_instr < len(pycode.co_code):
+                _trace_next_iteration(next_instr, is_being_profiled, pycode)
+
+
+@dont_look_inside
+def _trace_next_iteration(next_instr, is_being_profiled, pycode):
+    # the greenkey must be passed with the same types as in
+    # interp_jit.trace_next_iteration(): warmspot builds a single accessor
+    # per hook from the first call site it sees
+    ll_pycode = cast_instance_to_gcref(pycode)
+    jit_hooks.trace_next_iteration(
+        'pypyjit', r_uint(next_instr), int(is_being_profiled), ll_pycode)
+
+
+def get_warm_start(space):
+    return space.fromcache(WarmStart)
+
+def record_compiled_loop(space, debug_info):
+    """Called from the JIT hooks after a loop or entry bridge has been
+    compiled."""
+    if debug_info.get_jitdriver().name != 'pypyjit':
+        return
+    greenkey = debug_info.greenkey
+    next_instr = greenkey[0].getint()
+    is_being_profiled = greenkey[1].getint()
+    ll_code = lltype.cast_opaque_ptr(lltype.Ptr(OBJECT),
+                                     greenkey[2].getref_base())
+    pycode = cast_base_ptr_to_instance(PyCode, ll_code)
+    get_warm_start(space).record_loop(next_instr, is_being_profiled, pycode)
+
+
+@unwrap_spec(filename='fsencode')
+def save_warm_start(space, filename):
+    """ save_warm_start(filename)
+
+    Write to 'filename' the location of all the loops that were compiled
+    in this process, plus the ones previously loaded with
+    load_warm_start().
+    """
+    warmstart = get_warm_start(space)
+    data = ''.join(warmstart.keys.keys())
+    try:
+        fd = os.open(filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0666)
+        try:
+            while data:
+                count = os.write(fd, data)
+                data = data[count:]
+        finally:
+            os.close(fd)
+    except OSError as e:
+        raise wrap_oserror(space, e, filename)
+
+@unwrap_spec(filename='fsencode')
+def load_warm_start(space, filename):
+    """ load_warm_start(filename) -> number of loops loaded
+
+    Read a file written by save_warm_start().  From now on, code objects
+    created at the same locations get their loops traced after only a
+    few iterations.  This should be called early, before the modules
+    containing the hot code are imported.
+    """
+    warmstart = get_warm_start(space)
+    chunks = []
+    try:
+        fd = os.open(filename, os.O_RDONLY, 0)
+        try:
+            while True:
+                chunk = os.read(fd, 65536)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+        finally:
+            os.close(fd)
+    except OSError as e:
+        raise wrap_oserror(space, e, filename)
+    count = 0
+    for line in ''.join(chunks).split('\n'):
+        if line and warmstart.load_line(line):
+            count += 1
+    space.fromcache(CodeHookCache)._warm_start = warmstart
+    return space.newint(count)
@@ -256,3 +256,71 @@ class AppTestJitHook(object):
         assert isinstance(stats.w_counters, dict)
         assert sorted(stats.w_counters.keys()) == self.sorted_keys
 
+
+
+class AppTestLoopProfile(object):
+    spaceconfig = dict(usemodules=('pypyjit',))
+
+    def setup_class(cls):
+        if cls.runappdirect:
+            py.test.skip("Can't run this test with -A")
+        # run a loop with the llgraph backend, and make the jit_hooks
+        # used by pypyjit.get_loop_profile() read its loop profile
+        from rpython.jit.metainterp import pyjitpl
+        from rpython.jit.metainterp.test.support import LLJitMixin
+        from rpython.rlib import jit_hooks
+        from rpython.rlib.jit import JitDriver, set_param
+
+        driver = JitDriver(greens = [], reds = ['i', 's'])
+
+        def loop(i):
+            s = 0
+            while i > 0:
+                driver.jit_merge_point(i=i, s=s)
+                if i % 2:
+                    s += 1
+                i -= 1
+                s += 2
+            return s
+
+        def main():
+            set_param(driver, 'profile_guards', 1)
+            return loop(30)
+
+        LLJitMixin().meta_interp(main, [])
+        warmrunnerdesc = pyjitpl._warmrunnerdesc
+        get_loop_profile = jit_hooks.stats_get_loop_profile
+        get_guard_profile = jit_hooks.stats_get_guard_profile
+        cls.orig_hooks = (get_loop_profile, get_guard_profile)
+        jit_hooks.stats_get_loop_profile = (
+            lambda _: get_loop_profile(warmrunnerdesc))
+        jit_hooks.stats_get_guard_profile = (
+            lambda _: get_guard_profile(warmrunnerdesc))
+
+    def teardown_class(cls):
+        from rpython.rlib import jit_hooks
+        (jit_hooks.stats_get_loop_profile,
+         jit_hooks.stats_get_guard_profile) = cls.orig_hooks
+
+    def test_get_loop_profile(self):
+        import pypyjit
+        profile = pypyjit.get_loop_profile()
+        assert len(profile) == 2
+        loop, bridge = profile
+        type, loop_no, bridge_no, location, entries, asmlen, guards = loop
+        assert type == 'loop'
+        assert bridge_no is None
+        assert isinstance(location, str)
+        assert entries == 4
+        # the guard that got the bridge, and the guard exiting the loop
+        assert len(guards) == 2
+        assert sum(guards.values()) == 3
+        type, bridge_loop_no, bridge_no, location, entries, asmlen, guards = (
+            bridge)
+        assert type == 'bridge'
+        assert bridge_loop_no == loop_no
+        assert bridge_no is not None
+        assert location is None
+        assert entries is None
+        # the guard exiting the loop from the bridge
+        assert guards.values() == [1]
@@ -0,0 +1,104 @@
+import py
+from pypy.interpreter.gateway import interp2app
+from pypy.interpreter.pycode import CodeHookCache, PyCode
+from pypy.module.pypyjit import interp_warmstart
+from rpython.rtyper.annlowlevel import cast_gcref_to_instance
+from rpython.rtyper.lltypesystem import lltype, llmemory
+from rpython.rtyper.test.test_llinterp import gengraph
+from rpython.tool.udir import udir
+
+
+def test_new_code_rtypes_like_interp_jit():
+    # the greenkey passed to jit_hooks.trace_next_iteration() must have
+    # the same low-level types as in interp_jit.trace_next_iteration()
+    class FakeCode(object):
+        def __init__(self, co_name, co_code):
+            self.co_filename = 'x.py'
+            self.co_name = co_name
+            self.co_firstlineno = 1
+            self.co_code = co_code
+    codes = [FakeCode('f', 'abcdefgh'), FakeCode('g', 'abc')]
+    warmstart = interp_warmstart.WarmStart(None)
+    warmstart.load_line('4\t1\t1\tf\tx.py')
+
+    def f(n):
+        warmstart.new_code(codes[n])
+
+    t, typer, graph = gengraph(f, [int])
+    markers = [op for graph in t.graphs for block in graph.iterblocks()
+                  for op in block.operations if op.opname == 'jit_marker']
+    assert len(markers) == 1
+    op = markers[0]
+    assert op.args[0].value == 'trace_next_iteration'
+    assert op.args[1].value == 'pypyjit'
+    assert [v.concretetype for v in op.args[2:]] == [
+        lltype.Unsigned, lltype.Signed, llmemory.GCREF]
+
+
+class AppTestWarmStart(object):
+    spaceconfig = dict(usemodules=('pypyjit',))
+
+    def setup_class(cls):
+        if cls.runappdirect:
+            py.test.skip("Can't run this test with -A")
+        space = cls.space
+        traced = []
+
+        class FakeJitHooks(object):
+            @staticmethod
+            def trace_next_iteration(name, next_instr, is_being_profiled,
+                                     pycode):
+                assert name == 'pypyjit'
+                pycode = cast_gcref_to_instance(PyCode, pycode)
+                traced.append((pycode.co_name, int(next_instr),
+                               bool(is_being_profiled)))
+
+        def interp_record(w_code, w_next_instr):
+            warmstart = interp_warmstart.get_warm_start(space)
+            warmstart.record_loop(space.int_w(w_next_instr), 0, w_code)
+
+        def interp_get_traced():
+            res = space.wrap(traced[:])
+            del traced[:]
+            return res
+
+        cls._orig_jit_hooks = interp_warmstart.jit_hooks
+        interp_warmstart.jit_hooks = FakeJitHooks
+        cls.w_record = space.wrap(interp2app(interp_record))
+        cls.w_get_traced = space.wrap(interp2app(interp_get_traced))
+        cls.w_tmpfile = space.wrap(str(udir.join('test_warmstart')))
+
+    def teardown_class(cls):
+        interp_warmstart.jit_hooks = cls._orig_jit_hooks
+        cls.space.fromcache(CodeHookCache)._warm_start = None
+
+    def test_save_and_load(self):
+        import pypyjit
+        src = "def hotfunc():\n    for i in range(10):\n        pass\n"
+        d = {}
+        exec compile(src, 'warmstart_mod.py', 'exec') in d
+        self.record(d['hotfunc'].func_code, 12)
+        pypyjit.save_warm_start(self.tmpfile)
+        with open(self.tmpfile) as f:
+            lines = f.readlines()
+        assert '12\t0\t1\thotfunc\twarmstart_mod.py\n' in lines
+        #
+        n = pypyjit.load_warm_start(self.tmpfile)
+        assert n == len(lines)
+        self.get_traced()
+        d = {}
+        exec compile(src, 'warmstart_mod.py', 'exec') in d
+        assert self.get_traced() == [('hotfunc', 12, False)]
+        # a different file doesn't match
+        exec compile(src, 'other_mod.py', 'exec') in d
+        assert self.get_traced() == []
+
+    def test_load_ignores_garbage(self):
+        import pypyjit
+        with open(self.tmpfile, 'w') as f:
+            f.write('garbage\n5\tx\t1\tf\tg.py\n-3\t0\t1\tf\tg.py\n')
+        assert pypyjit.load_warm_start(self.tmpfile) == 0
+
+    def test_missing_file(self):
+        import pypyjit
+        raises(OSError, pypyjit.load_warm_start, self.tmpfile + '.missing')
@@ -499,7 +499,7 @@ class W_BytesObject(W_AbstractBytesObject):
     @staticmethod
     def _use_rstr_ops(space, w_other):
         from pypy.objspace.std.unicodeobject import W_UnicodeObject
-        return (isinstance(w_other, W_BytesObject) or
+        return (isinstance(w_other, W_AbstractBytesObject) or
                 isinstance(w_other, W_UnicodeObject))
 
     @staticmethod
@@ -612,34 +612,34 @@ class W_BytesObject(W_AbstractBytesObject):
         return mod_format(space, w_values, self, do_unicode=False)
 
     def descr_eq(self, space, w_other):
-        if not isinstance(w_other, W_BytesObject):
+        if not isinstance(w_other, W_AbstractBytesObject):
             return space.w_NotImplemented
-        return space.newbool(self._value == w_other._value)
+        return space.newbool(self._value == space.bytes_w(w_other))
 
     def descr_ne(self, space, w_other):
-        if not isinstance(w_other, W_BytesObject):
+        if not isinstance(w_other, W_AbstractBytesObject):
             return space.w_NotImplemented
-        return space.newbool(self._value != w_other._value)
+        return space.newbool(self._value != space.bytes_w(w_other))
 
     def descr_lt(self, space, w_other):
-        if not isinstance(w_other, W_BytesObject):
+        if not isinstance(w_other, W_AbstractBytesObject):
             return space.w_NotImplemented
-        return space.newbool(self._value < w_other._value)
+        return space.newbool(self._value < space.bytes_w(w_other))
 
     def descr_le(self, space, w_other):
-        if not isinstance(w_other, W_BytesObject):
+        if not isinstance(w_other, W_AbstractBytesObject):
             return space.w_NotImplemented
-        return space.newbool(self._value <= w_other._value)
+        return space.newbool(self._value <= space.bytes_w(w_other))
 
     def descr_gt(self, space, w_other):
-        if not isinstance(w_other, W_BytesObject):
+        if not isinstance(w_other, W_AbstractBytesObject):
             return space.w_NotImplemented
-        return space.newbool(self._value > w_other._value)
+        return space.newbool(self._value > space.bytes_w(w_other))
 
     def descr_ge(self, space, w_other):
-        if not isinstance(w_other, W_BytesObject):
+        if not isinstance(w_other, W_AbstractBytesObject):
             return space.w_NotImplemented
-        return space.newbool(self._value >= w_other._value)
+        return space.newbool(self._value >= space.bytes_w(w_other))
 
     # auto-conversion fun
 
@@ -654,6 +654,18 @@ class W_BytesObject(W_AbstractBytesObject):
             from .bytearrayobject import W_BytearrayObject, _make_data
             self_as_bytearray = W_BytearrayObject(_make_data(self._value))
             return space.add(self_as_bytearray, w_other)
+        elif space.config.objspace.std.withstrbuf:
+            from pypy.objspace.std.strbufobject import W_StringBufferObject
+            try:
+                other = self._op_val(space, w_other)
+            except OperationError as e:
+                if e.match(space, space.w_TypeError):
+                    return space.w_NotImplemented
+                raise
+            builder = StringBuilder()
+            builder.append(self._value)
+            builder.append(other)
+            return W_StringBufferObject(builder)
         return self._StringMethods_descr_add(space, w_other)
 
     _StringMethods__startswith = _startswith
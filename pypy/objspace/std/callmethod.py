@@ -22,7 +22,7 @@ from pypy.objspace.std.mapdict import LOOKUP_METHOD_mapdict, \
 # See pypy.objspace.std.objspace for where these functions are used from.
 
 
-def LOOKUP_METHOD(f, nameindex, *ignored):
+def LOOKUP_METHOD(f, nameindex, next_instr):
     from pypy.objspace.std.typeobject import MutableCell
     #   stack before                 after
     #  --------------    --fast-method----fallback-case------------
@@ -36,7 +36,7 @@ def LOOKUP_METHOD(f, nameindex, *ignored):
 
     if not jit.we_are_jitted():
         # mapdict has an extra-fast version of this function
-        if LOOKUP_METHOD_mapdict(f, nameindex, w_obj):
+        if LOOKUP_METHOD_mapdict(f, nameindex, next_instr, w_obj):
             return
 
     w_name = f.getname_w(nameindex)
@@ -74,8 +74,8 @@ def LOOKUP_METHOD(f, nameindex, *ignored):
                     if not jit.we_are_jitted():
                         # let mapdict cache stuff
                         LOOKUP_METHOD_mapdict_fill_cache_method(
-                            space, f.getcode(), name, nameindex, w_obj, w_type,
-                            w_descr_cell)
+                            space, f.getcode(), name, nameindex, next_instr,
+                            w_obj, w_type, w_descr_cell)
                     return
     if w_value is None:
         w_value = space.getattr(w_obj, w_name)
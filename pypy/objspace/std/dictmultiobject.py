@@ -2,7 +2,9 @@
 
 from rpython.rlib import jit, rerased, objectmodel
 from rpython.rlib.debug import mark_dict_non_null
-from rpython.rlib.objectmodel import newlist_hint, r_dict, specialize
+from rpython.rlib.longlong2float import float2longlong
+from rpython.rlib.objectmodel import (
+    compute_hash, newlist_hint, r_dict, specialize)
 from rpython.tool.sourcetools import func_renamer, func_with_new_name
 
 from pypy.interpreter.baseobjspace import W_Root
@@ -442,6 +444,7 @@ def _add_indirections():
                     length w_keys values items \
                     iterkeys itervalues iteritems \
                     listview_bytes listview_unicode listview_int \
+                    listview_float \
                     view_as_kwargs".split()
 
     def make_method(method):
@@ -599,6 +602,9 @@ class DictStrategy(object):
     def listview_int(self, w_dict):
         return None
 
+    def listview_float(self, w_dict):
+        return None
+
     def view_as_kwargs(self, w_dict):
         return (None, None)
 
@@ -646,9 +652,11 @@ class EmptyDictStrategy(DictStrategy):
         w_type = self.space.type(w_key)
         if self.space.is_w(w_type, self.space.w_int):
             self.switch_to_int_strategy(w_dict)
+        elif self.space.is_w(w_type, self.space.w_float):
+            self.switch_to_float_strategy(w_dict)
         elif w_type.compares_by_identity():
             self.switch_to_identity_strategy(w_dict)
-        else:
+        elif not self.switch_to_tuple_strategy(w_dict, w_key):
             self.switch_to_object_strategy(w_dict)
 
     def switch_to_bytes_strategy(self, w_dict):
@@ -669,6 +677,25 @@ class EmptyDictStrategy(DictStrategy):
         w_dict.set_strategy(strategy)
         w_dict.dstorage = storage
 
+    def switch_to_float_strategy(self, w_dict):
+        strategy = self.space.fromcache(FloatDictStrategy)
+        storage = strategy.get_empty_storage()
+        w_dict.set_strategy(strategy)
+        w_dict.dstorage = storage
+
+    def switch_to_tuple_strategy(self, w_dict, w_key):
+        # returns False if 'w_key' is not a tuple with a strategy
+        if not self.space.config.objspace.std.withspecialisedtuple:
+            return False
+        from pypy.objspace.std.tupledict import get_tuple_dict_strategy
+        strategy = get_tuple_dict_strategy(self.space, w_key)
+        if strategy is None:
+            return False
+        storage = strategy.get_empty_storage()
+        w_dict.set_strategy(strategy)
+        w_dict.dstorage = storage
+        return True
+
     def switch_to_identity_strategy(self, w_dict):
         from pypy.objspace.std.identitydict import IdentityDictStrategy
         strategy = self.space.fromcache(IdentityDictStrategy)
@@ -1301,6 +1328,52 @@ class IntDictStrategy(AbstractTypedStrategy, DictStrategy):
 create_iterator_classes(IntDictStrategy)
 
 
+def _float_key_eq(x, y):
+    # like space.eq_w() on two floats: the same NaN is equal to itself,
+    # because floats with the same bits are the same object for 'is'
+    return x == y or float2longlong(x) == float2longlong(y)
+
+def _float_key_hash(x):
+    return compute_hash(x)
+
+class FloatDictStrategy(AbstractTypedStrategy, DictStrategy):
+    erase, unerase = rerased.new_erasing_pair("float")
+    erase = staticmethod(erase)
+    unerase = staticmethod(unerase)
+
+    def wrap(self, unwrapped):
+        return self.space.newfloat(unwrapped)
+
+    def unwrap(self, wrapped):
+        return self.space.float_w(wrapped)
+
+    def get_empty_storage(self):
+        return self.erase(r_dict(_float_key_eq, _float_key_hash))
+
+    def is_correct_type(self, w_obj):
+        space = self.space
+        return space.is_w(space.type(w_obj), space.w_float)
+
+    def _never_equal_to(self, w_lookup_type):
+        space = self.space
+        # ints can be equal to floats, so they are not listed here
+        return (space.is_w(w_lookup_type, space.w_NoneType) or
+                space.is_w(w_lookup_type, space.w_bytes) or
+                space.is_w(w_lookup_type, space.w_unicode)
+                )
+
+    def listview_float(self, w_dict):
+        return self.unerase(w_dict.dstorage).keys()
+
+    def wrapkey(space, key):
+        return space.newfloat(key)
+
+    def w_keys(self, w_dict):
+        return self.space.newlist_float(self.listview_float(w_dict))
+
+create_iterator_classes(FloatDictStrategy)
+
+
 def update1(space, w_dict, w_data):
     if isinstance(w_data, W_DictMultiObject):    # optimization case only
         update1_dict_dict(space, w_dict, w_data)
@@ -2,10 +2,13 @@
 
 import operator
 
-from rpython.rlib.rarithmetic import ovfcheck
+from rpython.rlib import jit
+from rpython.rlib.objectmodel import always_inline
+from rpython.rlib.rarithmetic import intmask, ovfcheck
 from rpython.tool.sourcetools import func_renamer
 
 from pypy.interpreter.pyframe import PyFrame
+from pypy.tool.stdlib_opcode import opcodedesc
 from pypy.interpreter.error import oefmt
 from pypy.objspace.std.intobject import W_IntObject
 from pypy.objspace.std.listobject import W_ListObject
@@ -74,6 +77,96 @@ def list_BINARY_SUBSCR(self, oparg, next_instr):
     self.pushvalue(w_result)
 
 
+@always_inline
+def _int_compare(testnum, x, y):
+    if testnum == 0:
+        return x < y
+    elif testnum == 1:
+        return x <= y
+    elif testnum == 2:
+        return x == y
+    elif testnum == 3:
+        return x != y
+    elif testnum == 4:
+        return x > y
+    else:
+        return x >= y
+
+def int_COMPARE_OP(self, testnum, next_instr):
+    w_2 = self.peekvalue(0)
+    w_1 = self.peekvalue(1)
+    if (testnum <= 5 and type(w_1) is W_IntObject and
+            type(w_2) is W_IntObject):
+        self.dropvalues(2)
+        self.pushvalue(self.space.newbool(
+            _int_compare(testnum, w_1.intval, w_2.intval)))
+        return next_instr
+    return PyFrame.COMPARE_OP(self, testnum, next_instr)
+
+
+# Superinstructions: when not jitted, some opcodes look at the opcode that
+# follows them and execute it directly, without going through the
+# dispatch loop again.  The bytecode itself is never changed, as co_code is
+# visible from app-level and considered immutable by the JIT.  This is not
+# done while a trace function is set on the frame, because it would miss
+# the events of the second opcode.
+
+def _next_opcode_to_fuse(self, next_instr):
+    """Return the opcode at 'next_instr' if it can be executed together with
+    the current one, or -1."""
+    if jit.we_are_jitted() or self.get_w_f_trace() is not None:
+        return -1
+    co_code = self.pycode.co_code
+    if intmask(next_instr) + 2 >= len(co_code):
+        return -1
+    return ord(co_code[next_instr])
+
+def _fused_oparg(self, next_instr):
+    co_code = self.pycode.co_code
+    lo = ord(co_code[next_instr + 1])
+    hi = ord(co_code[next_instr + 2])
+    return (hi * 256) | lo
+
+def make_fused_COMPARE_OP(compare_op):
+    """COMPARE_OP followed by POP_JUMP_IF_FALSE or POP_JUMP_IF_TRUE.
+    'compare_op' is the implementation of COMPARE_OP alone."""
+    def fused_COMPARE_OP(self, testnum, next_instr):
+        opcode = _next_opcode_to_fuse(self, next_instr)
+        if opcode == opcodedesc.POP_JUMP_IF_FALSE.index:
+            jump_if_true = False
+        elif opcode == opcodedesc.POP_JUMP_IF_TRUE.index:
+            jump_if_true = True
+        else:
+            return compare_op(self, testnum, next_instr)
+        target = _fused_oparg(self, next_instr)
+        w_2 = self.peekvalue(0)
+        w_1 = self.peekvalue(1)
+        if (testnum <= 5 and type(w_1) is W_IntObject and
+                type(w_2) is W_IntObject):
+            # no need to make a bool object
+            self.dropvalues(2)
+            if _int_compare(testnum, w_1.intval, w_2.intval) == jump_if_true:
+                return target
+            return next_instr + 3
+        compare_op(self, testnum, next_instr)
+        self.last_instr = intmask(next_instr)
+        if jump_if_true:
+            return self.POP_JUMP_IF_TRUE(target, next_instr + 3)
+        else:
+            return self.POP_JUMP_IF_FALSE(target, next_instr + 3)
+    return fused_COMPARE_OP
+
+def fused_LOAD_FAST(self, varindex, next_instr):
+    """LOAD_FAST followed by LOAD_ATTR."""
+    PyFrame.LOAD_FAST(self, varindex, next_instr)
+    if _next_opcode_to_fuse(self, next_instr) == opcodedesc.LOAD_ATTR.index:
+        nameindex = _fused_oparg(self, next_instr)
+        self.last_instr = intmask(next_instr)
+        next_instr += 3
+        self.LOAD_ATTR(nameindex, next_instr)
+    return next_instr
+
+
 def build_frame(space):
     """Consider the objspace config and return a patched frame object."""
     class StdObjSpaceFrame(BaseFrame):
@@ -85,6 +178,12 @@ def build_frame(space):
         StdObjSpaceFrame.INPLACE_SUBTRACT = int_INPLACE_SUBTRACT
     if space.config.objspace.std.optimized_list_getitem:
         StdObjSpaceFrame.BINARY_SUBSCR = list_BINARY_SUBSCR
+    if space.config.objspace.std.optimized_comparison_op:
+        StdObjSpaceFrame.COMPARE_OP = int_COMPARE_OP
+    if space.config.objspace.std.superinstructions:
+        StdObjSpaceFrame.COMPARE_OP = make_fused_COMPARE_OP(
+            StdObjSpaceFrame.COMPARE_OP.im_func)
+        StdObjSpaceFrame.LOAD_FAST = fused_LOAD_FAST
     from pypy.objspace.std.callmethod import LOOKUP_METHOD, CALL_METHOD
     StdObjSpaceFrame.LOOKUP_METHOD = LOOKUP_METHOD
     StdObjSpaceFrame.CALL_METHOD = CALL_METHOD
@@ -14,6 +14,7 @@ from rpython.rlib import debug, jit, rerased
 from rpython.rlib.listsort import make_timsort_class
 from rpython.rlib.objectmodel import (
     import_from_mixin, instantiate, newlist_hint, resizelist_hint, specialize)
+from rpython.rlib.rarithmetic import intmask, r_int32, r_longlong, widen
 from rpython.rlib import longlong2float
 from rpython.tool.sourcetools import func_with_new_name
 
@@ -24,13 +25,13 @@ from pypy.interpreter.gateway import (
 from pypy.interpreter.signature import Signature
 from pypy.interpreter.typedef import TypeDef
 from pypy.interpreter.miscutils import StringSort
-from pypy.objspace.std.bytesobject import W_BytesObject
 from pypy.objspace.std.floatobject import W_FloatObject
 from pypy.objspace.std.intobject import W_IntObject
 from pypy.objspace.std.iterobject import (
     W_FastListIterObject, W_ReverseSeqIterObject)
 from pypy.objspace.std.sliceobject import (
     W_SliceObject, normalize_simple_slice, unwrap_start_stop)
+from pypy.objspace.std.strbufobject import is_exact_bytes
 from pypy.objspace.std.tupleobject import W_AbstractTupleObject
 from pypy.objspace.std.unicodeobject import W_UnicodeObject
 from pypy.objspace.std.util import get_positive_index, negate
@@ -85,12 +86,18 @@ def get_strategy_from_list_objects(space, list_w, sizehint):
                 check_int_or_float = (type(w_obj) is W_FloatObject)
                 break
         else:
+            if space.config.objspace.std.withint32list:
+                for w_obj in list_w:
+                    if not longlong2float.can_encode_int32(w_obj.int_w(space)):
+                        break
+                else:
+                    return space.fromcache(Int32ListStrategy)
             return space.fromcache(IntegerListStrategy)
 
-    elif type(w_firstobj) is W_BytesObject:
+    elif is_exact_bytes(w_firstobj):
         # check for all-strings
         for i in range(1, len(list_w)):
-            if type(list_w[i]) is not W_BytesObject:
+            if not is_exact_bytes(list_w[i]):
                 break
         else:
             return space.fromcache(BytesListStrategy)
@@ -103,6 +110,16 @@ def get_strategy_from_list_objects(space, list_w, sizehint):
         else:
             return space.fromcache(UnicodeListStrategy)
 
+    elif (isinstance(w_firstobj, W_AbstractTupleObject) and
+              space.config.objspace.std.withintpairlist):
+        # check for all-pairs-of-small-ints
+        strategy = space.fromcache(IntPairListStrategy)
+        for w_obj in list_w:
+            if not strategy.is_correct_type(w_obj):
+                break
+        else:
+            return strategy
+
     elif type(w_firstobj) is W_FloatObject:
         # check for all-floats
         for i in range(1, len(list_w)):
@@ -950,13 +967,21 @@ class EmptyListStrategy(ListStrategy):
 
     def switch_to_correct_strategy(self, w_list, w_item):
         if type(w_item) is W_IntObject:
-            strategy = self.space.fromcache(IntegerListStrategy)
-        elif type(w_item) is W_BytesObject:
+            if (self.space.config.objspace.std.withint32list and
+                    longlong2float.can_encode_int32(w_item.int_w(self.space))):
+                strategy = self.space.fromcache(Int32ListStrategy)
+            else:
+                strategy = self.space.fromcache(IntegerListStrategy)
+        elif is_exact_bytes(w_item):
             strategy = self.space.fromcache(BytesListStrategy)
         elif type(w_item) is W_UnicodeObject:
             strategy = self.space.fromcache(UnicodeListStrategy)
         elif type(w_item) is W_FloatObject:
             strategy = self.space.fromcache(FloatListStrategy)
+        elif (isinstance(w_item, W_AbstractTupleObject) and
+              self.space.config.objspace.std.withintpairlist and
+              self.space.fromcache(IntPairListStrategy).is_correct_type(w_item)):
+            strategy = self.space.fromcache(IntPairListStrategy)
         else:
             strategy = self.space.fromcache(ObjectListStrategy)
 
@@ -1009,6 +1034,8 @@ class EmptyListStrategy(ListStrategy):
         if intlist is not None:
             w_list.strategy = strategy = space.fromcache(IntegerListStrategy)
             w_list.lstorage = strategy.erase(intlist)
+            if space.config.objspace.std.withint32list:
+                strategy.switch_to_int32_strategy(w_list)
             return
 
         floatlist = space.unpackiterable_float(w_iterable)
@@ -1678,7 +1705,8 @@ class IntegerListStrategy(ListStrategy):
     _base_extend_from_list = _extend_from_list
 
     def _extend_from_list(self, w_list, w_other):
-        if isinstance(w_other.strategy, BaseRangeListStrategy):
+        if (isinstance(w_other.strategy, BaseRangeListStrategy) or
+            w_other.strategy is self.space.fromcache(Int32ListStrategy)):
             l = self.unerase(w_list.lstorage)
             other = w_other.getitems_int()
             assert other is not None
@@ -1695,7 +1723,8 @@ class IntegerListStrategy(ListStrategy):
     _base_setslice = setslice
 
     def setslice(self, w_list, start, step, slicelength, w_other):
-        if w_other.strategy is self.space.fromcache(RangeListStrategy):
+        if (w_other.strategy is self.space.fromcache(RangeListStrategy) or
+            w_other.strategy is self.space.fromcache(Int32ListStrategy)):
             storage = self.erase(w_other.getitems_int())
             w_other = W_ListObject.from_storage_and_strategy(
                     self.space, storage, self)
@@ -1717,6 +1746,16 @@ class IntegerListStrategy(ListStrategy):
         return [longlong2float.encode_int32_into_longlong_nan(intval)
                 for intval in l]
 
+    def switch_to_int32_strategy(self, w_list):
+        l = self.unerase(w_list.lstorage)
+        for intval in l:
+            if not longlong2float.can_encode_int32(intval):
+                return False
+        strategy = self.space.fromcache(Int32ListStrategy)
+        w_list.strategy = strategy
+        w_list.lstorage = strategy.erase([r_int32(intval) for intval in l])
+        return True
+
     def switch_to_int_or_float_strategy(self, w_list):
         try:
             generalized_list = self.int_2_float_or_int(w_list)
@@ -1739,6 +1778,93 @@ class IntegerListStrategy(ListStrategy):
         w_list.switch_to_object_strategy()
 
 
+class Int32ListStrategy(ListStrategy):
+    """Like IntegerListStrategy, for ints that all fit in 32 bits, stored
+    in half the space on 64-bit machines.  Only used with 'withint32list'.
+    Switches to IntegerListStrategy when a larger int is stored."""
+    import_from_mixin(AbstractUnwrappedStrategy)
+
+    _none_value = r_int32(0)
+
+    def wrap(self, int32val):
+        return self.space.newint(widen(int32val))
+
+    def unwrap(self, w_int):
+        return r_int32(self.space.int_w(w_int))
+
+    erase, unerase = rerased.new_erasing_pair("int32")
+    erase = staticmethod(erase)
+    unerase = staticmethod(unerase)
+
+    def is_correct_type(self, w_obj):
+        if type(w_obj) is W_IntObject:
+            intval = self.space.int_w(w_obj)
+            return longlong2float.can_encode_int32(intval)
+        return False
+
+    def list_is_correct_type(self, w_list):
+        return w_list.strategy is self.space.fromcache(Int32ListStrategy)
+
+    def sort(self, w_list, reverse):
+        l = self.unerase(w_list.lstorage)
+        sorter = Int32Sort(l, len(l))
+        sorter.sort()
+        if reverse:
+            l.reverse()
+
+    def getitems_int(self, w_list):
+        return [widen(int32val) for int32val in self.unerase(w_list.lstorage)]
+
+    def _safe_find(self, w_list, obj, start, stop):
+        l = self.unerase(w_list.lstorage)
+        intval = widen(obj)
+        for i in range(start, min(stop, len(l))):
+            if widen(l[i]) == intval:
+                return i
+        raise ValueError
+
+    def switch_to_integer_strategy(self, w_list):
+        items = self.getitems_int(w_list)
+        strategy = self.space.fromcache(IntegerListStrategy)
+        w_list.strategy = strategy
+        w_list.lstorage = strategy.erase(items)
+
+    def switch_to_next_strategy(self, w_list, w_sample_item):
+        self.switch_to_integer_strategy(w_list)
+        if type(w_sample_item) is not W_IntObject:
+            strategy = self.space.fromcache(IntegerListStrategy)
+            strategy.switch_to_next_strategy(w_list, w_sample_item)
+
+    _base_extend_from_list = _extend_from_list
+
+    def _extend_from_list(self, w_list, w_other):
+        if (w_other.strategy is self.space.fromcache(IntegerListStrategy) or
+            isinstance(w_other.strategy, BaseRangeListStrategy)):
+            other = w_other.getitems_int()
+            assert other is not None
+            for intval in other:
+                if not longlong2float.can_encode_int32(intval):
+                    break
+            else:
+                l = self.unerase(w_list.lstorage)
+                l += [r_int32(intval) for intval in other]
+                return
+        if (self.list_is_correct_type(w_other) or
+                w_other.strategy.is_empty_strategy()):
+            return self._base_extend_from_list(w_list, w_other)
+        self.switch_to_integer_strategy(w_list)
+        w_list.extend(w_other)
+
+    _base_setslice = setslice
+
+    def setslice(self, w_list, start, step, slicelength, w_other):
+        if (self.list_is_correct_type(w_other) or w_other.length() == 0):
+            return self._base_setslice(w_list, start, step, slicelength,
+                                       w_other)
+        self.switch_to_integer_strategy(w_list)
+        w_list.setslice(start, step, slicelength, w_other)
+
+
 class FloatListStrategy(ListStrategy):
     import_from_mixin(AbstractUnwrappedStrategy)
 
@@ -1958,6 +2084,66 @@ class IntOrFloatListStrategy(ListStrategy):
         raise ValueError
 
 
+_INT32_BIAS = r_longlong(0x80000000)
+_INT32_MASK = r_longlong(0xffffffff)
+
+def _pack_int_pair(intval0, intval1):
+    # the packed values sort in the same order as the tuples
+    return (r_longlong(intval0) << 32) + (r_longlong(intval1) + _INT32_BIAS)
+
+def _unpack_int_pair_0(llval):
+    return intmask(llval >> 32)
+
+def _unpack_int_pair_1(llval):
+    return intmask((llval & _INT32_MASK) - _INT32_BIAS)
+
+
+class IntPairListStrategy(ListStrategy):
+    """Lists of tuples of two ints that both fit in 32 bits, stored as
+    one longlong per tuple.  The tuples are created again when the items
+    are read, so this is only used with 'withintpairlist'."""
+    import_from_mixin(AbstractUnwrappedStrategy)
+
+    _none_value = r_longlong(0)
+
+    def wrap(self, llval):
+        space = self.space
+        return space.newtuple([space.newint(_unpack_int_pair_0(llval)),
+                               space.newint(_unpack_int_pair_1(llval))])
+
+    def unwrap(self, w_tuple):
+        space = self.space
+        assert isinstance(w_tuple, W_AbstractTupleObject)
+        return _pack_int_pair(space.int_w(w_tuple.getitem(space, 0)),
+                              space.int_w(w_tuple.getitem(space, 1)))
+
+    erase, unerase = rerased.new_erasing_pair("intpair")
+    erase = staticmethod(erase)
+    unerase = staticmethod(unerase)
+
+    def is_correct_type(self, w_obj):
+        if (not isinstance(w_obj, W_AbstractTupleObject) or
+                w_obj.user_overridden_class or w_obj.length() != 2):
+            return False
+        space = self.space
+        w_item0 = w_obj.getitem(space, 0)
+        w_item1 = w_obj.getitem(space, 1)
+        return (type(w_item0) is W_IntObject and
+                type(w_item1) is W_IntObject and
+                longlong2float.can_encode_int32(space.int_w(w_item0)) and
+                longlong2float.can_encode_int32(space.int_w(w_item1)))
+
+    def list_is_correct_type(self, w_list):
+        return w_list.strategy is self.space.fromcache(IntPairListStrategy)
+
+    def sort(self, w_list, reverse):
+        l = self.unerase(w_list.lstorage)
+        sorter = IntPairSort(l, len(l))
+        sorter.sort()
+        if reverse:
+            l.reverse()
+
+
 class BytesListStrategy(ListStrategy):
     import_from_mixin(AbstractUnwrappedStrategy)
 
@@ -1974,7 +2160,7 @@ class BytesListStrategy(ListStrategy):
     unerase = staticmethod(unerase)
 
     def is_correct_type(self, w_obj):
-        return type(w_obj) is W_BytesObject
+        return is_exact_bytes(w_obj)
 
     def list_is_correct_type(self, w_list):
         return w_list.strategy is self.space.fromcache(BytesListStrategy)
@@ -2054,6 +2240,8 @@ TimSort = make_timsort_class()
 IntBaseTimSort = make_timsort_class()
 FloatBaseTimSort = make_timsort_class()
 IntOrFloatBaseTimSort = make_timsort_class()
+IntPairBaseTimSort = make_timsort_class()
+Int32BaseTimSort = make_timsort_class()
 UnicodeBaseTimSort = make_timsort_class()
 
 
@@ -2078,6 +2266,11 @@ class IntSort(IntBaseTimSort):
         return a < b
 
 
+class Int32Sort(Int32BaseTimSort):
+    def lt(self, a, b):
+        return widen(a) < widen(b)
+
+
 class FloatSort(FloatBaseTimSort):
     def lt(self, a, b):
         return a < b
@@ -2090,6 +2283,11 @@ class IntOrFloatSort(IntOrFloatBaseTimSort):
         return fa < fb
 
 
+class IntPairSort(IntPairBaseTimSort):
+    def lt(self, a, b):
+        return a < b
+
+
 class UnicodeSort(UnicodeBaseTimSort):
     def lt(self, a, b):
         return a < b
@@ -920,6 +920,8 @@ class CacheEntry(object):
     version_tag = None
     storageindex = 0
     w_method = None # for callmethod
+    w_value = None  # for class attributes that are not descriptors
+    next = None     # next entry at the same bytecode site
     success_counter = 0
     failure_counter = 0
 
@@ -946,35 +948,97 @@ INVALID_CACHE_ENTRY = CacheEntry()
 INVALID_CACHE_ENTRY.map_wref = weakref.ref(_invalid_cache_entry_map)
                                  # different from any real map ^^^
 
+# Every LOAD_ATTR and LOOKUP_METHOD in a code object gets its own cache,
+# which is a chain of at most MAX_CACHE_ENTRIES_PER_SITE entries for
+# different maps.  'pycode._mapdict_sites' maps the position of the opcode
+# in co_code to the index of its cache in 'pycode._mapdict_caches'.  As it
+# stores one char per position, code objects with more than 256 such
+# opcodes fall back to one cache per name in co_names, with
+# '_mapdict_sites' set to None.
+MAX_CACHE_ENTRIES_PER_SITE = 4
+
 def init_mapdict_cache(pycode):
-    num_entries = len(pycode.co_names_w)
+    from pypy.tool.stdlib_opcode import opcodedesc, HAVE_ARGUMENT
+    co_code = pycode.co_code
+    sites = ['\x00'] * len(co_code)
+    num_entries = 0
+    i = 0
+    while i < len(co_code):
+        opcode = ord(co_code[i])
+        if (opcode == opcodedesc.LOAD_ATTR.index or
+                opcode == opcodedesc.LOOKUP_METHOD.index):
+            if num_entries < 256:
+                sites[i] = chr(num_entries)
+            num_entries += 1
+        if opcode >= HAVE_ARGUMENT:
+            i += 3
+        else:
+            i += 1
+    if num_entries <= 256:
+        pycode._mapdict_sites = ''.join(sites)
+    else:
+        pycode._mapdict_sites = None
+        num_entries = len(pycode.co_names_w)
     pycode._mapdict_caches = [INVALID_CACHE_ENTRY] * num_entries
 
+def _get_cache_index(pycode, nameindex, next_instr):
+    sites = pycode._mapdict_sites
+    if sites is None:
+        return nameindex
+    # 'next_instr' is just after the opcode and its 2-bytes argument
+    return ord(sites[next_instr - 3])
+_get_cache_index._always_inline_ = True
+
 @jit.dont_look_inside
-def _fill_cache(pycode, nameindex, map, version_tag, storageindex, w_method=None):
-    entry = pycode._mapdict_caches[nameindex]
-    if entry is INVALID_CACHE_ENTRY:
+def _fill_cache(pycode, cacheindex, map, version_tag, storageindex,
+                w_method=None, w_value=None):
+    first = pycode._mapdict_caches[cacheindex]
+    if first is INVALID_CACHE_ENTRY:
         entry = CacheEntry()
-        pycode._mapdict_caches[nameindex] = entry
+        pycode._mapdict_caches[cacheindex] = entry
+    else:
+        # reuse the entry for the same map (with an outdated version_tag)
+        # or for a map that died; otherwise add a new entry in front if
+        # there is still room, or else overwrite the last one
+        entry = first
+        count = 1
+        while True:
+            mymap = entry.map_wref()
+            if mymap is None or mymap is map:
+                break
+            if entry.next is None:
+                if count < MAX_CACHE_ENTRIES_PER_SITE:
+                    entry = CacheEntry()
+                    entry.next = first
+                    pycode._mapdict_caches[cacheindex] = entry
+                break
+            entry = entry.next
+            count += 1
     entry.map_wref = weakref.ref(map)
     entry.version_tag = version_tag
     entry.storageindex = storageindex
     entry.w_method = w_method
+    entry.w_value = w_value
     if pycode.space.config.objspace.std.withmethodcachecounter:
         entry.failure_counter += 1
 
-def LOAD_ATTR_caching(pycode, w_obj, nameindex):
+def LOAD_ATTR_caching(pycode, w_obj, nameindex, next_instr):
     # this whole mess is to make the interpreter quite a bit faster; it's not
     # used if we_are_jitted().
-    entry = pycode._mapdict_caches[nameindex]
+    cacheindex = _get_cache_index(pycode, nameindex, next_instr)
+    entry = pycode._mapdict_caches[cacheindex]
     map = w_obj._get_mapdict_map()
-    if entry.is_valid_for_map(map) and entry.w_method is None:
-        # everything matches, it's incredibly fast
-        return w_obj._mapdict_read_storage(entry.storageindex)
-    return LOAD_ATTR_slowpath(pycode, w_obj, nameindex, map)
+    while entry is not None:
+        if entry.is_valid_for_map(map) and entry.w_method is None:
+            # everything matches, it's incredibly fast
+            if entry.w_value is not None:
+                return entry.w_value
+            return w_obj._mapdict_read_storage(entry.storageindex)
+        entry = entry.next
+    return LOAD_ATTR_slowpath(pycode, w_obj, nameindex, cacheindex, map)
 LOAD_ATTR_caching._always_inline_ = True
 
-def LOAD_ATTR_slowpath(pycode, w_obj, nameindex, map):
+def LOAD_ATTR_slowpath(pycode, w_obj, nameindex, cacheindex, map):
     space = pycode.space
     w_name = pycode.co_names_w[nameindex]
     if map is not None:
@@ -1004,9 +1068,9 @@ def LOAD_ATTR_slowpath(pycode, w_obj, nameindex, map):
             else:
                 # There is a non-data descriptor in the class.  If there is
                 # also a dict attribute, use the latter, caching its storageindex.
-                # If not, we loose.  We could do better in this case too,
-                # but we don't care too much; the common case of a method
-                # invocation is handled by LOOKUP_METHOD_xxx below.
+                # If not, we loose, unless it is a plain value like a
+                # constant; the common case of a method invocation is
+                # handled by LOOKUP_METHOD_xxx below.
                 attrname = name
                 index = DICT
             #
@@ -1016,26 +1080,52 @@ def LOAD_ATTR_slowpath(pycode, w_obj, nameindex, map):
                     # Note that if map.terminator is a DevolvedDictTerminator
                     # or the class provides its own dict, not using mapdict, then:
                     # map.find_map_attr will always return None if index==DICT.
-                    _fill_cache(pycode, nameindex, map, version_tag, attr.storageindex)
+                    _fill_cache(pycode, cacheindex, map, version_tag,
+                                attr.storageindex)
                     return w_obj._mapdict_read_storage(attr.storageindex)
+                if (w_descr is not None and
+                        _is_cacheable_class_value(space, w_type, map, w_descr)):
+                    # the instance has no such attribute, and the one in
+                    # the class can only change with the version_tag
+                    _fill_cache(pycode, cacheindex, map, version_tag, -1,
+                                w_value=w_descr)
+                    return w_descr
     if space.config.objspace.std.withmethodcachecounter:
         INVALID_CACHE_ENTRY.failure_counter += 1
     return space.getattr(w_obj, w_name)
 LOAD_ATTR_slowpath._dont_inline_ = True
 
-def LOOKUP_METHOD_mapdict(f, nameindex, w_obj):
+def _is_cacheable_class_value(space, w_type, map, w_descr):
+    # same reasoning as in LOOKUP_METHOD_mapdict_fill_cache_method(): we
+    # need the map to tell us that the attribute is not in the instance
+    if w_type.layout.typedef.hasdict:
+        return False
+    if isinstance(map.terminator, DevolvedDictTerminator):
+        return False
+    # the value must not be a descriptor.  Only trust built-in types, to
+    # which nobody can add a '__get__' later
+    w_descrtype = space.type(w_descr)
+    return (not w_descrtype.is_heaptype() and
+            w_descrtype.lookup('__get__') is None)
+
+def LOOKUP_METHOD_mapdict(f, nameindex, next_instr, w_obj):
     pycode = f.getcode()
-    entry = pycode._mapdict_caches[nameindex]
-    if entry.is_valid_for_obj(w_obj):
-        w_method = entry.w_method
-        if w_method is not None:
-            f.pushvalue(w_method)
-            f.pushvalue(w_obj)
-            return True
+    cacheindex = _get_cache_index(pycode, nameindex, next_instr)
+    entry = pycode._mapdict_caches[cacheindex]
+    map = w_obj._get_mapdict_map()
+    while entry is not None:
+        if entry.is_valid_for_map(map):
+            w_method = entry.w_method
+            if w_method is not None:
+                f.pushvalue(w_method)
+                f.pushvalue(w_obj)
+                return True
+        entry = entry.next
     return False
 
 def LOOKUP_METHOD_mapdict_fill_cache_method(space, pycode, name, nameindex,
-                                            w_obj, w_type, w_method):
+                                            next_instr, w_obj, w_type,
+                                            w_method):
     # if the layout has a dict itself, then mapdict is not used for normal
     # attributes. Then the cache won't be able to spot changes to the dict.
     # Thus we don't cache. see test_bug_builtin_types_callmethod
@@ -1050,8 +1140,5 @@ def LOOKUP_METHOD_mapdict_fill_cache_method(space, pycode, name, nameindex,
     map = w_obj._get_mapdict_map()
     if map is None or isinstance(map.terminator, DevolvedDictTerminator):
         return
-    _fill_cache(pycode, nameindex, map, version_tag, -1, w_method)
-
-# XXX fix me: if a function contains a loop with both LOAD_ATTR and
-# XXX LOOKUP_METHOD on the same attribute name, it keeps trashing and
-# XXX rebuilding the cache
+    cacheindex = _get_cache_index(pycode, nameindex, next_instr)
+    _fill_cache(pycode, cacheindex, map, version_tag, -1, w_method)
@@ -525,8 +525,10 @@ class StdObjSpace(ObjSpace):
     def listview_float(self, w_obj):
         if type(w_obj) is W_ListObject:
             return w_obj.getitems_float()
-        # dict and set don't have FloatStrategy, so we can just ignore them
-        # for now
+        if type(w_obj) is W_DictObject:
+            return w_obj.listview_float()
+        if type(w_obj) is W_SetObject or type(w_obj) is W_FrozensetObject:
+            return w_obj.listview_float()
         if isinstance(w_obj, W_ListObject) and self._uses_list_iter(w_obj):
             return w_obj.getitems_float()
         return None
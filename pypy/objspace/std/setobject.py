@@ -1,17 +1,21 @@
+import math
+
 from pypy.interpreter import gateway
 from pypy.interpreter.baseobjspace import W_Root
 from pypy.interpreter.error import OperationError, oefmt
 from pypy.interpreter.signature import Signature
 from pypy.interpreter.typedef import TypeDef
-from pypy.objspace.std.bytesobject import W_BytesObject
+from pypy.objspace.std.dictmultiobject import _float_key_eq, _float_key_hash
+from pypy.objspace.std.floatobject import W_FloatObject
 from pypy.objspace.std.intobject import W_IntObject
+from pypy.objspace.std.strbufobject import is_exact_bytes
 from pypy.objspace.std.unicodeobject import W_UnicodeObject
 from pypy.objspace.std.util import IDTAG_SPECIAL, IDTAG_SHIFT
 
 from rpython.rlib.objectmodel import r_dict
 from rpython.rlib.objectmodel import iterkeys_with_hash, contains_with_hash
 from rpython.rlib.objectmodel import setitem_with_hash, delitem_with_hash
-from rpython.rlib.rarithmetic import intmask, r_uint
+from rpython.rlib.rarithmetic import intmask, r_uint, ovfcheck_float_to_int
 from rpython.rlib import rerased, jit
 
 
@@ -94,6 +98,10 @@ class W_BaseSetObject(W_Root):
         """ If this is an int set return its contents as a list of uwnrapped ints. Otherwise return None. """
         return self.strategy.listview_int(self)
 
+    def listview_float(self):
+        """ If this is a float set return its contents as a list of uwnrapped floats. Otherwise return None. """
+        return self.strategy.listview_float(self)
+
     def get_storage_copy(self):
         """ Returns a copy of the storage. Needed when we want to clone all elements from one set and
         put them into another. """
@@ -696,6 +704,9 @@ class SetStrategy(object):
     def listview_int(self, w_set):
         return None
 
+    def listview_float(self, w_set):
+        return None
+
     #def erase(self, storage):
     #    raise NotImplementedError
 
@@ -793,7 +804,9 @@ class EmptySetStrategy(SetStrategy):
     def add(self, w_set, w_key):
         if type(w_key) is W_IntObject:
             strategy = self.space.fromcache(IntegerSetStrategy)
-        elif type(w_key) is W_BytesObject:
+        elif type(w_key) is W_FloatObject:
+            strategy = self.space.fromcache(FloatSetStrategy)
+        elif is_exact_bytes(w_key):
             strategy = self.space.fromcache(BytesSetStrategy)
         elif type(w_key) is W_UnicodeObject:
             strategy = self.space.fromcache(UnicodeSetStrategy)
@@ -954,6 +967,11 @@ class AbstractUnwrappedSetStrategy(object):
         d = self.unerase(w_set.sstorage)
         return self.unwrap(w_key) in d
 
+    def other_has_key(self, w_other, key):
+        """ Returns whether w_other contains an element equal to the given
+        unwrapped item. Overridden to avoid wrapping it when possible. """
+        return w_other.has_key(self.wrap(key))
+
     def equals(self, w_set, w_other):
         if w_set.length() != w_other.length():
             return False
@@ -966,7 +984,7 @@ class AbstractUnwrappedSetStrategy(object):
             return False
         items = self.unerase(w_set.sstorage).keys()
         for key in items:
-            if not w_other.has_key(self.wrap(key)):
+            if not self.other_has_key(w_other, key):
                 return False
         return True
 
@@ -974,8 +992,7 @@ class AbstractUnwrappedSetStrategy(object):
         iterator = self.unerase(w_set.sstorage).iterkeys()
         result_dict = self.get_empty_dict()
         for key in iterator:
-            w_item = self.wrap(key)
-            if not w_other.has_key(w_item):
+            if not self.other_has_key(w_other, key):
                 result_dict[key] = None
         return self.erase(result_dict)
 
@@ -1052,9 +1069,8 @@ class AbstractUnwrappedSetStrategy(object):
     def _symmetric_difference_wrapped(self, w_set, w_other):
         newsetdata = newset(self.space)
         for obj in self.unerase(w_set.sstorage):
-            w_item = self.wrap(obj)
-            if not w_other.has_key(w_item):
-                newsetdata[w_item] = None
+            if not self.other_has_key(w_other, obj):
+                newsetdata[self.wrap(obj)] = None
 
         w_iterator = w_other.iter()
         while True:
@@ -1101,24 +1117,24 @@ class AbstractUnwrappedSetStrategy(object):
             strategy = self.space.fromcache(EmptySetStrategy)
             storage = strategy.get_empty_storage()
         else:
-            strategy = self.space.fromcache(ObjectSetStrategy)
+            # the result only contains elements of the set that we iterate
+            # over, so it can keep the strategy of that set
             if w_set.length() > w_other.length():
                 # swap operands
+                strategy = w_other.strategy
                 storage = w_other.strategy._intersect_wrapped(w_other, w_set)
             else:
+                strategy = self
                 storage = self._intersect_wrapped(w_set, w_other)
         return storage, strategy
 
     def _intersect_wrapped(self, w_set, w_other):
-        result = newset(self.space)
+        result = self.get_empty_dict()
         for key in self.unerase(w_set.sstorage):
             self.intersect_jmp.jit_merge_point()
-            w_key = self.wrap(key)
-            if w_other.has_key(w_key):
-                result[w_key] = None
-
-        strategy = self.space.fromcache(ObjectSetStrategy)
-        return strategy.erase(result)
+            if self.other_has_key(w_other, key):
+                result[key] = None
+        return self.erase(result)
 
     def _intersect_unwrapped(self, w_set, w_other):
         result = self.get_empty_dict()
@@ -1153,8 +1169,7 @@ class AbstractUnwrappedSetStrategy(object):
 
     def _issubset_wrapped(self, w_set, w_other):
         for obj in self.unerase(w_set.sstorage):
-            w_item = self.wrap(obj)
-            if not w_other.has_key(w_item):
+            if not self.other_has_key(w_other, obj):
                 return False
         return True
 
@@ -1180,7 +1195,7 @@ class AbstractUnwrappedSetStrategy(object):
     def _isdisjoint_wrapped(self, w_set, w_other):
         d = self.unerase(w_set.sstorage)
         for key in d:
-            if w_other.has_key(self.wrap(key)):
+            if self.other_has_key(w_other, key):
                 return False
         return True
 
@@ -1237,11 +1252,13 @@ class BytesSetStrategy(AbstractUnwrappedSetStrategy, SetStrategy):
         return self.unerase(w_set.sstorage).keys()
 
     def is_correct_type(self, w_key):
-        return type(w_key) is W_BytesObject
+        return is_exact_bytes(w_key)
 
     def may_contain_equal_elements(self, strategy):
         if strategy is self.space.fromcache(IntegerSetStrategy):
             return False
+        elif strategy is self.space.fromcache(FloatSetStrategy):
+            return False
         elif strategy is self.space.fromcache(EmptySetStrategy):
             return False
         elif strategy is self.space.fromcache(IdentitySetStrategy):
@@ -1281,6 +1298,8 @@ class UnicodeSetStrategy(AbstractUnwrappedSetStrategy, SetStrategy):
     def may_contain_equal_elements(self, strategy):
         if strategy is self.space.fromcache(IntegerSetStrategy):
             return False
+        elif strategy is self.space.fromcache(FloatSetStrategy):
+            return False
         elif strategy is self.space.fromcache(EmptySetStrategy):
             return False
         elif strategy is self.space.fromcache(IdentitySetStrategy):
@@ -1334,10 +1353,141 @@ class IntegerSetStrategy(AbstractUnwrappedSetStrategy, SetStrategy):
     def wrap(self, item):
         return self.space.newint(item)
 
+    def has_key(self, w_set, w_key):
+        if type(w_key) is W_FloatObject:
+            return self.has_float_key(w_set, self.space.float_w(w_key))
+        if not self.is_correct_type(w_key):
+            w_set.switch_to_object_strategy(self.space)
+            return w_set.has_key(w_key)
+        d = self.unerase(w_set.sstorage)
+        return self.unwrap(w_key) in d
+
+    def has_float_key(self, w_set, floatval):
+        d = self.unerase(w_set.sstorage)
+        if math.floor(floatval) != floatval:    # fractional part, or nan
+            return False
+        try:
+            intval = ovfcheck_float_to_int(floatval)
+        except OverflowError:
+            return False
+        return intval in d
+
+    def remove(self, w_set, w_item):
+        if type(w_item) is W_FloatObject:
+            floatval = self.space.float_w(w_item)
+            if not self.has_float_key(w_set, floatval):
+                return False
+            d = self.unerase(w_set.sstorage)
+            del d[int(floatval)]
+            return True
+        if not self.is_correct_type(w_item):
+            w_set.switch_to_object_strategy(self.space)
+            return w_set.remove(w_item)
+        d = self.unerase(w_set.sstorage)
+        try:
+            del d[self.unwrap(w_item)]
+            return True
+        except KeyError:
+            return False
+
+    def other_has_key(self, w_other, key):
+        strategy = w_other.strategy
+        if strategy is self.space.fromcache(FloatSetStrategy):
+            assert isinstance(strategy, FloatSetStrategy)
+            return strategy.has_int_key(w_other, key)
+        return w_other.has_key(self.wrap(key))
+
     def iter(self, w_set):
         return IntegerIteratorImplementation(self.space, self, w_set)
 
 
+class FloatSetStrategy(AbstractUnwrappedSetStrategy, SetStrategy):
+    erase, unerase = rerased.new_erasing_pair("float")
+    erase = staticmethod(erase)
+    unerase = staticmethod(unerase)
+
+    intersect_jmp = jit.JitDriver(greens = [], reds = 'auto',
+                                  name='set(float).intersect')
+
+    def get_empty_storage(self):
+        return self.erase(self.get_empty_dict())
+
+    def get_empty_dict(self):
+        return r_dict(_float_key_eq, _float_key_hash)
+
+    def listview_float(self, w_set):
+        return self.unerase(w_set.sstorage).keys()
+
+    def is_correct_type(self, w_key):
+        return type(w_key) is W_FloatObject
+
+    def may_contain_equal_elements(self, strategy):
+        if strategy is self.space.fromcache(BytesSetStrategy):
+            return False
+        elif strategy is self.space.fromcache(UnicodeSetStrategy):
+            return False
+        elif strategy is self.space.fromcache(EmptySetStrategy):
+            return False
+        elif strategy is self.space.fromcache(IdentitySetStrategy):
+            return False
+        return True
+
+    def unwrap(self, w_item):
+        return self.space.float_w(w_item)
+
+    def wrap(self, item):
+        return self.space.newfloat(item)
+
+    def has_key(self, w_set, w_key):
+        if type(w_key) is W_IntObject:
+            return self.has_int_key(w_set, self.space.int_w(w_key))
+        if not self.is_correct_type(w_key):
+            w_set.switch_to_object_strategy(self.space)
+            return w_set.has_key(w_key)
+        d = self.unerase(w_set.sstorage)
+        return self.unwrap(w_key) in d
+
+    def has_int_key(self, w_set, intval):
+        # ints that are too large to be represented exactly as a float
+        # are never equal to any float
+        d = self.unerase(w_set.sstorage)
+        floatval = float(intval)
+        try:
+            if ovfcheck_float_to_int(floatval) != intval:
+                return False
+        except OverflowError:
+            return False
+        return floatval in d
+
+    def remove(self, w_set, w_item):
+        if type(w_item) is W_IntObject:
+            intval = self.space.int_w(w_item)
+            if not self.has_int_key(w_set, intval):
+                return False
+            d = self.unerase(w_set.sstorage)
+            del d[float(intval)]
+            return True
+        if not self.is_correct_type(w_item):
+            w_set.switch_to_object_strategy(self.space)
+            return w_set.remove(w_item)
+        d = self.unerase(w_set.sstorage)
+        try:
+            del d[self.unwrap(w_item)]
+            return True
+        except KeyError:
+            return False
+
+    def other_has_key(self, w_other, key):
+        strategy = w_other.strategy
+        if strategy is self.space.fromcache(IntegerSetStrategy):
+            assert isinstance(strategy, IntegerSetStrategy)
+            return strategy.has_float_key(w_other, key)
+        return w_other.has_key(self.wrap(key))
+
+    def iter(self, w_set):
+        return FloatIteratorImplementation(self.space, self, w_set)
+
+
 class ObjectSetStrategy(AbstractUnwrappedSetStrategy, SetStrategy):
     erase, unerase = rerased.new_erasing_pair("object")
     erase = staticmethod(erase)
@@ -1409,6 +1559,8 @@ class IdentitySetStrategy(AbstractUnwrappedSetStrategy, SetStrategy):
             return False
         if strategy is self.space.fromcache(IntegerSetStrategy):
             return False
+        if strategy is self.space.fromcache(FloatSetStrategy):
+            return False
         if strategy is self.space.fromcache(BytesSetStrategy):
             return False
         if strategy is self.space.fromcache(UnicodeSetStrategy):
@@ -1514,6 +1666,18 @@ class IntegerIteratorImplementation(IteratorImplementation):
         else:
             return None
 
+class FloatIteratorImplementation(IteratorImplementation):
+    def __init__(self, space, strategy, w_set):
+        IteratorImplementation.__init__(self, space, strategy, w_set)
+        d = strategy.unerase(w_set.sstorage)
+        self.iterator = d.iterkeys()
+
+    def next_entry(self):
+        for key in self.iterator:
+            return self.space.newfloat(key)
+        else:
+            return None
+
 class IdentityIteratorImplementation(IteratorImplementation):
     def __init__(self, space, strategy, w_set):
         IteratorImplementation.__init__(self, space, strategy, w_set)
@@ -1605,6 +1769,13 @@ def set_strategy_and_setdata(space, w_set, w_iterable):
         w_set.sstorage = strategy.get_storage_from_unwrapped_list(intlist)
         return
 
+    floatlist = space.listview_float(w_iterable)
+    if floatlist is not None:
+        strategy = space.fromcache(FloatSetStrategy)
+        w_set.strategy = strategy
+        w_set.sstorage = strategy.get_storage_from_unwrapped_list(floatlist)
+        return
+
     length_hint = space.length_hint(w_iterable, 0)
 
     if jit.isconstant(length_hint):
@@ -1626,9 +1797,18 @@ def _pick_correct_strategy_unroll(space, w_set, w_iterable):
         w_set.sstorage = w_set.strategy.get_storage_from_list(iterable_w)
         return
 
+    # check for floats
+    for w_item in iterable_w:
+        if type(w_item) is not W_FloatObject:
+            break
+    else:
+        w_set.strategy = space.fromcache(FloatSetStrategy)
+        w_set.sstorage = w_set.strategy.get_storage_from_list(iterable_w)
+        return
+
     # check for strings
     for w_item in iterable_w:
-        if type(w_item) is not W_BytesObject:
+        if not is_exact_bytes(w_item):
             break
     else:
         w_set.strategy = space.fromcache(BytesSetStrategy)
@@ -0,0 +1,136 @@
+"""A str object that is the result of additions, built lazily.
+
+With the option 'objspace.std.withstrbuf', 'str + str' returns a
+W_StringBufferObject that keeps a StringBuilder instead of a flat string.
+Adding more to it appends to the same builder, as long as nobody else did
+so already, which makes loops doing 's += piece' linear instead of
+quadratic.  The flat string is only built when the content is needed.
+"""
+
+import inspect
+
+import py
+
+from rpython.rlib.buffer import StringBuffer
+from rpython.rlib.rstring import StringBuilder
+
+from pypy.interpreter.buffer import SimpleView
+from pypy.interpreter.error import OperationError
+from pypy.objspace.std.bytesobject import (
+    W_AbstractBytesObject, W_BytesObject)
+
+
+class W_StringBufferObject(W_AbstractBytesObject):
+    w_str = None
+
+    def __init__(self, builder):
+        self.builder = builder             # StringBuilder
+        self.length = builder.getlength()
+
+    def force(self):
+        if self.w_str is None:
+            s = self.builder.build()
+            if self.length < len(s):
+                # other W_StringBufferObjects appended to the builder
+                s = s[:self.length]
+            self.w_str = W_BytesObject(s)
+            return s
+        else:
+            return self.w_str._value
+
+    def force_w(self):
+        self.force()
+        return self.w_str
+
+    def __repr__(self):
+        """representation for debugging purposes"""
+        return "%s(%r[:%d])" % (
+            self.__class__.__name__, self.builder, self.length)
+
+    def unwrap(self, space):
+        return self.force()
+
+    def str_w(self, space):
+        return self.force()
+
+    charbuf_w = str_w
+
+    def buffer_w(self, space, flags):
+        space.check_buf_flags(flags, True)
+        return SimpleView(StringBuffer(self.force()))
+
+    def readbuf_w(self, space):
+        return StringBuffer(self.force())
+
+    def ord(self, space):
+        return self.force_w().ord(space)
+
+    def descr_len(self, space):
+        return space.newint(self.length)
+
+    def descr_add(self, space, w_other):
+        if (space.isinstance_w(w_other, space.w_unicode) or
+                space.isinstance_w(w_other, space.w_bytearray)):
+            return self.force_w().descr_add(space, w_other)
+        try:
+            other = W_BytesObject._op_val(space, w_other)
+        except OperationError as e:
+            if e.match(space, space.w_TypeError):
+                return space.w_NotImplemented
+            raise
+        if self.builder.getlength() != self.length:
+            # somebody else already appended to our builder
+            builder = StringBuilder()
+            builder.append(self.force())
+        else:
+            builder = self.builder
+        builder.append(other)
+        return W_StringBufferObject(builder)
+
+    def descr_str(self, space):
+        # you cannot get subclasses of W_StringBufferObject here
+        assert type(self) is W_StringBufferObject
+        return self
+
+
+def _make_delegating_method(name, func):
+    # like interpindirect2app(): forward to the same method of the forced
+    # W_BytesObject, after also forcing the wrapped arguments
+    args = inspect.getargs(func.func_code)
+    if args.varargs or args.keywords:
+        raise TypeError("Varargs and keywords not supported in unwrap_spec")
+    argnames = args.args[1:]     # skip 'self'
+    assert argnames[0] == 'space'
+    forcing = ''.join(["""
+        if isinstance(%(arg)s, W_StringBufferObject):
+            %(arg)s = %(arg)s.force_w()""" % {'arg': arg}
+                       for arg in argnames if arg.startswith('w_')])
+    func_code = py.code.Source("""
+    def f(self, %(args)s):%(forcing)s
+        return self.force_w().%(name)s(%(args)s)
+    """ % {'args': ', '.join(argnames), 'forcing': forcing, 'name': name})
+    d = {'W_StringBufferObject': W_StringBufferObject}
+    exec func_code.compile() in d
+    f = d['f']
+    f.func_defaults = func.func_defaults
+    f.__module__ = func.__module__
+    f.func_name = name
+    return f
+
+for _name, _func in W_AbstractBytesObject.__dict__.items():
+    if (_name.startswith('descr_') and inspect.isfunction(_func) and
+            _name not in W_StringBufferObject.__dict__):
+        setattr(W_StringBufferObject, _name,
+                _make_delegating_method(_name, _func))
+del _name, _func
+
+W_StringBufferObject.typedef = W_BytesObject.typedef
+
+
+def is_exact_bytes(w_obj):
+    """True for the str objects that the bytes strategies of lists and
+    sets can store, i.e. W_BytesObject and W_StringBufferObject but not
+    subclasses of str.  The strategies unwrap them with space.bytes_w(),
+    which forces a W_StringBufferObject: building a string with '+'
+    doesn't make the container fall back to a generic strategy."""
+    return type(w_obj) is W_BytesObject or type(w_obj) is W_StringBufferObject
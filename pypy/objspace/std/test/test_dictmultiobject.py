@@ -153,6 +153,12 @@ class TestW_DictObject(object):
         w_d.initialize_content([(w(1), w("a")), (w(2), w("b"))])
         assert self.space.listview_int(w_d) == [1, 2]
 
+    def test_listview_float_dict(self):
+        w = self.space.wrap
+        w_d = self.space.newdict()
+        w_d.initialize_content([(w(1.5), w("a")), (w(2.5), w("b"))])
+        assert self.space.listview_float(w_d) == [1.5, 2.5]
+
     def test_keys_on_string_unicode_int_dict(self, monkeypatch):
         w = self.space.wrap
         wb = self.space.newbytes
@@ -1129,6 +1135,27 @@ class AppTestStrategies(object):
         assert "IntDictStrategy" in self.get_strategy(d)
         assert d[1L] == "hi"
 
+    def test_empty_to_float(self):
+        d = {}
+        d[1.5] = "hi"
+        assert "FloatDictStrategy" in self.get_strategy(d)
+        assert d[1.5] == "hi"
+        assert d.get("1.5") is None
+        assert "FloatDictStrategy" in self.get_strategy(d)
+        d[-0.0] = "zero"
+        assert d[0.0] == "zero"
+        assert d.keys() == [1.5, -0.0] or d.keys() == [-0.0, 1.5]
+        nan = float("nan")
+        d[nan] = "nan"
+        assert d[nan] == "nan"
+        assert -nan not in d    # a NaN with other bits
+        assert len(d) == 3
+        assert "FloatDictStrategy" in self.get_strategy(d)
+        #
+        d = {2.0: "two"}
+        assert d[2] == "two"   # int key equal to a float key
+        assert "ObjectDictStrategy" in self.get_strategy(d)
+
     def test_iter_dict_length_change(self):
         d = {1: 2, 3: 4, 5: 6}
         it = d.iteritems()
@@ -1157,6 +1184,80 @@ class AppTestStrategies(object):
         raises(RuntimeError, list, it)
 
 
+class AppTestTupleStrategies(object):
+    spaceconfig = {"objspace.std.withspecialisedtuple": True}
+
+    def setup_class(cls):
+        if cls.runappdirect:
+            py.test.skip("__repr__ doesn't work on appdirect")
+
+    def w_get_strategy(self, obj):
+        import __pypy__
+        r = __pypy__.internal_repr(obj)
+        return r[r.find("(") + 1: r.find(")")]
+
+    def test_int_int(self):
+        d = {}
+        for i in range(10):
+            d[i, i * 2] = i
+        assert "TupleDictStrategy_ii" in self.get_strategy(d)
+        assert d[5, 10] == 5
+        assert (5, 11) not in d
+        assert d.get(None) is None
+        assert d.get(5) is None
+        del d[5, 10]
+        assert len(d) == 9
+        assert sorted(d.items())[:2] == [((0, 0), 0), ((1, 2), 1)]
+        assert "TupleDictStrategy_ii" in self.get_strategy(d)
+        # a tuple of floats can be equal to it
+        assert d[2.0, 4.0] == 2
+        assert "ObjectDictStrategy" in self.get_strategy(d)
+
+    def test_str_int(self):
+        d = {("a", 1): 1, ("b", 2): 2}
+        assert "TupleDictStrategy_si" in self.get_strategy(d)
+        assert d["b", 2] == 2
+        assert ("b", 3) not in d
+        assert (2, "b") not in d
+        assert "ObjectDictStrategy" in self.get_strategy(d)
+        d = {(1, "a"): 1}
+        assert "TupleDictStrategy_is" in self.get_strategy(d)
+        d = {("a", "b"): 1}
+        assert "TupleDictStrategy_ss" in self.get_strategy(d)
+        assert d["a", "b"] == 1
+        d[u"a", "b"] = 2
+        assert "ObjectDictStrategy" in self.get_strategy(d)
+        assert d == {("a", "b"): 2}
+
+    def test_float_float(self):
+        nan = float("nan")
+        d = {(1.5, nan): 1, (0.0, 2.5): 2}
+        assert "TupleDictStrategy_ff" in self.get_strategy(d)
+        assert d[1.5, nan] == 1
+        assert d[-0.0, 2.5] == 2
+        assert (1.5, -nan) not in d
+
+    def test_not_specialised(self):
+        d = {(1, 2, 3): 1}
+        assert "ObjectDictStrategy" in self.get_strategy(d)
+        d = {(1, None): 1}
+        assert "ObjectDictStrategy" in self.get_strategy(d)
+        class X(int):
+            pass
+        d = {("a", X(1)): 1}
+        assert "ObjectDictStrategy" in self.get_strategy(d)
+
+    def test_update_and_copy(self):
+        d = {(1, 2): 3, (4, 5): 6}
+        d2 = d.copy()
+        assert "TupleDictStrategy_ii" in self.get_strategy(d2)
+        assert d2 == d
+        d3 = {(7, 8): 9}
+        d3.update(d)
+        assert "TupleDictStrategy_ii" in self.get_strategy(d3)
+        assert d3 == {(1, 2): 3, (4, 5): 6, (7, 8): 9}
+
+
 class FakeWrapper(object):
     hash_count = 0
     def unwrap(self, space):
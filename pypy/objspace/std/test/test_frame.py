@@ -0,0 +1,146 @@
+class AppTestSuperinstructions:
+    spaceconfig = {"objspace.std.superinstructions": True}
+
+    def test_compare_and_jump(self):
+        def f(a, b):
+            res = []
+            if a < b: res.append('<')
+            if a <= b: res.append('<=')
+            if a == b: res.append('==')
+            if a != b: res.append('!=')
+            if a > b: res.append('>')
+            if a >= b: res.append('>=')
+            if not a < b: res.append('!<')
+            return res
+        assert f(1, 2) == ['<', '<=', '!=']
+        assert f(2, 2) == ['<=', '==', '>=', '!<']
+        assert f(-3, -4) == ['!=', '>', '>=', '!<']
+        assert f(1.5, 2) == ['<', '<=', '!=']
+        assert f(True, 1) == ['<=', '==', '>=', '!<']
+        assert f(2L, 2) == ['<=', '==', '>=', '!<']
+        assert f("a", "b") == ['<', '<=', '!=']
+        assert f(None, None) == ['<=', '==', '>=', '!<']
+
+    def test_compare_and_jump_other_tests(self):
+        def f(a, b):
+            res = []
+            if a in b: res.append('in')
+            if a not in b: res.append('not in')
+            if a is b: res.append('is')
+            if a is not b: res.append('is not')
+            return res
+        assert f(1, [1, 2]) == ['in', 'is not']
+        assert f(3, [1, 2]) == ['not in', 'is not']
+        x = ()
+        assert f(x, x) == ['not in', 'is']
+        try:
+            raise ValueError
+        except ValueError:    # uses COMPARE_OP 10
+            pass
+        else:
+            assert 0
+
+    def test_compare_and_jump_in_loops(self):
+        def f(n):
+            i = 0
+            total = 0
+            while i < n:
+                if i % 3 == 0:
+                    total += i
+                i += 1
+            return total
+        assert f(10) == 0 + 3 + 6 + 9
+        assert f(0) == 0
+        assert f(10.0) == 18
+
+    def test_compare_and_jump_not_bool(self):
+        class A(object):
+            def __init__(self, value):
+                self.value = value
+            def __lt__(self, other):
+                return self.value
+        class Bad(object):
+            def __nonzero__(self):
+                raise ZeroDivisionError
+        def f(a):
+            if a < 0:
+                return "yes"
+            return "no"
+        assert f(A([1])) == "yes"
+        assert f(A([])) == "no"
+        assert f(A("")) == "no"
+        raises(ZeroDivisionError, f, A(Bad()))
+
+    def test_compare_error(self):
+        import sys
+        class A(object):
+            def __eq__(self, other):
+                raise KeyError
+        def f(a):
+            if a == 5:
+                return 1
+            return 2
+        try:
+            f(A())
+        except KeyError:
+            tb = sys.exc_info()[2].tb_next
+        assert tb.tb_frame.f_code is f.func_code
+        assert tb.tb_lineno == f.func_code.co_firstlineno + 1
+
+    def test_load_fast_load_attr(self):
+        class A(object):
+            x = 5
+        def f(a):
+            return a.x + a.x
+        def g(a):
+            return a.real
+        a = A()
+        assert f(a) == 10
+        a.x = 6
+        assert f(a) == 12
+        raises(AttributeError, f, 3)
+        assert g(3j) == 0.0
+        assert g(5) == 5
+
+    def test_load_fast_unbound(self):
+        def f():
+            if 0:
+                a = 5
+            return a.x
+        raises(UnboundLocalError, f)
+
+    def test_load_attr_error_lasti(self):
+        import sys, dis
+        def f(a):
+            return a.missing
+        try:
+            f(42)
+        except AttributeError:
+            tb = sys.exc_info()[2].tb_next
+        assert tb.tb_frame.f_code is f.func_code
+        opcode = ord(f.func_code.co_code[tb.tb_lasti])
+        assert dis.opname[opcode] == 'LOAD_ATTR'
+
+    def test_trace(self):
+        import sys
+        class A(object):
+            x = 5
+        def f(a):
+            if a.x \
+                    < 3:
+                return 1
+            return 2
+        events = []
+        def trace(frame, event, arg):
+            if frame.f_code is f.func_code:
+                events.append((event, frame.f_lineno - f.func_code.co_firstlineno,
+                               frame.f_lasti))
+            return trace
+        sys.settrace(trace)
+        try:
+            res = f(A())
+        finally:
+            sys.settrace(None)
+        assert res == 2
+        lines = [line for event, line, lasti in events if event == 'line']
+        assert lines == [1, 2, 4]
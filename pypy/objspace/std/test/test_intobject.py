@@ -625,3 +625,18 @@ class AppTestIntShortcut(AppTestInt):
         a = 8.5
         a -= .5
         assert a == 8
+
+
+class AppTestIntCompareShortcut(AppTestInt):
+    spaceconfig = {"objspace.std.optimized_comparison_op": True}
+
+    def test_compare(self):
+        values = [-5, 0, 3, 3, True, 3L, 2.5, "x"]
+        for a in values:
+            for b in values:
+                assert (a < b) is (cmp(a, b) < 0)
+                assert (a <= b) is (cmp(a, b) <= 0)
+                assert (a == b) is (cmp(a, b) == 0)
+                assert (a != b) is (cmp(a, b) != 0)
+                assert (a > b) is (cmp(a, b) > 0)
+                assert (a >= b) is (cmp(a, b) >= 0)
@@ -1757,6 +1757,73 @@ class AppTestWithoutStrategies:
         assert notshared == []
 
 
+class AppTestIntPairList:
+    spaceconfig = {"objspace.std.withintpairlist": True}
+
+    def test_basic(self):
+        from __pypy__ import strategy
+        l = zip(range(5), range(5, 10))
+        assert strategy(l) == "IntPairListStrategy"
+        assert l == [(0, 5), (1, 6), (2, 7), (3, 8), (4, 9)]
+        assert l[1] == (1, 6)
+        assert (2, 7) in l
+        assert (2.0, 7) in l
+        assert (2, 8) not in l
+        assert l.index((3, 8)) == 3
+        l.reverse()
+        assert l[0] == (4, 9)
+        del l[1:3]
+        assert l == [(4, 9), (1, 6), (0, 5)]
+        assert strategy(l) == "IntPairListStrategy"
+        l.append((1, 2, 3))
+        assert strategy(l) == "ObjectListStrategy"
+        assert l == [(4, 9), (1, 6), (0, 5), (1, 2, 3)]
+
+    def test_sort(self):
+        from __pypy__ import strategy
+        l = [(i % 7, -i) for i in range(50)]
+        expected = sorted([(i % 7, -i) for i in range(50)] + [(0, 0.5)])
+        l.sort()
+        assert strategy(l) == "IntPairListStrategy"
+        l.append((0, 0.5))
+        l.sort()
+        assert l == expected
+
+    def test_not_subclass_or_long(self):
+        from __pypy__ import strategy
+        class T(tuple):
+            pass
+        assert strategy([T((1, 2))]) == "ObjectListStrategy"
+        assert strategy([(1, 2**31)]) == "ObjectListStrategy"
+        assert strategy([(1, -2**31)]) == "IntPairListStrategy"
+        assert strategy([(1, 2L)]) == "ObjectListStrategy"
+
+
+class AppTestInt32List:
+    spaceconfig = {"objspace.std.withint32list": True}
+
+    def test_basic(self):
+        import sys
+        from __pypy__ import strategy
+        l = [1, 2, 3]
+        assert strategy(l) == "Int32ListStrategy"
+        l = list(x for x in range(10))
+        assert strategy(l) == "Int32ListStrategy"
+        l = [x * 3 for x in range(10)]
+        assert strategy(l) == "Int32ListStrategy"
+        assert l[3] == 9
+        assert 27 in l
+        assert l.index(27.0) == 9
+        l.sort(reverse=True)
+        assert l[0] == 27
+        l.append(-2**31)
+        assert strategy(l) == "Int32ListStrategy"
+        l.append(sys.maxint)
+        if sys.maxint > 2**31:
+            assert strategy(l) == "IntegerListStrategy"
+        assert l[-2:] == [-2**31, sys.maxint]
+
+
 class AppTestListFastSubscr:
     spaceconfig = {"objspace.std.optimized_list_getitem": True}
 
@@ -4,7 +4,7 @@ from pypy.objspace.std.listobject import (
     W_ListObject, EmptyListStrategy, ObjectListStrategy, IntegerListStrategy,
     FloatListStrategy, BytesListStrategy, RangeListStrategy,
     SimpleRangeListStrategy, make_range_list, UnicodeListStrategy,
-    IntOrFloatListStrategy)
+    IntOrFloatListStrategy, IntPairListStrategy, Int32ListStrategy)
 from pypy.objspace.std import listobject
 from pypy.objspace.std.test.test_listobject import TestW_ListObject
 
@@ -1059,3 +1059,125 @@ class TestW_ListStrategiesDisabled:
         assert isinstance(W_ListObject(self.space, [self.space.wrap(1),self.space.wrap('a')]).strategy, ObjectListStrategy)
         assert isinstance(W_ListObject(self.space, [self.space.wrap(1),self.space.wrap(2),self.space.wrap(3)]).strategy, ObjectListStrategy)
         assert isinstance(W_ListObject(self.space, [self.space.wrap('a'), self.space.wrap('b')]).strategy, ObjectListStrategy)
+
+
+class TestW_ListStrategiesIntPair:
+    spaceconfig = {"objspace.std.withintpairlist": True}
+
+    def pair(self, a, b):
+        space = self.space
+        return space.newtuple([space.wrap(a), space.wrap(b)])
+
+    def test_check_strategy(self):
+        space = self.space
+        w_l = W_ListObject(space, [self.pair(1, 2), self.pair(-3, 4)])
+        assert isinstance(w_l.strategy, IntPairListStrategy)
+        assert space.unwrap(w_l) == [(1, 2), (-3, 4)]
+        w_l = W_ListObject(space, [self.pair(1, 2), self.pair(3, 4.5)])
+        assert isinstance(w_l.strategy, ObjectListStrategy)
+        w_l = W_ListObject(space, [self.pair(1, 2), self.pair(3, 2**40)])
+        assert isinstance(w_l.strategy, ObjectListStrategy)
+        w_l = W_ListObject(space, [self.pair(1, 2), space.newtuple([])])
+        assert isinstance(w_l.strategy, ObjectListStrategy)
+
+    def test_empty_to_int_pair(self):
+        space = self.space
+        w_l = W_ListObject(space, [])
+        w_l.append(self.pair(2**31 - 1, -2**31))
+        assert isinstance(w_l.strategy, IntPairListStrategy)
+        assert space.unwrap(w_l.getitem(0)) == (2**31 - 1, -2**31)
+        w_l.append(space.wrap(5))
+        assert isinstance(w_l.strategy, ObjectListStrategy)
+        assert space.unwrap(w_l) == [(2**31 - 1, -2**31), 5]
+
+    def test_sort(self):
+        space = self.space
+        pairs = [(3, 1), (-1, 5), (3, -1), (0, 0), (-1, -2**31),
+                 (2**31 - 1, 2**31 - 1), (-2**31, 7)]
+        w_l = W_ListObject(space, [self.pair(a, b) for a, b in pairs])
+        w_l.sort(False)
+        assert isinstance(w_l.strategy, IntPairListStrategy)
+        assert space.unwrap(w_l) == sorted(pairs)
+        w_l.sort(True)
+        assert space.unwrap(w_l) == sorted(pairs, reverse=True)
+
+    def test_find(self):
+        space = self.space
+        w_l = W_ListObject(space, [self.pair(1, 2), self.pair(3, 4)])
+        assert w_l.find(self.pair(3, 4)) == 1
+        assert w_l.find(space.newtuple([space.wrap(3.0), space.wrap(4)])) == 1
+        py.test.raises(ValueError, w_l.find, self.pair(4, 3))
+        assert isinstance(w_l.strategy, IntPairListStrategy)
+
+
+class TestW_ListStrategiesInt32:
+    spaceconfig = {"objspace.std.withint32list": True}
+
+    def test_check_strategy(self):
+        space = self.space
+        w = space.wrap
+        w_l = W_ListObject(space, [w(1), w(-2**31), w(2**31 - 1)])
+        assert isinstance(w_l.strategy, Int32ListStrategy)
+        assert space.unwrap(w_l) == [1, -2**31, 2**31 - 1]
+        w_l = W_ListObject(space, [w(1), w(2**31)])
+        if sys.maxint > 2**31:
+            assert isinstance(w_l.strategy, IntegerListStrategy)
+        w_l = W_ListObject(space, [])
+        w_l.append(w(5))
+        assert isinstance(w_l.strategy, Int32ListStrategy)
+
+    def test_widen(self):
+        if sys.maxint == 2**31 - 1:
+            py.test.skip("64-bit only")
+        space = self.space
+        w = space.wrap
+        w_l = W_ListObject(space, [w(1), w(2)])
+        w_l.append(w(2**40))
+        assert isinstance(w_l.strategy, IntegerListStrategy)
+        assert space.unwrap(w_l) == [1, 2, 2**40]
+        #
+        w_l = W_ListObject(space, [w(1), w(2)])
+        w_l.setitem(0, w(-2**40))
+        assert isinstance(w_l.strategy, IntegerListStrategy)
+        assert space.unwrap(w_l) == [-2**40, 2]
+        #
+        w_l = W_ListObject(space, [w(1), w(2)])
+        w_l.extend(W_ListObject(space, [w(3), w(2**40)]))
+        assert isinstance(w_l.strategy, IntegerListStrategy)
+        assert space.unwrap(w_l) == [1, 2, 3, 2**40]
+        #
+        w_l = W_ListObject(space, [w(1), w(2)])
+        w_l.setslice(0, 1, 1, W_ListObject(space, [w(2**40), w(5)]))
+        assert isinstance(w_l.strategy, IntegerListStrategy)
+        assert space.unwrap(w_l) == [2**40, 5, 2]
+
+    def test_to_int_or_float_and_object(self):
+        space = self.space
+        w = space.wrap
+        w_l = W_ListObject(space, [w(1), w(2)])
+        w_l.append(w(2.5))
+        assert isinstance(w_l.strategy, IntOrFloatListStrategy)
+        assert space.unwrap(w_l) == [1, 2, 2.5]
+        w_l = W_ListObject(space, [w(1), w(2)])
+        w_l.append(w("x"))
+        assert isinstance(w_l.strategy, ObjectListStrategy)
+        assert space.unwrap(w_l) == [1, 2, "x"]
+
+    def test_extend_and_sort(self):
+        space = self.space
+        w = space.wrap
+        w_l = W_ListObject(space, [w(5), w(-3)])
+        w_l.extend(make_range_list(space, 0, 2, 3))
+        assert isinstance(w_l.strategy, Int32ListStrategy)
+        w_l.sort(False)
+        assert space.unwrap(w_l) == [-3, 0, 2, 4, 5]
+        w_l.sort(True)
+        assert space.unwrap(w_l) == [5, 4, 2, 0, -3]
+        assert w_l.find(w(2)) == 2
+        assert w_l.find(w(2.0)) == 2
+        assert sorted(space.listview_int(w_l)) == [-3, 0, 2, 4, 5]
+        #
+        w_l2 = W_ListObject(space, [w(2**40)])
+        w_l2.extend(w_l)
+        assert isinstance(w_l2.strategy, IntegerListStrategy)
+        assert space.unwrap(w_l2) == [2**40, 5, 4, 2, 0, -3]
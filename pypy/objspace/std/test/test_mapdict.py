@@ -864,6 +864,75 @@ class AppTestWithMapDict(object):
         del a.x
         raises(AttributeError, "a.x")
 
+    def test_class_attribute_caching(self):
+        class A(object):
+            x = 5
+        a = A()
+        def f():
+            return a.x
+        for i in range(3):
+            assert f() == 5
+        A.x = 6
+        assert f() == 6
+        a.x = 7
+        assert f() == 7
+        del a.x
+        assert f() == 6
+        a.__dict__[1] = 2     # devolves the dict
+        assert f() == 6
+        a.__dict__['x'] = 8
+        assert f() == 8
+        #
+        class D(object):
+            pass
+        d = D()
+        A.y = d
+        def g():
+            return a.y
+        for i in range(3):
+            assert g() is d
+        D.__get__ = lambda *args: 42
+        assert g() == 42
+
+    def test_polymorphic_site_correctness(self):
+        class A(object):
+            pass
+        objs = []
+        for i in range(10):
+            class B(A):
+                x = i
+            obj = B()
+            if i % 2:
+                obj.x = -i
+            objs.append(obj)
+        def f():
+            return [obj.x for obj in objs]
+        expected = [0, -1, 2, -3, 4, -5, 6, -7, 8, -9]
+        for i in range(3):
+            assert f() == expected
+        del objs[3].x
+        objs[4].x = 44
+        expected[3] = 3
+        expected[4] = 44
+        assert f() == expected
+
+    def test_many_sites(self):
+        # more than 256 LOAD_ATTRs: falls back to one cache per name
+        class A(object):
+            pass
+        a = A()
+        a.x = 1
+        a.y = 2
+        src = "def f(a):\n    return %s\n" % (
+            " + ".join(["a.x", "a.y"] * 200),)
+        d = {}
+        exec src in d
+        f = d['f']
+        for i in range(3):
+            assert f(a) == 600
+        a.y = 3
+        assert f(a) == 800
+
     def test_reversed_dict(self):
         import __pypy__
         class X(object):
@@ -879,23 +948,46 @@ class AppTestWithMapDictAndCounters(object):
     def setup_class(cls):
         from pypy.interpreter import gateway
         #
+        def entries_for_name(w_code, nameindex):
+            # all the cache entries of the sites that look up this name
+            from pypy.tool.stdlib_opcode import opcodedesc, HAVE_ARGUMENT
+            if w_code._mapdict_sites is None:
+                cacheindexes = [nameindex]
+            else:
+                cacheindexes = []
+                co_code = w_code.co_code
+                i = 0
+                while i < len(co_code):
+                    opcode = ord(co_code[i])
+                    if (opcode in (opcodedesc.LOAD_ATTR.index,
+                                   opcodedesc.LOOKUP_METHOD.index) and
+                            ord(co_code[i + 1]) == nameindex):
+                        cacheindexes.append(ord(w_code._mapdict_sites[i]))
+                    i += 3 if opcode >= HAVE_ARGUMENT else 1
+            result = []
+            for cacheindex in cacheindexes:
+                entry = w_code._mapdict_caches[cacheindex]
+                while entry is not None:
+                    if entry is not INVALID_CACHE_ENTRY:
+                        result.append(entry)
+                    entry = entry.next
+            return result
+        #
         def check(space, w_func, name):
             w_code = space.getattr(w_func, space.wrap('func_code'))
             nameindex = map(space.str_w, w_code.co_names_w).index(name)
-            entry = w_code._mapdict_caches[nameindex]
-            entry.failure_counter = 0
-            entry.success_counter = 0
+            for entry in entries_for_name(w_code, nameindex):
+                entry.failure_counter = 0
+                entry.success_counter = 0
             INVALID_CACHE_ENTRY.failure_counter = 0
             #
             w_res = space.call_function(w_func)
             assert space.eq_w(w_res, space.wrap(42))
             #
-            entry = w_code._mapdict_caches[nameindex]
-            if entry is INVALID_CACHE_ENTRY:
-                failures = successes = 0
-            else:
-                failures = entry.failure_counter
-                successes = entry.success_counter
+            failures = successes = 0
+            for entry in entries_for_name(w_code, nameindex):
+                failures += entry.failure_counter
+                successes += entry.success_counter
             globalfailures = INVALID_CACHE_ENTRY.failure_counter
             return space.wrap((failures, successes, globalfailures))
         check.unwrap_spec = [gateway.ObjSpace, gateway.W_Root, 'text']
@@ -1129,14 +1221,129 @@ class AppTestWithMapDictAndCounters(object):
                 return 42
 
         """
+        # 'c.m(1)' and 'c.m' have caches of their own; the second one
+        # always fails, because 'm' is a method
         res = self.check(f, 'm')
-        assert res == (1, 1, 1)
+        assert res == (1, 0, 1)
         res = self.check(f, 'm')
-        assert res == (0, 2, 1)
+        assert res == (0, 1, 1)
         res = self.check(f, 'm')
-        assert res == (0, 2, 1)
+        assert res == (0, 1, 1)
         res = self.check(f, 'm')
-        assert res == (0, 2, 1)
+        assert res == (0, 1, 1)
+
+    def test_polymorphic_site(self):
+        class A(object):
+            pass
+        class B(object):
+            pass
+        a = A()
+        a.x = 20
+        b = B()
+        b.y = 5
+        b.x = 22
+        objs = [a, b]
+        def f():
+            res = 0
+            for obj in objs:
+                res += obj.x
+            return res
+        #
+        res = self.check(f, 'x')
+        assert res == (2, 0, 0)
+        res = self.check(f, 'x')
+        assert res == (0, 2, 0)
+        res = self.check(f, 'x')
+        assert res == (0, 2, 0)
+
+    def test_megamorphic_site(self):
+        objs = []
+        for i in range(6):
+            class A(object):
+                pass
+            a = A()
+            a.x = 7
+            objs.append(a)
+        def f():
+            res = 0
+            for obj in objs:
+                res += obj.x
+            return res
+        #
+        res = self.check(f, 'x')
+        assert res == (6, 0, 0)
+        # only 4 maps are cached, the last entry is the one replaced
+        res = self.check(f, 'x')
+        assert res == (3, 3, 0)
+        res = self.check(f, 'x')
+        assert res == (3, 3, 0)
+
+    def test_separate_sites(self):
+        class A(object):
+            pass
+        class B(object):
+            pass
+        a = A()
+        a.x = 20
+        b = B()
+        b.x = 22
+        def f():
+            return a.x + b.x
+        #
+        res = self.check(f, 'x')
+        assert res == (2, 0, 0)
+        res = self.check(f, 'x')
+        assert res == (0, 2, 0)
+
+    def test_class_attribute(self):
+        class A(object):
+            x = 42
+        a = A()
+        def f():
+            return a.x
+        #
+        res = self.check(f, 'x')
+        assert res == (1, 0, 0)
+        res = self.check(f, 'x')
+        assert res == (0, 1, 0)
+        res = self.check(f, 'x')
+        assert res == (0, 1, 0)
+        #
+        A.y = 5      # unrelated, but changes the version_tag
+        res = self.check(f, 'x')
+        assert res == (1, 0, 0)
+        res = self.check(f, 'x')
+        assert res == (0, 1, 0)
+        #
+        a.x = 42     # changes the map, and now the instance attribute is read
+        res = self.check(f, 'x')
+        assert res == (1, 0, 0)
+        res = self.check(f, 'x')
+        assert res == (0, 1, 0)
+
+    def test_class_attribute_not_cached(self):
+        class D(object):
+            pass
+        class A(object):
+            x = D()
+            y = staticmethod(len)
+        a = A()
+        def f():
+            a.x
+            return 42
+        def g():
+            a.y
+            return 42
+        # instances of user classes could get a __get__ later
+        res = self.check(f, 'x')
+        assert res == (0, 0, 1)
+        res = self.check(f, 'x')
+        assert res == (0, 0, 1)
+        # and staticmethods are descriptors
+        res = self.check(g, 'y')
+        assert res == (0, 0, 1)
+        res = self.check(g, 'y')
+        assert res == (0, 0, 1)
 
     def test_dont_keep_class_alive(self):
         import weakref
@@ -1271,57 +1478,41 @@ class AppTestGlobalCaching(AppTestWithMapDict):
 
     def test_mix_classes(self):
         import __pypy__
-        seen = []
-        for i in range(20):
-            class A(object):
-                def f(self):
-                    return 42
-            class B(object):
-                def f(self):
-                    return 43
-            class C(object):
-                def f(self):
-                    return 44
-            l = [A(), B(), C()] * 10
-            __pypy__.reset_method_cache_counter()
-            # 'exec' to make sure that a.f() is compiled with CALL_METHOD
-            exec """for i, a in enumerate(l):
-                        assert a.f() == 42 + i % 3
-            """ in locals()
-            cache_counter = __pypy__.mapdict_cache_counter("f")
-            if cache_counter == (27, 3):
-                break
-            # keep them alive, to make sure that on the
-            # next try they have difference addresses
-            seen.append((l, cache_counter))
-        else:
-            assert 0, "failed: got %r" % ([got[1] for got in seen],)
+        class A(object):
+            def f(self):
+                return 42
+        class B(object):
+            def f(self):
+                return 43
+        class C(object):
+            def f(self):
+                return 44
+        l = [A(), B(), C()] * 10
+        __pypy__.reset_method_cache_counter()
+        # 'exec' to make sure that a.f() is compiled with CALL_METHOD
+        exec """for i, a in enumerate(l):
+                    assert a.f() == 42 + i % 3
+        """ in locals()
+        # the cache of the site 'a.f()' holds the three classes, so only
+        # the first lookups get to the global cache
+        assert __pypy__.mapdict_cache_counter("f") == (0, 3)
 
     def test_mix_classes_attribute(self):
         import __pypy__
-        seen = []
-        for i in range(20):
-            class A(object):
-                def __init__(self):
-                    self.x = 42
-            class B(object):
-                def __init__(self):
-                    self.x = 43
-            class C(object):
-                def __init__(self):
-                    self.x = 44
-            l = [A(), B(), C()] * 10
-            __pypy__.reset_method_cache_counter()
-            for i, a in enumerate(l):
-                assert a.x == 42 + i % 3
-            cache_counter = __pypy__.mapdict_cache_counter("x")
-            if cache_counter == (27, 3):
-                break
-            # keep them alive, to make sure that on the
-            # next try they have difference addresses
-            seen.append((l, cache_counter))
-        else:
-            assert 0, "failed: got %r" % ([got[1] for got in seen],)
+        class A(object):
+            def __init__(self):
+                self.x = 42
+        class B(object):
+            def __init__(self):
+                self.x = 43
+        class C(object):
+            def __init__(self):
+                self.x = 44
+        l = [A(), B(), C()] * 10
+        __pypy__.reset_method_cache_counter()
+        for i, a in enumerate(l):
+            assert a.x == 42 + i % 3
+        assert __pypy__.mapdict_cache_counter("x") == (0, 3)
 
 class TestDictSubclassShortcutBug(object):
     spaceconfig = {"objspace.std.withmethodcachecounter": True}
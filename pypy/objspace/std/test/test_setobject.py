@@ -81,7 +81,7 @@ class TestW_SetObject:
     def test_create_set_from_list(self):
         from pypy.interpreter.baseobjspace import W_Root
         from pypy.objspace.std.setobject import BytesSetStrategy, ObjectSetStrategy, UnicodeSetStrategy
-        from pypy.objspace.std.floatobject import W_FloatObject
+        from pypy.objspace.std.setobject import FloatSetStrategy
 
         w = self.space.wrap
         wb = self.space.newbytes
@@ -118,9 +118,15 @@ class TestW_SetObject:
         w_list = W_ListObject(self.space, [w(1.0), w(2.0), w(3.0)])
         w_set = W_SetObject(self.space)
         _initialize_set(self.space, w_set, w_list)
+        assert w_set.strategy is self.space.fromcache(FloatSetStrategy)
+        assert sorted(w_set.strategy.unerase(w_set.sstorage)) == [1.0, 2.0, 3.0]
+
+        w_list = W_ListObject(self.space, [w(1.0), w(2), w(3.0)])
+        w_set = W_SetObject(self.space)
+        _initialize_set(self.space, w_set, w_list)
         assert w_set.strategy is self.space.fromcache(ObjectSetStrategy)
         for item in w_set.strategy.unerase(w_set.sstorage):
-            assert isinstance(item, W_FloatObject)
+            assert isinstance(item, W_Root)
 
         # changed cached object, need to change it back for other tests to pass
         intstr.get_storage_from_list = tmp_func
@@ -1032,6 +1038,102 @@ class AppTestAppSetTest:
         s.intersection_update(set())
         assert strategy(s) == "EmptySetStrategy"
 
+    def test_float_strategy(self):
+        from __pypy__ import strategy
+        s = set([1.5, 2.5, 1.5])
+        assert strategy(s) == "FloatSetStrategy"
+        assert sorted(s) == [1.5, 2.5]
+        s = set()
+        s.add(0.0)
+        assert strategy(s) == "FloatSetStrategy"
+        s.add(-0.0)
+        assert len(s) == 1
+        s.add(1)
+        assert strategy(s) == "ObjectSetStrategy"
+        assert len(s) == 2
+        #
+        nan = float('nan')
+        s = set([nan, nan, -nan])
+        assert strategy(s) == "FloatSetStrategy"
+        assert len(s) == 2
+        assert nan in s
+        assert float('inf') not in s
+
+    def test_float_strategy_lookup_int(self):
+        from __pypy__ import strategy
+        s = set([1.0, 2.5, -0.0, 2.0**62, float('inf')])
+        assert 1 in s
+        assert 0 in s
+        assert 2 not in s
+        assert 2**62 in s
+        assert 2**62 + 1 not in s
+        assert strategy(s) == "FloatSetStrategy"
+        s.remove(1)
+        assert 1.0 not in s
+        s.discard(2**62 + 1)
+        assert 2.0**62 in s
+        assert strategy(s) == "FloatSetStrategy"
+        #
+        s = set([1, 2, 2**62 + 1])
+        assert 1.0 in s
+        assert 2.5 not in s
+        assert float('nan') not in s
+        assert float('inf') not in s
+        assert 2.0**62 not in s
+        assert 1e100 not in s
+        s.discard(2.0)
+        assert s == set([1, 2**62 + 1])
+        assert strategy(s) == "IntegerSetStrategy"
+
+    def test_int_float_operations(self):
+        from __pypy__ import strategy
+        si = set([1, 2, 3, 4])
+        sf = set([2.0, 3.5, 4.0, 5.0, 6.0])
+        s = si & sf
+        assert s == set([2, 4])
+        assert type(list(s)[0]) is int
+        assert strategy(s) == "IntegerSetStrategy"
+        s = sf & si
+        assert s == set([2, 4])
+        assert strategy(s) == "IntegerSetStrategy"
+        s = si - sf
+        assert s == set([1, 3])
+        assert strategy(s) == "IntegerSetStrategy"
+        s = sf - si
+        assert s == set([3.5, 5.0, 6.0])
+        assert strategy(s) == "FloatSetStrategy"
+        assert not si.isdisjoint(sf)
+        assert set([1.0, 2.0]).issubset(si)
+        assert not set([1.5, 2.0]).issubset(si)
+        assert set([1.0, 2.0]) == set([1, 2])
+        assert set([1, 2]) == frozenset([1.0, 2.0])
+        s = si ^ sf
+        assert s == set([1, 3, 3.5, 5.0, 6.0])
+        s = si | sf
+        assert s == set([1, 2, 3, 4, 3.5, 5.0, 6.0])
+        assert strategy(s) == "ObjectSetStrategy"
+        #
+        s = set([1, 2, 3, 4])
+        s -= set([2.0, 3.5])
+        assert s == set([1, 3, 4])
+        assert strategy(s) == "IntegerSetStrategy"
+        s &= set([3.0, 4.0, 5.0, 6.0, 7.0])
+        assert s == set([3, 4])
+        assert strategy(s) == "IntegerSetStrategy"
+        assert strategy(sf) == "FloatSetStrategy"
+
+    def test_intersection_keeps_strategy(self):
+        from __pypy__ import strategy
+        s = set([1, 2, 3]) & set([2, 3, "a", "b", "c"])
+        assert s == set([2, 3])
+        assert strategy(s) == "IntegerSetStrategy"
+        s = set([2, 3, "a", "b", "c"]) & set([1, 2, 3])
+        assert s == set([2, 3])
+        assert strategy(s) == "IntegerSetStrategy"
+        s = set([1, 2, 3])
+        s &= set([2, 3, "a", "b", "c"])
+        assert strategy(s) == "IntegerSetStrategy"
+
     def test_weird_exception_from_iterable(self):
         def f():
            raise ValueError
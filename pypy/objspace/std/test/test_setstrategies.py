@@ -1,6 +1,7 @@
 from pypy.objspace.std.setobject import W_SetObject
 from pypy.objspace.std.setobject import (
     BytesIteratorImplementation, BytesSetStrategy, EmptySetStrategy,
+    FloatIteratorImplementation, FloatSetStrategy,
     IntegerIteratorImplementation, IntegerSetStrategy, ObjectSetStrategy,
     UnicodeIteratorImplementation, UnicodeSetStrategy)
 from pypy.objspace.std.listobject import W_ListObject
@@ -29,6 +30,9 @@ class TestW_SetStrategies:
         s = W_SetObject(self.space, self.wrapped([u"a", u"b"]))
         assert s.strategy is self.space.fromcache(UnicodeSetStrategy)
 
+        s = W_SetObject(self.space, self.wrapped([1.5, 2.5]))
+        assert s.strategy is self.space.fromcache(FloatSetStrategy)
+
     def test_switch_to_object(self):
         s = W_SetObject(self.space, self.wrapped([1,2,3,4,5]))
         s.add(self.space.wrap("six"))
@@ -133,11 +137,19 @@ class TestW_SetStrategies:
         assert isinstance(it, UnicodeIteratorImplementation)
         assert space.unwrap(it.next()) == u"a"
         assert space.unwrap(it.next()) == u"b"
+        #
+        s = W_SetObject(space, self.wrapped([1.5]))
+        it = s.iter()
+        assert isinstance(it, FloatIteratorImplementation)
+        assert space.unwrap(it.next()) == 1.5
 
     def test_listview(self):
         space = self.space
         s = W_SetObject(space, self.wrapped([1,2]))
         assert sorted(space.listview_int(s)) == [1, 2]
+        s = W_SetObject(space, self.wrapped([1.5, 2.5]))
+        assert sorted(space.listview_float(s)) == [1.5, 2.5]
+        assert space.listview_int(s) is None
         #
         s = W_SetObject(space, self.wrapped(["a", "b"]))
         assert sorted(space.listview_bytes(s)) == ["a", "b"]
@@ -0,0 +1,107 @@
+from pypy.objspace.std.test import test_bytesobject
+
+
+class AppTestStringBufferObject(test_bytesobject.AppTestBytesObject):
+    spaceconfig = {"objspace.std.withstrbuf": True}
+
+    def test_basic(self):
+        import __pypy__
+        s = "Hello, ".__add__("World!")
+        assert type(s) is str
+        assert 'W_StringBufferObject' in __pypy__.internal_repr(s)
+        assert s == "Hello, World!"
+
+    def test_add_loop(self):
+        import __pypy__
+        all = ""
+        for i in range(20):
+            all += str(i)
+        assert 'W_StringBufferObject' in __pypy__.internal_repr(all)
+        assert all == "012345678910111213141516171819"
+        assert len(all) == 30
+
+    def test_list_strategy(self):
+        from __pypy__ import strategy
+        s = "a".__add__("b")
+        l = ["x", "y"]
+        l.append(s)
+        assert strategy(l) == "BytesListStrategy"
+        assert l == ["x", "y", "ab"]
+        l = []
+        l.append(s)
+        assert strategy(l) == "BytesListStrategy"
+        assert strategy([s, "c"]) == "BytesListStrategy"
+        assert strategy(["c", s]) == "BytesListStrategy"
+
+    def test_set_strategy(self):
+        from __pypy__ import strategy
+        s = "a".__add__("b")
+        st = set(["x"])
+        st.add(s)
+        assert strategy(st) == "BytesSetStrategy"
+        assert st == set(["x", "ab"])
+        assert s in st
+        st = set()
+        st.add(s)
+        assert strategy(st) == "BytesSetStrategy"
+        assert strategy(set([s, "c"])) == "BytesSetStrategy"
+
+    def test_add_twice_to_the_same(self):
+        s = "a".__add__("b")
+        t = s + "c"
+        u = s + "d"
+        v = s + "e"
+        assert t == "abc"
+        assert u == "abd"
+        assert v == "abe"
+        assert s == "ab"
+        assert len(s) == 2
+
+    def test_add_strbuf(self):
+        s = "a".__add__("b")
+        t = "x".__add__("c")
+        u = "y".__add__("d")
+        assert s + t == "abxc"
+        assert s + u == "abyd"
+        assert "0" + s == "0ab"
+        assert t + s + u == "xcabyd"
+
+    def test_compare_and_hash(self):
+        s = "ab".__add__("c")
+        t = "a".__add__("bc")
+        assert s == t
+        assert not (s != t)
+        assert s <= t and s >= t
+        assert s < "abd" and "abd" > s
+        assert hash(s) == hash("abc")
+        d = {s: 42}
+        assert d["abc"] == 42
+        assert d[t] == 42
+
+    def test_methods(self):
+        s = "hello".__add__(" world")
+        assert s.upper() == "HELLO WORLD"
+        assert s.split() == ["hello", "world"]
+        assert s.replace("l", "L", 2) == "heLLo world"
+        assert s[1:3] == "el"
+        assert s[-1] == "d"
+        assert "o w" in s
+        assert s.startswith("hel")
+        assert "-".join([s, s]) == "hello world-hello world"
+        assert s.find("o".__add__("r")) == 7
+        assert "%s!" % s == "hello world!"
+        assert s * 2 == "hello worldhello world"
+        assert ord("a".__add__("")) == 97
+        assert str(s) is s
+
+    def test_add_unicode_and_bytearray(self):
+        s = "a".__add__("b")
+        assert s + u"c" == u"abc"
+        assert type(s + u"c") is unicode
+        assert s + bytearray("c") == bytearray("abc")
+        raises(TypeError, "s + 1")
+
+    def test_buffer(self):
+        s = "a".__add__("b")
+        assert buffer(s) == buffer("ab")
+        assert memoryview(s) == "ab"
@@ -0,0 +1,136 @@
+## ----------------------------------------------------------------------------
+## dict strategies for keys that are small tuples (see dictmultiobject.py)
+
+from rpython.rlib import rerased
+from rpython.rlib.longlong2float import float2longlong
+from rpython.rlib.objectmodel import compute_hash, r_dict, specialize
+from rpython.rlib.rarithmetic import intmask
+from rpython.rlib.unroll import unrolling_iterable
+from pypy.objspace.std.bytesobject import W_BytesObject
+from pypy.objspace.std.dictmultiobject import (AbstractTypedStrategy,
+                                               DictStrategy,
+                                               create_iterator_classes)
+from pypy.objspace.std.intobject import W_IntObject
+from pypy.objspace.std.specialisedtupleobject import Cls_ii, Cls_ff, Cls_oo
+
+
+def make_tuple_dict_strategy(Cls, kinds):
+    """Make a strategy for dicts whose keys are all instances of the
+    specialised tuple class 'Cls', with items of the given 'kinds': 'i'
+    for exact ints, 'f' for exact floats and 's' for exact byte strings.
+    The keys stay the tuple objects themselves, which already store their
+    items unboxed in the case of 'Cls_ii' and 'Cls_ff'; but they are
+    compared and hashed directly, without going through space.eq_w() and
+    space.hash_w().  These are never called on the items either, because
+    they are of exact built-in types.
+    """
+    iter_n = unrolling_iterable(enumerate(kinds))
+    boxed = Cls is Cls_oo
+
+    def is_key(w_key):
+        if type(w_key) is not Cls:
+            return False
+        if boxed:
+            for i, kind in iter_n:
+                w_item = getattr(w_key, 'value%d' % i)
+                if kind == 'i':
+                    if type(w_item) is not W_IntObject:
+                        return False
+                elif kind == 's':
+                    if type(w_item) is not W_BytesObject:
+                        return False
+                else:
+                    raise AssertionError
+        return True
+
+    @specialize.arg(1, 2)
+    def get_item(w_key, i, kind):
+        value = getattr(w_key, 'value%d' % i)
+        if boxed:
+            if kind == 'i':
+                assert isinstance(value, W_IntObject)
+                return value.intval
+            else:
+                assert isinstance(value, W_BytesObject)
+                return value._value
+        return value
+
+    def key_eq(w_key1, w_key2):
+        assert isinstance(w_key1, Cls)
+        assert isinstance(w_key2, Cls)
+        for i, kind in iter_n:
+            x = get_item(w_key1, i, kind)
+            y = get_item(w_key2, i, kind)
+            if x != y:
+                # the same NaN is equal to itself, as in the tuples
+                if not (kind == 'f' and
+                        float2longlong(x) == float2longlong(y)):
+                    return False
+        return True
+
+    def key_hash(w_key):
+        # the same algorithm as for tuples, but on the unboxed items
+        assert isinstance(w_key, Cls)
+        mult = 1000003
+        x = 0x345678
+        z = len(kinds)
+        for i, kind in iter_n:
+            y = compute_hash(get_item(w_key, i, kind))
+            x = (x ^ y) * mult
+            z -= 1
+            mult += 82520 + z + z
+        return intmask(x + 97531)
+
+    class TupleDictStrategy(AbstractTypedStrategy, DictStrategy):
+        erase, unerase = rerased.new_erasing_pair("tuple_" + kinds)
+        erase = staticmethod(erase)
+        unerase = staticmethod(unerase)
+
+        def wrap(self, unwrapped):
+            return unwrapped
+
+        def unwrap(self, wrapped):
+            return wrapped
+
+        def is_correct_type(self, w_obj):
+            return is_key(w_obj)
+
+        def get_empty_storage(self):
+            return self.erase(r_dict(key_eq, key_hash, force_non_null=True))
+
+        def _never_equal_to(self, w_lookup_type):
+            space = self.space
+            # XXX there are many more types
+            return (space.is_w(w_lookup_type, space.w_NoneType) or
+                    space.is_w(w_lookup_type, space.w_int) or
+                    space.is_w(w_lookup_type, space.w_bool) or
+                    space.is_w(w_lookup_type, space.w_float) or
+                    space.is_w(w_lookup_type, space.w_bytes) or
+                    space.is_w(w_lookup_type, space.w_unicode)
+                    )
+
+        def w_keys(self, w_dict):
+            return self.space.newlist(self.unerase(w_dict.dstorage).keys())
+
+    TupleDictStrategy.__name__ = 'TupleDictStrategy_' + kinds
+    TupleDictStrategy.is_key = staticmethod(is_key)
+    create_iterator_classes(TupleDictStrategy)
+    return TupleDictStrategy
+
+TupleDictStrategy_ii = make_tuple_dict_strategy(Cls_ii, 'ii')
+TupleDictStrategy_ff = make_tuple_dict_strategy(Cls_ff, 'ff')
+TupleDictStrategy_si = make_tuple_dict_strategy(Cls_oo, 'si')
+TupleDictStrategy_is = make_tuple_dict_strategy(Cls_oo, 'is')
+TupleDictStrategy_ss = make_tuple_dict_strategy(Cls_oo, 'ss')
+
+_all_strategies = unrolling_iterable([
+    TupleDictStrategy_ii, TupleDictStrategy_ff, TupleDictStrategy_si,
+    TupleDictStrategy_is, TupleDictStrategy_ss])
+
+def get_tuple_dict_strategy(space, w_key):
+    """Return the strategy to use for an empty dict in which 'w_key' is
+    inserted, or None if 'w_key' is not a tuple of a supported kind."""
+    for strategy in _all_strategies:
+        if strategy.is_key(w_key):
+            return space.fromcache(strategy)
+    return None
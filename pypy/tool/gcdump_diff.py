@@ -0,0 +1,284 @@
+#! /usr/bin/env python
+"""
+Compares two dumpfiles produced by gc.dump_rpy_heap(), typically taken
+before and after a leak, and prints which types of objects grew, and
+the dominant chains of types that keep the objects of the types that
+grew the most alive.
+
+Syntax:  gcdump_diff.py [options] <old dumpfile> <new dumpfile> [<typeids.txt>]
+
+Both dumps must come from the same pypy executable.  By default,
+typeids.txt is loaded from the same dir as the new dumpfile, or else
+from gc.get_typeids_z() if running on top of PyPy.
+
+The dumpfiles are read in chunks and the retaining paths are computed
+from a random sample of the objects, so the memory used stays bounded
+even for dumps of several GB.  The new dumpfile is read once for every
+level of the retaining paths.
+"""
+import sys, os, array, random
+import optparse
+
+from gcdump import Stat
+
+GCROOT = 0             # typenum of the marker after the roots
+CHUNK = 1024 * 1024    # words read at once
+
+
+def read_objects(filename, chunk=CHUNK):
+    """Yields (address, typenum, size, links) for all the objects in the
+    dumpfile, reading it in chunks.  The roots come first, followed by
+    the marker (0, GCROOT, 0, [])."""
+    f = open(filename, 'rb')
+    try:
+        buf = []
+        i = 0
+        while True:
+            a = array.array('l')
+            try:
+                a.fromfile(f, chunk)
+            except EOFError:
+                pass      # 'a' contains the end of the file
+            if not a:
+                break
+            buf = buf[i:] + a.tolist()
+            i = 0
+            while True:
+                try:
+                    j = buf.index(-1, i + 3)
+                except ValueError:
+                    break
+                yield buf[i], buf[i+1], buf[i+2], buf[i+3:j]
+                i = j + 1
+    finally:
+        f.close()
+    if i < len(buf):
+        raise ValueError("%s: invalid or truncated dump file "
+                         "(or 32/64-bit mix)" % (filename,))
+
+
+def summarize(filename):
+    """Returns {typenum: [count, totalsize]}."""
+    summary = {}
+    for _, typenum, size, _ in read_objects(filename):
+        if typenum == GCROOT:
+            continue
+        try:
+            stat = summary[typenum]
+        except KeyError:
+            stat = summary[typenum] = [0, 0]
+        stat[0] += 1
+        stat[1] += size
+    return summary
+
+
+def diff_summaries(old_summary, new_summary):
+    """Returns a list of (delta_size, delta_count, count, size, typenum),
+    biggest growth first."""
+    result = []
+    for typenum in set(old_summary) | set(new_summary):
+        old_count, old_size = old_summary.get(typenum, (0, 0))
+        count, size = new_summary.get(typenum, (0, 0))
+        if (count, size) != (old_count, old_size):
+            result.append((size - old_size, count - old_count,
+                           count, size, typenum))
+    result.sort(reverse=True)
+    return result
+
+
+def sample_objects(filename, counts, sample_size, rng):
+    """Returns {typenum: set of addresses}, with about 'sample_size'
+    random objects for each typenum in 'counts' ({typenum: count})."""
+    rates = {}
+    samples = {}
+    for typenum, count in counts.items():
+        rates[typenum] = float(sample_size) / max(count, 1)
+        samples[typenum] = set()
+    for addr, typenum, _, _ in read_objects(filename):
+        if typenum in rates and rng.random() < rates[typenum]:
+            samples[typenum].add(addr)
+    return samples
+
+
+def find_parents(filename, targets, max_parents):
+    """'targets' is {key: set of addresses}.  Returns
+    {key: {parent_typenum: (set of children, set of parents)}}, where
+    'children' are the addresses in targets[key] referenced from at
+    least one object of type 'parent_typenum', and 'parents' are at
+    most 'max_parents' of these objects.  The targets that are roots
+    are reported with the parent_typenum GCROOT."""
+    owners = {}
+    result = {}
+    for key, addrs in targets.items():
+        result[key] = {}
+        for addr in addrs:
+            owners.setdefault(addr, []).append(key)
+    in_roots = True
+    for addr, typenum, _, links in read_objects(filename):
+        if typenum == GCROOT:
+            in_roots = False
+            continue
+        if in_roots and addr in owners:
+            for key in owners[addr]:
+                children, _ = result[key].setdefault(GCROOT, (set(), set()))
+                children.add(addr)
+        for link in links:
+            if link in owners:
+                for key in owners[link]:
+                    children, parents = result[key].setdefault(
+                        typenum, (set(), set()))
+                    children.add(link)
+                    if len(parents) < max_parents:
+                        parents.add(addr)
+    return result
+
+
+def find_retaining_paths(filename, counts, sample_size=1000, max_depth=10,
+                         rng=None):
+    """For each typenum in 'counts' ({typenum: count}), returns the
+    dominant retaining path: a list of (typenum, fraction), starting
+    with (typenum, 1.0), where each following item is the type of
+    object that references most of the sampled objects of the previous
+    item, and 'fraction' is how many of the initial sample are still
+    reached that way.  The path ends at GCROOT if it reaches the roots.
+    """
+    if rng is None:
+        rng = random.Random(42)
+    targets = sample_objects(filename, counts, sample_size, rng)
+    paths = {}
+    fractions = {}
+    seen = {}
+    for typenum in counts:
+        paths[typenum] = [(typenum, 1.0)]
+        fractions[typenum] = 1.0
+        seen[typenum] = set(targets[typenum])
+        if not targets[typenum]:
+            del targets[typenum]
+    depth = 0
+    while targets and depth < max_depth:
+        depth += 1
+        found = find_parents(filename, targets, sample_size)
+        for key, addrs in targets.items():
+            candidates = found[key]
+            heads = addrs
+            typenum = paths[key][-1][0]
+            if typenum in candidates:
+                children, parents = candidates[typenum]
+                if not (parents - seen[key]):
+                    # references between the objects already seen only,
+                    # e.g. a linked list that is completely in the sample:
+                    # look at who references the rest
+                    del candidates[typenum]
+                    heads = (addrs - children) or addrs
+            best = None
+            for parent_typenum, (children, parents) in candidates.items():
+                children = children & heads
+                if best is None or len(children) > len(best[1]):
+                    best = (parent_typenum, children, parents)
+            if best is None:
+                del targets[key]     # not reachable any more?
+                continue
+            parent_typenum, children, parents = best
+            fractions[key] *= float(len(children)) / len(heads)
+            paths[key].append((parent_typenum, fractions[key]))
+            # don't walk again the objects in reference cycles
+            parents -= seen[key]
+            if parent_typenum == GCROOT or not parents:
+                del targets[key]
+            else:
+                seen[key] |= parents
+                targets[key] = parents
+    return paths
+
+
+def format_path(path, get_type_name):
+    lines = []
+    prev = None
+    repeat = 0
+    for typenum, fraction in path + [(None, None)]:
+        if typenum == prev:
+            repeat += 1
+            prev_fraction = fraction
+            continue
+        if prev is not None:
+            if repeat > 1:
+                name = '%s (x%d)' % (get_type_name(prev), repeat)
+            else:
+                name = get_type_name(prev)
+            if lines:
+                name = '<- ' + name
+            lines.append('%7.1f%%  %s' % (prev_fraction * 100.0, name))
+        prev = typenum
+        prev_fraction = fraction
+        repeat = 1
+    return lines
+
+
+def main(old_filename, new_filename, typeids, options):
+    stat = Stat()
+    stat.load_typeids(typeids)
+    get_type_name = stat.get_type_name
+    #
+    print >> sys.stderr, 'reading %s...' % (old_filename,)
+    old_summary = summarize(old_filename)
+    print >> sys.stderr, 'reading %s...' % (new_filename,)
+    new_summary = summarize(new_filename)
+    diff = diff_summaries(old_summary, new_summary)
+    #
+    print '%10s %10s %10s %10s  %s' % ('count', 'delta', 'size', 'delta',
+                                       'type')
+    for delta_size, delta_count, count, size, typenum in diff[:options.limit]:
+        print '%10d %+10d %9.2fM %+9.2fM  %s' % (
+            count, delta_count, size / (1024.0*1024.0),
+            delta_size / (1024.0*1024.0), get_type_name(typenum))
+    delta_total = sum([item[0] for item in diff])
+    print 'total delta %+.1fM' % (delta_total / (1024.0*1024.0),)
+    #
+    counts = {}
+    for delta_size, delta_count, count, size, typenum in diff[:options.paths]:
+        if delta_count > 0:
+            counts[typenum] = count
+    if not counts:
+        return
+    print >> sys.stderr, 'finding retaining paths...'
+    paths = find_retaining_paths(new_filename, counts, options.sample,
+                                 options.depth, random.Random(options.seed))
+    for delta_size, delta_count, count, size, typenum in diff:
+        if typenum in paths:
+            print
+            print 'Retaining path of %s (%+d objects):' % (
+                get_type_name(typenum), delta_count)
+            for line in format_path(paths[typenum], get_type_name):
+                print line
+
+
+if __name__ == '__main__':
+    parser = optparse.OptionParser(
+        usage="%prog [options] <old dumpfile> <new dumpfile> [<typeids.txt>]")
+    parser.format_description = lambda fmt: __doc__
+    parser.description = __doc__
+    parser.add_option('-n', '--limit', type=int, default=30,
+                      help='number of types to list (default: %default)')
+    parser.add_option('-p', '--paths', type=int, default=5,
+                      help='number of types that grew the most for which '
+                           'to find the retaining paths (default: %default)')
+    parser.add_option('-s', '--sample', type=int, default=1000,
+                      help='number of objects sampled per type to find the '
+                           'retaining paths (default: %default)')
+    parser.add_option('-d', '--depth', type=int, default=10,
+                      help='maximum length of the retaining paths '
+                           '(default: %default)')
+    parser.add_option('--seed', type=int, default=42,
+                      help='random seed for the sampling')
+    options, args = parser.parse_args()
+    if len(args) not in (2, 3):
+        parser.print_help()
+        sys.exit(2)
+    if len(args) > 2:
+        typeids = args[2]
+    else:
+        typeids = os.path.join(os.path.dirname(args[1]), 'typeids.txt')
+    if not os.path.isfile(typeids):
+        import zlib, gc
+        typeids = zlib.decompress(gc.get_typeids_z()).split("\n")
+    main(args[0], args[1], typeids, options)
@@ -0,0 +1,103 @@
+import array
+import py
+from pypy.tool import gcdump_diff
+from pypy.tool.gcdump import Stat
+from rpython.tool.udir import udir
+
+TYPEIDS = ['', 'member1 GcStruct Root', 'member2 GcStruct Dict',
+           'member3 GcStruct Leak', 'member4 GcStruct Other']
+
+
+def write_dump(filename, roots, objects):
+    # 'roots' and 'objects' are lists of (addr, typenum, size, links)
+    a = array.array('l')
+    for addr, typenum, size, links in roots + [(0, 0, 0, [])] + objects:
+        a.extend([addr, typenum, size] + links + [-1])
+    f = open(filename, 'wb')
+    a.tofile(f)
+    f.close()
+    return filename
+
+def make_dumps(nleaks, chain=False):
+    old = write_dump(str(udir.join('gcdump_diff_old')),
+                     [(1000, 1, 16, [2000, 3000])],
+                     [(2000, 2, 32, []), (3000, 4, 24, [])])
+    leaks = [(5000 + 16 * i, 3, 16, []) for i in range(nleaks)]
+    if chain:
+        # a linked list: Dict -> Leak -> Leak -> ...
+        for i in range(nleaks - 1):
+            leaks[i][3].append(leaks[i + 1][0])
+        dict_links = [leaks[0][0]]
+    else:
+        dict_links = [leak[0] for leak in leaks]
+    new = write_dump(str(udir.join('gcdump_diff_new')),
+                     [(1000, 1, 16, [2000, 3000])],
+                     [(2000, 2, 48, dict_links), (3000, 4, 24, [])] + leaks)
+    return old, new
+
+def test_read_objects():
+    old, new = make_dumps(5, chain=True)
+    expected = list(gcdump_diff.read_objects(new))
+    assert expected[:3] == [(1000, 1, 16, [2000, 3000]), (0, 0, 0, []),
+                            (2000, 2, 48, [5000])]
+    assert len(expected) == 9
+    for chunk in range(1, 8):
+        assert list(gcdump_diff.read_objects(new, chunk)) == expected
+
+def test_read_objects_truncated():
+    old, new = make_dumps(5)
+    data = open(new, 'rb').read()
+    fn = str(udir.join('gcdump_diff_truncated'))
+    with open(fn, 'wb') as f:
+        f.write(data[:-array.array('l').itemsize])
+    py.test.raises(ValueError, list, gcdump_diff.read_objects(fn))
+
+def test_diff_summaries():
+    old, new = make_dumps(5)
+    diff = gcdump_diff.diff_summaries(gcdump_diff.summarize(old),
+                                      gcdump_diff.summarize(new))
+    assert diff == [(80, 5, 5, 80, 3), (16, 0, 1, 48, 2)]
+
+def test_retaining_paths():
+    old, new = make_dumps(50)
+    paths = gcdump_diff.find_retaining_paths(new, {3: 50, 2: 1},
+                                             sample_size=10)
+    assert paths[2] == [(2, 1.0), (1, 1.0), (0, 1.0)]
+    assert paths[3] == [(3, 1.0), (2, 1.0), (1, 1.0), (0, 1.0)]
+    stat = Stat()
+    stat.load_typeids(TYPEIDS)
+    lines = gcdump_diff.format_path(paths[3], stat.get_type_name)
+    assert lines == ['  100.0%  Leak', '  100.0%  <- Dict',
+                     '  100.0%  <- Root', '  100.0%  <- <GCROOT>']
+
+def test_retaining_paths_chain():
+    old, new = make_dumps(5, chain=True)
+    paths = gcdump_diff.find_retaining_paths(new, {3: 5}, sample_size=10)
+    assert paths[3] == [(3, 1.0), (2, 1.0), (1, 1.0), (0, 1.0)]
+    #
+    # a chain much longer than the sample: walk up the chain
+    old, new = make_dumps(50, chain=True)
+    paths = gcdump_diff.find_retaining_paths(new, {3: 50}, sample_size=10,
+                                             max_depth=4)
+    assert [typenum for typenum, _ in paths[3]] == [3] * 5
+    stat = Stat()
+    stat.load_typeids(TYPEIDS)
+    lines = gcdump_diff.format_path(paths[3], stat.get_type_name)
+    assert len(lines) == 1 and lines[0].endswith('%  Leak (x5)')
+
+def test_main(capsys):
+    class options:
+        limit = 10
+        paths = 5
+        sample = 10
+        depth = 10
+        seed = 42
+    old, new = make_dumps(50)
+    gcdump_diff.main(old, new, TYPEIDS, options)
+    out, err = capsys.readouterr()
+    lines = out.splitlines()
+    assert lines[1].split() == ['50', '+50', '0.00M', '+0.00M', 'Leak']
+    assert lines[2].split() == ['1', '+0', '0.00M', '+0.00M', 'Dict']
+    assert 'Retaining path of Leak (+50 objects):' in lines
+    assert '  100.0%  <- Dict' in lines
+    assert 'Retaining path of Dict' not in out    # its count didn't grow
@@ -23,6 +23,9 @@ from rpython.rlib.rarithmetic import ovfcheck, r_uint, r_ulonglong, intmask
 from rpython.rlib.objectmodel import Symbolic, compute_hash
 
 class LLAsmInfo(object):
+    asmaddr = 0
+    asmlen = 0
+
     def __init__(self, lltrace):
         self.ops_offset = None
         self.lltrace = lltrace
@@ -1,6 +1,7 @@
 import weakref
 from rpython.rlib.debug import debug_start, debug_print, debug_stop
 from rpython.rtyper.lltypesystem import lltype, llmemory
+from rpython.jit.metainterp.history import BASELINE_COUNTER
 
 class CPUTotalTracker(object):
     total_compiled_loops = 0
@@ -284,6 +285,9 @@ class AbstractCPU(object):
 class CompiledLoopToken(object):
     asmmemmgr_blocks = None
     asmmemmgr_gcreftracers = None
+    # for loops compiled by the baseline tier: the raw counter used by
+    # the machine code, freed together with it
+    baseline_counter = lltype.nullptr(BASELINE_COUNTER)
 
     def __init__(self, cpu, number):
         cpu.tracker.total_compiled_loops += 1
@@ -325,6 +329,10 @@ class CompiledLoopToken(object):
         #debug_print("freeing Loop #", self.number, 'with',
         #            self.bridges_count, 'attached bridges')
         self.cpu.free_loop_and_bridges(self)
+        if self.baseline_counter:
+            lltype.free(self.baseline_counter, flavor='raw',
+                        track_allocation=False)
+            self.baseline_counter = lltype.nullptr(BASELINE_COUNTER)
         self.cpu.tracker.total_freed_loops += 1
         self.cpu.tracker.total_freed_bridges += self.bridges_count
         #debug_stop("jit-mem-looptoken-free")
@@ -14,7 +14,7 @@ from rpython.jit.metainterp.resoperation import ResOperation, rop,\
      get_deep_immutable_oplist, OpHelpers, InputArgInt, InputArgRef,\
      InputArgFloat
 from rpython.jit.metainterp.history import (TreeLoop, Const, JitCellToken,
-    TargetToken, AbstractFailDescr, ConstInt)
+    TargetToken, AbstractFailDescr, ConstInt, CodeProfile)
 from rpython.jit.metainterp import history, jitexc
 from rpython.jit.metainterp.optimize import InvalidLoop
 from rpython.jit.metainterp.resume import (PENDINGFIELDSP,
@@ -522,6 +522,27 @@ def forget_optimization_info(lst, reset_values=False):
         if reset_values:
             item.reset_value()
 
+def record_code_profile(metainterp_sd, looptoken, type, location, fail_descr,
+                        asminfo, operations):
+    # if the 'profile_guards' parameter is set, remember the guards of the
+    # new loop or bridge, so that their failure counts can be read by
+    # jit_hooks.stats_get_guard_profile()
+    guards = None
+    warmrunnerdesc = metainterp_sd.warmrunnerdesc
+    if (warmrunnerdesc is not None and    # for tests
+            warmrunnerdesc.memory_manager.profile_guards):
+        guards = []
+        for op in operations:
+            if op.is_guard():
+                descr = op.getdescr()
+                if isinstance(descr, AbstractResumeGuardDescr):
+                    guards.append(descr)
+    asmlen = 0
+    if asminfo is not None:
+        asmlen = asminfo.asmlen
+    looptoken.add_code_profile(CodeProfile(type, location, fail_descr,
+                                           asmlen, guards))
+
 def send_loop_to_backend(greenkey, jitdriver_sd, metainterp_sd, loop, type,
                          orig_inpargs, memo):
     forget_optimization_info(loop.operations)
@@ -563,6 +584,8 @@ def send_loop_to_backend(greenkey, jitdriver_sd, metainterp_sd, loop, type,
     finally:
         debug_stop("jit-backend")
     metainterp_sd.profiler.end_backend()
+    record_code_profile(metainterp_sd, original_jitcell_token, type,
+                        loopname, None, asminfo, operations)
     if hooks is not None:
         debug_info.asminfo = asminfo
         hooks.after_compile(debug_info)
@@ -611,6 +634,8 @@ def send_bridge_to_backend(jitdriver_sd, metainterp_sd, faildescr, inputargs,
     finally:
         debug_stop("jit-backend")
     metainterp_sd.profiler.end_backend()
+    record_code_profile(metainterp_sd, original_loop_token, 'bridge',
+                        None, faildescr, asminfo, operations)
     if hooks is not None:
         debug_info.asminfo = asminfo
         hooks.after_compile_bridge(debug_info)
@@ -628,6 +653,9 @@ def send_bridge_to_backend(jitdriver_sd, metainterp_sd, faildescr, inputargs,
     #if metainterp_sd.warmrunnerdesc is not None:    # for tests
     #    metainterp_sd.warmrunnerdesc.memory_manager.keep_loop_alive(
     #        original_loop_token)
+    if metainterp_sd.warmrunnerdesc is not None:    # for tests
+        metainterp_sd.warmrunnerdesc.memory_manager.bridge_compiled(
+            original_loop_token)
     return asminfo
 
 # ____________________________________________________________
@@ -704,6 +732,14 @@ def make_done_loop_tokens():
     d.update(locals())
     return d
 
+def count_guard_failure(metainterp_sd, descr):
+    # for stats_get_guard_profile() and the guard storm detection; does
+    # nothing unless one of them is enabled
+    warmrunnerdesc = metainterp_sd.warmrunnerdesc
+    if (warmrunnerdesc is not None and
+            warmrunnerdesc.memory_manager is not None):   # all for tests
+        warmrunnerdesc.memory_manager.count_guard_failure(descr)
+
 class ResumeDescr(AbstractFailDescr):
     _attrs_ = ()
 
@@ -727,6 +763,7 @@ class AbstractResumeGuardDescr(ResumeDescr):
     TY_FLOAT        = 0x06
 
     def handle_fail(self, deadframe, metainterp_sd, jitdriver_sd):
+        count_guard_failure(metainterp_sd, self)
         if (self.must_compile(deadframe, metainterp_sd, jitdriver_sd)
                 and not rstack.stack_almost_full()):
             self.start_compiling()
@@ -804,7 +841,14 @@ class AbstractResumeGuardDescr(ResumeDescr):
                           intval * 1442968193)
         #
         increment = jitdriver_sd.warmstate.increment_trace_eagerness
-        return jitcounter.tick(hash, increment)
+        if not jitcounter.tick(hash, increment):
+            return False
+        if rstack.stack_almost_full():
+            return False
+        if not jitcounter.may_start_tracing():
+            jitcounter.postpone(hash)
+            return False
+        return True
 
     def start_compiling(self):
         # start tracing and compiling from this guard.
@@ -968,6 +1012,7 @@ class ResumeGuardForcedDescr(ResumeGuardDescr):
         # the virtualrefs and virtualizable have been forced by
         # handle_async_forcing() just a moment ago.
         from rpython.jit.metainterp.blackhole import resume_in_blackhole
+        count_guard_failure(metainterp_sd, self)
         hidden_all_virtuals = metainterp_sd.cpu.get_savedata_ref(deadframe)
         obj = AllVirtuals.show(metainterp_sd.cpu, hidden_all_virtuals)
         all_virtuals = obj.cache
@@ -1027,6 +1072,7 @@ class ResumeFromInterpDescr(ResumeDescr):
         metainterp_sd = metainterp.staticdata
         jitdriver_sd = metainterp.jitdriver_sd
         new_loop.original_jitcell_token = jitcell_token = make_jitcell_token(jitdriver_sd)
+        jitcell_token.baseline = metainterp.baseline_tier
         propagate_original_jitcell_token(new_loop)
         send_loop_to_backend(self.original_greenkey, metainterp.jitdriver_sd,
                              metainterp_sd, new_loop, "entry bridge",
@@ -1,4 +1,6 @@
+import time
 from rpython.rlib.rarithmetic import r_singlefloat, r_uint
+from rpython.rlib import rtime     # needed for time.time() to be RPython
 from rpython.rtyper.lltypesystem import lltype, rffi
 from rpython.translator.tool.cbuild import ExternalCompilationInfo
 
@@ -78,6 +80,13 @@ class JitCounter:
     'cleanup_chain(hash)' resets the timetable's 'hash' entry and
     cleans up the celltable at 'hash'.  It removes those JitCells
     for which 'cell.should_remove_jitcell()' returns True.
+
+    'set_compile_interval(ms)', 'may_start_tracing()' implement the
+    'compile_interval' parameter: a global limit on how often we start
+    tracing, to spread the pauses caused by tracing and compiling
+    during warm-up.  When may_start_tracing() returns False, the caller
+    should use 'postpone(hash)' so that we try again after a few more
+    iterations.
     """
     DEFAULT_SIZE = 2048
 
@@ -102,6 +111,9 @@ class JitCounter:
         # The table of JitCell entries, recording already-compiled loops
         self.celltable = [None] * size
         #
+        self.compile_interval = 0.0
+        self.next_tracing_time = 0.0
+        #
         if translator is not None:
             class Glob:
                 step = 0
@@ -255,6 +267,26 @@ class JitCounter:
             cell = nextcell
         self.celltable[index] = keep
 
+    def set_compile_interval(self, milliseconds):
+        if milliseconds < 0:
+            milliseconds = 0
+        self.compile_interval = milliseconds * 0.001
+        self.next_tracing_time = 0.0
+
+    def may_start_tracing(self):
+        if self.compile_interval <= 0.0:
+            return True
+        now = time.time()
+        if now < self.next_tracing_time:
+            return False
+        self.next_tracing_time = now + self.compile_interval
+        return True
+
+    def postpone(self, hash):
+        # the counter for 'hash' reached the bound but we don't want to
+        # start tracing right now.  Put it back close to the bound.
+        self.change_current_fraction(hash, 0.99)
+
     def set_decay(self, decay):
         """Set the decay, from 0 (none) to 1000 (max)."""
         if decay < 0:
@@ -394,6 +394,9 @@ _const_ptr_for_unicode = {}
 # The JitCellToken class is the root of a tree of traces.  Each branch ends
 # in a jump which goes to a LABEL operation; or it ends in a FINISH.
 
+# the raw counter of iterations of a loop compiled by the baseline tier
+BASELINE_COUNTER = lltype.Array(lltype.Signed, hints={'nolength': True})
+
 class JitCellToken(AbstractDescr):
     """Used for rop.JUMP, giving the target of the jump.
     This is different from TreeLoop: the TreeLoop class contains the
@@ -406,7 +409,19 @@ class JitCellToken(AbstractDescr):
     retraced_count = 0
     terminating = False # see TerminatingLoopToken in compile.py
     invalidated = False
+    baseline = False    # compiled by the cheap 'baseline_threshold' tier
+    # for baseline loops: raw counter of the iterations, incremented by
+    # the loop itself, and the value at which its guard fails
+    baseline_counter = lltype.nullptr(BASELINE_COUNTER)
+    baseline_upgrade_limit = 0
     outermost_jitdriver_sd = None
+    entry_count = 0     # number of times entered from the interpreter
+    # guard failure storms, see WarmEnterState.check_guard_storm()
+    storm_failures = 0
+    storm_entries = 0
+    storm_retraces = 0
+    retrace_requested = False
+    code_profiles = None  # list of CodeProfile, for the loop and its bridges
     # and more data specified by the backend when the loop is compiled
     number = -1
     generation = r_int64(0)
@@ -415,6 +430,8 @@ class JitCellToken(AbstractDescr):
     # CompiledLoopToken has its __del__ called, which frees the assembler
     # memory and the ResumeGuards.
     compiled_loop_token = None
+    # size of the machine code included in MemoryManager.code_memory
+    counted_code_size = 0
 
     def __init__(self):
         # For memory management of assembled loops
@@ -433,6 +450,38 @@ class JitCellToken(AbstractDescr):
     def dump(self):
         self.compiled_loop_token.cpu.dump_loop_token(self)
 
+    def baseline_upgrade_due(self):
+        """True if this baseline loop ran enough iterations to be traced
+        again with all optimizations.  Resets the counter."""
+        counter = self.baseline_counter
+        if not counter or counter[0] < self.baseline_upgrade_limit:
+            return False
+        counter[0] = 0
+        return True
+
+    def must_be_replaced(self):
+        """True if the next time this loop becomes hot, we trace it again
+        and replace it with the result (see MetaInterp.replacing_loop)."""
+        return self.baseline or self.retrace_requested
+
+    def add_code_profile(self, code_profile):
+        if self.code_profiles is None:
+            self.code_profiles = []
+        self.code_profiles.append(code_profile)
+
+class CodeProfile(object):
+    """Execution profile of one loop or bridge, as returned by
+    jit_hooks.stats_get_loop_profile() and stats_get_guard_profile().
+    'fail_descr' is the guard a bridge is attached to, or None for loops.
+    'guards' is None unless the 'profile_guards' parameter was set.
+    """
+    def __init__(self, type, location, fail_descr, asmlen, guards):
+        self.type = type
+        self.location = location
+        self.fail_descr = fail_descr
+        self.asmlen = asmlen
+        self.guards = guards
+
 class TargetToken(AbstractDescr):
     _ll_loop_code = 0     # for the backend.  If 0, we know that it is
                           # a LABEL that was not compiled yet.
@@ -1,7 +1,11 @@
 import math
+from rpython.rtyper.lltypesystem import lltype
 from rpython.rlib.rarithmetic import r_int64
 from rpython.rlib.debug import debug_start, debug_print, debug_stop
-from rpython.rlib.objectmodel import we_are_translated
+from rpython.rlib.objectmodel import we_are_translated, compute_unique_id
+from rpython.rlib.listsort import make_timsort_class
+from rpython.rlib.rweakref import RWeakKeyDictionary
+from rpython.jit.metainterp.history import AbstractFailDescr
 
 #
 # Logic to decide which loops are old and not used any more.
@@ -19,6 +23,39 @@ from rpython.rlib.objectmodel import we_are_translated
 # 'generation' field is much smaller than the current generation, and
 # removed from the set.
 #
+# Additionally, if 'max_code_memory' is set, we enforce a budget on the
+# total size of the machine code of the loops in 'alive_loops' (which
+# includes their bridges).  When the budget is exceeded, we remove the
+# least recently used loops until we are comfortably below it again.
+# The total is kept up-to-date in 'code_memory': the size of each loop
+# is added when it enters 'alive_loops' or gets a new bridge, and
+# subtracted when it leaves 'alive_loops'.  Like for old loops, removing
+# a loop from 'alive_loops' does not free its machine code immediately:
+# this only occurs when the GC finds that nothing else references it.
+#
+
+def _generation_lt(looptoken1, looptoken2):
+    return looptoken1.generation < looptoken2.generation
+
+LoopTokenSort = make_timsort_class(lt=_generation_lt)
+
+
+def get_code_size(looptoken):
+    """Size in bytes of the machine code of a loop and its bridges."""
+    clt = looptoken.compiled_loop_token
+    if clt is None or clt.asmmemmgr_blocks is None:
+        return 0
+    size = 0
+    for rawstart, rawstop in clt.asmmemmgr_blocks:
+        size += rawstop - rawstart
+    return size
+
+
+class GuardFailures(object):
+    # value in MemoryManager.guard_failures
+    def __init__(self):
+        self.count = 0
+
 
 class MemoryManager(object):
 
@@ -38,6 +75,46 @@ class MemoryManager(object):
         self.current_generation = r_int64(1)
         self.next_check = r_int64(-1)
         self.alive_loops = {}
+        self.max_code_memory = 0
+        self.code_memory = 0
+        self.profile_guards = False
+        # number of failures of each guard, only counted if needed for
+        # 'profile_guards' or 'guard_storm_limit': most programs don't
+        # use them, and a field on every guard descr costs memory
+        self.count_guard_failures = False
+        self.guard_failures = RWeakKeyDictionary(AbstractFailDescr,
+                                                 GuardFailures)
+        # statistics, see jit_hooks.stats_memmgr_dropped_*()
+        self.dropped_loops = 0
+        self.dropped_bytes = 0
+
+    def set_max_code_memory(self, max_code_memory):
+        if max_code_memory < 0:
+            max_code_memory = 0
+        self.max_code_memory = max_code_memory
+
+    def set_profile_guards(self, flag):
+        self.profile_guards = flag
+        if flag:
+            self.count_guard_failures = True
+
+    def enable_guard_failure_counts(self):
+        self.count_guard_failures = True
+
+    def count_guard_failure(self, descr):
+        if not self.count_guard_failures:
+            return
+        entry = self.guard_failures.get(descr)
+        if entry is None:
+            entry = GuardFailures()
+            self.guard_failures.set(descr, entry)
+        entry.count += 1
+
+    def get_guard_failures(self, descr):
+        entry = self.guard_failures.get(descr)
+        if entry is None:
+            return 0
+        return entry.count
 
     def set_max_age(self, max_age, check_frequency=0):
         if max_age <= 0:
@@ -54,11 +131,35 @@ class MemoryManager(object):
         if self.current_generation == self.next_check:
             self._kill_old_loops_now()
             self.next_check = self.current_generation + self.check_frequency
+        if self.max_code_memory > 0:
+            self._enforce_code_memory_budget()
 
     def keep_loop_alive(self, looptoken):
         if looptoken.generation != self.current_generation:
             looptoken.generation = self.current_generation
-            self.alive_loops[looptoken] = None
+            if looptoken not in self.alive_loops:
+                self.alive_loops[looptoken] = None
+                self._count_code_size(looptoken)
+
+    def bridge_compiled(self, looptoken):
+        if looptoken in self.alive_loops:
+            self._count_code_size(looptoken)
+
+    def _count_code_size(self, looptoken):
+        size = get_code_size(looptoken)
+        self.code_memory += size - looptoken.counted_code_size
+        looptoken.counted_code_size = size
+
+    def _forget_loop(self, looptoken):
+        del self.alive_loops[looptoken]
+        size = looptoken.counted_code_size
+        self.code_memory -= size
+        looptoken.counted_code_size = 0
+        return size
+
+    def forget_all_loops(self):
+        for looptoken in self.alive_loops.keys():
+            self._forget_loop(looptoken)
 
     def _kill_old_loops_now(self):
         debug_start("jit-mem-collect")
@@ -70,7 +171,7 @@ class MemoryManager(object):
         for looptoken in self.alive_loops.keys():
             if (0 <= looptoken.generation < max_generation or
                 looptoken.invalidated):
-                del self.alive_loops[looptoken]
+                self._forget_loop(looptoken)
         newtotal = len(self.alive_loops)
         debug_print("Loop tokens freed: ", oldtotal - newtotal)
         debug_print("Loop tokens left:  ", newtotal)
@@ -81,3 +182,91 @@ class MemoryManager(object):
             # a single one is not enough for all tests :-(
             rgc.collect(); rgc.collect(); rgc.collect()
         debug_stop("jit-mem-collect")
+
+    def _enforce_code_memory_budget(self):
+        if self.code_memory <= self.max_code_memory:
+            return
+        debug_start("jit-mem-budget")
+        debug_print("Code memory:", self.code_memory,
+                    "budget:", self.max_code_memory)
+        # evict down to 3/4 of the budget, to avoid doing this again
+        # after every single new loop
+        target = self.max_code_memory - (self.max_code_memory >> 2)
+        looptokens = self.alive_loops.keys()
+        LoopTokenSort(looptokens).sort()
+        count = 0
+        dropped = 0
+        for looptoken in looptokens:
+            if self.code_memory <= target:
+                break
+            dropped += self._forget_loop(looptoken)
+            count += 1
+        # the machine code of these loops is freed only when nothing
+        # else references them any more
+        self.dropped_loops += count
+        self.dropped_bytes += dropped
+        debug_print("Loop tokens dropped:", count)
+        debug_print("Code bytes dropped: ", dropped)
+        debug_stop("jit-mem-budget")
+
+    def get_loop_profile(self):
+        """Fill a LOOP_PROFILE_CONTAINER with one entry per loop and
+        bridge in 'alive_loops'."""
+        from rpython.rlib.jit_hooks import LOOP_PROFILE_CONTAINER
+        from rpython.rtyper.annlowlevel import llstr
+        code_profiles, looptokens = self._collect_code_profiles()
+        l = lltype.malloc(LOOP_PROFILE_CONTAINER, len(code_profiles))
+        for i in range(len(code_profiles)):
+            code_profile = code_profiles[i]
+            looptoken = looptokens[i]
+            l[i].type = code_profile.type[0]
+            l[i].number = looptoken.number
+            if code_profile.fail_descr is None:
+                l[i].bridge_no = 0
+                l[i].entries = looptoken.entry_count
+            else:
+                l[i].bridge_no = compute_unique_id(code_profile.fail_descr)
+                l[i].entries = -1    # unknown, bridges are entered directly
+            l[i].asmlen = code_profile.asmlen
+            l[i].location = llstr(code_profile.location)
+        return l
+
+    def get_guard_profile(self):
+        """Fill a GUARD_PROFILE_CONTAINER with one entry per guard that
+        failed at least once, in the loops and bridges of 'alive_loops'.
+        'index' is the position of the loop or bridge in the result of
+        get_loop_profile().  Only the loops and bridges compiled while
+        'profile_guards' was set are included."""
+        from rpython.rlib.jit_hooks import GUARD_PROFILE_CONTAINER
+        code_profiles, _ = self._collect_code_profiles()
+        count = 0
+        for code_profile in code_profiles:
+            if code_profile.guards is None:
+                continue
+            for descr in code_profile.guards:
+                if self.get_guard_failures(descr) > 0:
+                    count += 1
+        l = lltype.malloc(GUARD_PROFILE_CONTAINER, count)
+        j = 0
+        for i in range(len(code_profiles)):
+            if code_profiles[i].guards is None:
+                continue
+            for descr in code_profiles[i].guards:
+                failures = self.get_guard_failures(descr)
+                if failures > 0:
+                    l[j].index = i
+                    l[j].hash = descr.get_jitcounter_hash()
+                    l[j].failures = failures
+                    j += 1
+        return l
+
+    def _collect_code_profiles(self):
+        code_profiles = []
+        looptokens = []
+        for looptoken in self.alive_loops:
+            if looptoken.code_profiles is None:
+                continue
+            for code_profile in looptoken.code_profiles:
+                code_profiles.append(code_profile)
+                looptokens.append(looptoken)
+        return code_profiles, looptokens
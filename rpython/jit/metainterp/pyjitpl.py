@@ -1915,6 +1915,9 @@ class MetaInterpStaticData(object):
         #
         self.cpu.propagate_exception_descr = exc_descr
         #
+        self.baseline_counter_descr = self.cpu.arraydescrof(
+            history.BASELINE_COUNTER)
+        #
         self.globaldata = MetaInterpGlobalData(self)
 
     def finish_setup_descrs(self):
@@ -2010,6 +2013,15 @@ class MetaInterpGlobalData(object):
 class MetaInterp(object):
     portal_call_depth = 0
     cancel_count = 0
+    # 'baseline_tier': we are tracing for the 'baseline_threshold' tier,
+    # so we compile the loop without unrolling.
+    # 'replacing_loop': we are tracing again a loop that was compiled by
+    # the baseline tier or that had a guard failure storm; don't reuse
+    # such loops in the new trace (see JitCellToken.must_be_replaced()).
+    baseline_tier = False
+    replacing_loop = False
+    baseline_counter = lltype.nullptr(history.BASELINE_COUNTER)
+    baseline_upgrade_limit = 0
     exported_state = None
     last_exc_box = None
     _last_op = None
@@ -2441,6 +2453,12 @@ class MetaInterp(object):
             original_boxes = self.initialize_original_boxes(jitdriver_sd, *args)
             return self._compile_and_run_once(original_boxes)
         finally:
+            if self.baseline_counter:
+                # the trace was aborted before compiling the loop
+                lltype.free(self.baseline_counter, flavor='raw',
+                            track_allocation=False)
+                self.baseline_counter = lltype.nullptr(
+                    history.BASELINE_COUNTER)
             self.staticdata.profiler.end_tracing()
             debug_stop('jit-tracing')
 
@@ -2515,6 +2533,49 @@ class MetaInterp(object):
             else:
                 duplicates[box] = None
 
+    def _closes_first_merge_point(self, greenboxes):
+        if self.partial_trace or not self.current_merge_points:
+            return False
+        original_boxes, _ = self.current_merge_points[0]
+        for i in range(len(greenboxes)):
+            box1 = original_boxes[i]
+            assert isinstance(box1, Const)
+            if not box1.same_constant(greenboxes[i]):
+                return False
+        return True
+
+    def count_baseline_iteration(self):
+        # A loop compiled by the baseline tier may be entered only once
+        # and then run for a long time, so counting its entries is not
+        # enough to know when to trace it again with all optimizations.
+        # Make it count its own iterations in a raw counter, and fail a
+        # guard when the counter reaches the threshold.  The guard resumes
+        # at the loop header, where maybe_compile_and_run() sees that the
+        # counter is exhausted (JitCellToken.baseline_upgrade_due()).
+        # Once the loop is compiled, the counter belongs to its
+        # CompiledLoopToken, which frees it together with the machine code
+        # (see compile_loop()); if we don't get that far, it is freed at
+        # the end of compile_and_run_once().
+        if not self.baseline_counter:
+            self.baseline_counter = lltype.malloc(history.BASELINE_COUNTER,
+                                                  1, flavor='raw', zero=True,
+                                                  track_allocation=False)
+            warmstate = self.jitdriver_sd.warmstate
+            self.baseline_upgrade_limit = warmstate.baseline_upgrade_limit
+        descr = self.staticdata.baseline_counter_descr
+        addrbox = ConstInt(heaptracker.adr2int(
+            llmemory.cast_ptr_to_adr(self.baseline_counter)))
+        countbox = self.execute_and_record(rop.GETARRAYITEM_RAW_I, descr,
+                                           addrbox, ConstInt(0))
+        countbox = self.execute_and_record(rop.INT_ADD, None,
+                                           countbox, ConstInt(1))
+        self.execute_and_record(rop.SETARRAYITEM_RAW, descr,
+                                addrbox, ConstInt(0), countbox)
+        limitbox = ConstInt(self.baseline_upgrade_limit)
+        condbox = self.execute_and_record(rop.INT_LT, None,
+                                          countbox, limitbox)
+        self.generate_guard(rop.GUARD_TRUE, condbox)
+
     def reached_loop_header(self, greenboxes, redboxes):
         self.heapcache.reset() #reset_virtuals=False)
         #self.heapcache.reset_keep_likely_virtuals()
@@ -2532,6 +2593,9 @@ class MetaInterp(object):
             live_arg_boxes += self.virtualizable_boxes
             live_arg_boxes.pop()
 
+        if self.baseline_tier and self._closes_first_merge_point(greenboxes):
+            self.count_baseline_iteration()
+
         # generate a dummy guard just before the JUMP so that unroll can use it
         # when it's creating artificial guards.
         self.generate_guard(rop.GUARD_FUTURE_CONDITION)
@@ -2700,7 +2764,8 @@ class MetaInterp(object):
         self.history.trace.done()
         if not self.partial_trace:
             ptoken = self.get_procedure_token(greenkey)
-            if ptoken is not None and ptoken.target_tokens is not None:
+            if (ptoken is not None and ptoken.target_tokens is not None and
+                    not (self.replacing_loop and ptoken.must_be_replaced())):
                 # XXX this path not tested, but shown to occur on pypy-c :-(
                 self.staticdata.log('cancelled: we already have a token now')
                 raise SwitchToBlackhole(Counters.ABORT_BAD_LOOP)
@@ -2712,12 +2777,25 @@ class MetaInterp(object):
                                                    self.resumekey,
                                                    exported_state)
         else:
+            if self.baseline_tier:
+                enable_opts = self.jitdriver_sd.warmstate.enable_opts
+                try_disabling_unroll = 'unroll' in enable_opts
             target_token = compile.compile_loop(self, greenkey, start,
                                                 original_boxes[num_green_args:],
                                                 live_arg_boxes[num_green_args:],
                                      try_disabling_unroll=try_disabling_unroll)
             if target_token is not None:
                 assert isinstance(target_token, TargetToken)
+                jitcell_token = target_token.targeting_jitcell_token
+                jitcell_token.baseline = self.baseline_tier
+                if self.baseline_tier:
+                    jitcell_token.baseline_counter = self.baseline_counter
+                    jitcell_token.baseline_upgrade_limit = (
+                        self.baseline_upgrade_limit)
+                    clt = jitcell_token.compiled_loop_token
+                    clt.baseline_counter = self.baseline_counter
+                    self.baseline_counter = lltype.nullptr(
+                        history.BASELINE_COUNTER)
                 self.jitdriver_sd.warmstate.attach_procedure_to_interp(greenkey, target_token.targeting_jitcell_token)
                 self.staticdata.stats.add_jitcell_token(target_token.targeting_jitcell_token)
 
@@ -2744,6 +2822,8 @@ class MetaInterp(object):
         target_jitcell_token = self.get_procedure_token(greenkey, True)
         if not target_jitcell_token:
             return
+        if self.replacing_loop and target_jitcell_token.must_be_replaced():
+            return
 
         cut_at = self.history.get_trace_position()
         self.potential_retrace_position = cut_at
@@ -6,7 +6,7 @@ from rpython.jit.metainterp.history import (Const, ConstInt, getkind,
 from rpython.jit.metainterp.resoperation import rop
 from rpython.rlib import rarithmetic, rstack
 from rpython.rlib.objectmodel import (we_are_translated, specialize,
-        compute_unique_id)
+        compute_unique_id, r_dict)
 from rpython.rlib.debug import ll_assert, debug_print
 from rpython.rtyper import annlowlevel
 from rpython.rtyper.lltypesystem import lltype, llmemory, rffi, rstr
@@ -181,9 +181,13 @@ class ResumeDataLoopMemo(object):
         self.cached_boxes = {}
         self.cached_virtuals = {}
 
+        # identical numberings are shared between the guards of the trace
+        self.numberings = r_dict(resumecode.code_eq, resumecode.code_hash)
+
         self.nvirtuals = 0
         self.nvholes = 0
         self.nvreused = 0
+        self.nresumeshared = 0
 
     def getconst(self, const):
         if const.type == INT:
@@ -282,6 +286,25 @@ class ResumeDataLoopMemo(object):
         return numb_state
 
 
+    def create_numbering(self, numb_state):
+        """Return the NUMBERING for 'numb_state'.  Guards whose resume
+        data encodes to exactly the same bytes -- typically guards
+        coming from the same bytecode, with the same live boxes -- get
+        the same NUMBERING object instead of each their own copy."""
+        code = numb_state.encode()
+        numb = self.numberings.get(code, resumecode.NULL_NUMBER)
+        if numb:
+            # counted here and not in update_counters(): for unrolled
+            # loops, most guards are only numbered when the optimizer
+            # is flushed, after the counters have been updated
+            self.nresumeshared += 1
+            self.metainterp_sd.profiler.count(
+                jitprof.Counters.NRESUME_SHARED)
+            return numb
+        numb = resumecode.make_numbering(code)
+        self.numberings[code] = numb
+        return numb
+
     # caching for virtuals and boxes inside them
 
     def num_cached_boxes(self):
@@ -465,7 +488,7 @@ class ResumeDataVirtualAdder(VirtualVisitor):
         numb_state.patch(1, len(liveboxes))
 
         self._add_optimizer_sections(numb_state, liveboxes, liveboxes_from_env)
-        storage.rd_numb = numb_state.create_numbering()
+        storage.rd_numb = self.memo.create_numbering(numb_state)
         storage.rd_consts = self.memo.consts
         return liveboxes[:]
 
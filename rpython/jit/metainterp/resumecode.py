@@ -24,6 +24,7 @@
 
 from rpython.rtyper.lltypesystem import rffi, lltype
 from rpython.rlib import objectmodel
+from rpython.rlib.rarithmetic import intmask
 
 NUMBERINGP = lltype.Ptr(lltype.GcForwardReference())
 NUMBERING = lltype.GcStruct('Numbering',
@@ -92,14 +93,14 @@ class Writer(object):
         assert rffi.cast(lltype.Signed, short) == item
         return self.append_short(short)
 
-    def create_numbering(self):
+    def encode(self):
         final = objectmodel.newlist_hint(len(self.current) * 3)
         for item in self.current:
             append_numbering(final, item)
-        numb = lltype.malloc(NUMBERING, len(final))
-        for i, elt in enumerate(final):
-            numb.code[i] = elt
-        return numb
+        return final
+
+    def create_numbering(self):
+        return make_numbering(self.encode())
 
     def patch_current_size(self, index):
         self.patch(index, len(self.current))
@@ -107,6 +108,30 @@ class Writer(object):
     def patch(self, index, item):
         self.current[index] = item
 
+def make_numbering(code):
+    """Build a NUMBERING from the list of UCHARs returned by
+    Writer.encode()."""
+    numb = lltype.malloc(NUMBERING, len(code))
+    for i, elt in enumerate(code):
+        numb.code[i] = elt
+    return numb
+
+def code_eq(code1, code2):
+    # for r_dicts keyed by the lists returned by Writer.encode()
+    if len(code1) != len(code2):
+        return False
+    for i in range(len(code1)):
+        if (rffi.cast(lltype.Signed, code1[i]) !=
+                rffi.cast(lltype.Signed, code2[i])):
+            return False
+    return True
+
+def code_hash(code):
+    x = len(code)
+    for i in range(len(code)):
+        x = intmask((x * 1000003) ^ rffi.cast(lltype.Signed, code[i]))
+    return x
+
 def create_numbering(l):
     w = Writer()
     for item in l:
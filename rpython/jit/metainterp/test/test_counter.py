@@ -128,3 +128,27 @@ def test_change_current_fraction():
     assert r is False
     r = jc.tick(index2hash(jc, 104), incr)
     assert r is True
+
+
+def test_may_start_tracing():
+    jc = JitCounter()
+    assert jc.may_start_tracing()
+    assert jc.may_start_tracing()
+    jc.set_compile_interval(3600000)
+    assert jc.may_start_tracing()
+    assert not jc.may_start_tracing()
+    jc.set_compile_interval(0)
+    assert jc.may_start_tracing()
+    assert jc.may_start_tracing()
+
+def test_postpone():
+    jc = JitCounter()
+    incr = jc.compute_threshold(1000)
+    hash = index2hash(jc, 104)
+    jc.postpone(hash)
+    for i in range(15):
+        if jc.tick(hash, incr):
+            break
+    else:
+        raise AssertionError("postpone() did not bring the counter close")
+    assert i >= 5
@@ -1,6 +1,7 @@
 
 import py
 from rpython.rlib.jit import JitDriver, JitHookInterface, Counters, dont_look_inside
+from rpython.rlib.jit import set_param
 from rpython.rlib import jit_hooks
 from rpython.jit.metainterp.test.support import LLJitMixin
 from rpython.jit.codewriter.policy import JitPolicy
@@ -144,6 +145,71 @@ class JitHookInterfaceTests(object):
 
         self.meta_interp(main, [], ProfilerClass=Profiler)
 
+    def test_get_loop_profile(self):
+        driver = JitDriver(greens = [], reds = ['i', 's'])
+
+        def loop(i):
+            s = 0
+            while i > 0:
+                driver.jit_merge_point(i=i, s=s)
+                if i % 2:
+                    s += 1
+                i -= 1
+                s+= 2
+            return s
+
+        def main():
+            set_param(driver, 'profile_guards', 1)
+            loop(30)
+            loops = jit_hooks.stats_get_loop_profile(None)
+            # the loop and its bridge
+            assert len(loops) == 2
+            assert loops[0].type == 'l'
+            assert loops[0].bridge_no == 0
+            assert loops[0].entries > 0
+            assert loops[0].location
+            assert loops[1].type == 'b'
+            assert loops[1].number == loops[0].number
+            assert loops[1].bridge_no != 0
+            assert loops[1].entries == -1
+            assert not loops[1].location
+            guards = jit_hooks.stats_get_guard_profile(None)
+            failures = 0
+            for i in range(len(guards)):
+                assert 0 <= guards[i].index < len(loops)
+                assert guards[i].failures > 0
+                failures += guards[i].failures
+            # specific numbers: the guard from which the bridge was
+            # compiled, and the guards exiting the loop and the bridge
+            assert len(guards) == 3
+            assert failures == 4
+
+        self.meta_interp(main, [], ProfilerClass=Profiler)
+
+    def test_get_loop_profile_no_guards(self):
+        driver = JitDriver(greens = [], reds = ['i', 's'])
+
+        def loop(i):
+            s = 0
+            while i > 0:
+                driver.jit_merge_point(i=i, s=s)
+                if i % 2:
+                    s += 1
+                i -= 1
+                s+= 2
+            return s
+
+        def main():
+            loop(30)
+            loops = jit_hooks.stats_get_loop_profile(None)
+            assert len(loops) == 2
+            assert loops[0].entries > 0
+            # without 'profile_guards', the guards are not recorded
+            guards = jit_hooks.stats_get_guard_profile(None)
+            assert len(guards) == 0
+
+        self.meta_interp(main, [], ProfilerClass=Profiler)
+
     def test_get_stats_empty(self):
         driver = JitDriver(greens = [], reds = ['i'])
         def loop(i):
@@ -97,3 +97,23 @@ class TestProfile(ProfilerMixin):
         assert res == f(6, 7, 2)
         profiler = pyjitpl._warmrunnerdesc.metainterp_sd.profiler
         assert profiler.calls == 1
+
+    def test_resume_shared(self):
+        myjitdriver = JitDriver(greens = [], reds = ['n', 'i', 'sa'])
+        def f(n):
+            sa = i = 0
+            while i < n:
+                myjitdriver.jit_merge_point(n=n, i=i, sa=sa)
+                if i > n/2:
+                    sa += 1
+                else:
+                    sa += 2
+                    # two guards from the same bytecode, with the same
+                    # live boxes: they get the same resume numbering
+                    assert -100 < i < 100
+                i += 1
+            return sa
+        res = self.meta_interp(f, [20])
+        assert res == f(20)
+        profiler = pyjitpl._warmrunnerdesc.metainterp_sd.profiler
+        assert profiler.counters[Counters.NRESUME_SHARED] > 0
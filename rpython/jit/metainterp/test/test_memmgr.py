@@ -21,6 +21,18 @@ from rpython.rlib import rgc
 class FakeLoopToken:
     generation = 0
     invalidated = False
+    compiled_loop_token = None
+    counted_code_size = 0
+
+class FakeCompiledLoopToken:
+    def __init__(self, size):
+        self.asmmemmgr_blocks = [(1000, 1000 + size // 2),
+                                 (5000, 5000 + size - size // 2)]
+
+def make_sized_token(size):
+    token = FakeLoopToken()
+    token.compiled_loop_token = FakeCompiledLoopToken(size)
+    return token
 
 
 class _TestMemoryManager:
@@ -78,6 +90,79 @@ class _TestMemoryManager:
             else:
                 assert tokens[i] in memmgr.alive_loops
 
+    def test_code_memory_budget(self):
+        memmgr = MemoryManager()
+        memmgr.set_max_age(0)
+        memmgr.set_max_code_memory(1000)
+        tokens = [make_sized_token(100) for i in range(10)]
+        for token in tokens:
+            memmgr.keep_loop_alive(token)
+            memmgr.next_generation()
+        assert memmgr.alive_loops == dict.fromkeys(tokens)
+        assert memmgr.dropped_loops == 0
+        # tokens[0] and tokens[1] were used recently
+        memmgr.keep_loop_alive(tokens[0])
+        memmgr.keep_loop_alive(tokens[1])
+        memmgr.next_generation()
+        extra = make_sized_token(100)
+        memmgr.keep_loop_alive(extra)
+        memmgr.next_generation()
+        # 1100 bytes > 1000: evict the least recently used loops until
+        # we are below 750 bytes
+        assert memmgr.alive_loops == dict.fromkeys(
+            [tokens[0], tokens[1], tokens[6], tokens[7], tokens[8],
+             tokens[9], extra])
+        assert memmgr.dropped_loops == 4
+        assert memmgr.dropped_bytes == 400
+
+    def test_code_memory_total(self):
+        memmgr = MemoryManager()
+        memmgr.set_max_age(4, 1)
+        tokens = [make_sized_token(100) for i in range(3)]
+        for token in tokens:
+            memmgr.keep_loop_alive(token)
+            memmgr.next_generation()
+        assert memmgr.code_memory == 300
+        # entering a loop again does not count it twice
+        memmgr.keep_loop_alive(tokens[0])
+        assert memmgr.code_memory == 300
+        # a new bridge makes the loop bigger
+        tokens[0].compiled_loop_token.asmmemmgr_blocks.append((9000, 9050))
+        memmgr.bridge_compiled(tokens[0])
+        assert memmgr.code_memory == 350
+        for i in range(4):
+            memmgr.keep_loop_alive(tokens[0])
+            memmgr.next_generation()
+        # tokens[1] and tokens[2] are now old
+        assert memmgr.alive_loops == {tokens[0]: None}
+        assert memmgr.code_memory == 150
+        memmgr.forget_all_loops()
+        assert memmgr.code_memory == 0
+
+    def test_code_memory_budget_disabled(self):
+        memmgr = MemoryManager()
+        memmgr.set_max_age(0)
+        tokens = [make_sized_token(1000) for i in range(10)]
+        for token in tokens:
+            memmgr.keep_loop_alive(token)
+            memmgr.next_generation()
+        assert memmgr.alive_loops == dict.fromkeys(tokens)
+        assert memmgr.dropped_loops == 0
+
+    def test_guard_failures(self):
+        from rpython.jit.metainterp.history import AbstractFailDescr
+        memmgr = MemoryManager()
+        descr = AbstractFailDescr()
+        # not counted by default
+        memmgr.count_guard_failure(descr)
+        assert memmgr.get_guard_failures(descr) == 0
+        assert memmgr.guard_failures.length() == 0
+        memmgr.set_profile_guards(True)
+        memmgr.count_guard_failure(descr)
+        memmgr.count_guard_failure(descr)
+        assert memmgr.get_guard_failures(descr) == 2
+        assert memmgr.get_guard_failures(AbstractFailDescr()) == 0
+
 
 class _TestIntegration(LLJitMixin):
     # See comments in TestMemoryManager.  To get temporarily the normal
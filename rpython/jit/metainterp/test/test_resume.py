@@ -21,6 +21,7 @@ from rpython.jit.metainterp.history import ConstPtr, ConstFloat,\
      IntFrontendOp, RefFrontendOp
 from rpython.jit.metainterp.optimizeopt.test.test_util import LLtypeMixin
 from rpython.jit.metainterp import executor
+from rpython.jit.metainterp.jitprof import EmptyProfiler
 from rpython.jit.codewriter import heaptracker, longlong
 from rpython.jit.metainterp.resoperation import ResOperation, rop
 from rpython.rlib.debug import debug_start, debug_stop, debug_print,\
@@ -537,6 +538,7 @@ class FakeJitCode(object):
 class FakeMetaInterpStaticData:
     cpu = LLtypeMixin.cpu
     all_descrs = []
+    profiler = EmptyProfiler()
 
     class options:
         failargs_limit = 100
@@ -936,6 +938,29 @@ def test_ResumeDataLoopMemo_number():
         2, 1, tag(3, TAGINT), tag(0, TAGVIRTUAL), tag(0, TAGBOX), tag(3, TAGINT)
         ] + [0, 0]
 
+def test_ResumeDataLoopMemo_create_numbering_shared():
+    b1, b2, b3 = [IntFrontendOp(0), IntFrontendOp(1), IntFrontendOp(2)]
+    c1, c2 = [ConstInt(1), ConstInt(2)]
+    metainterp_sd = FakeMetaInterpStaticData()
+    t = Trace([b1, b2, b3], metainterp_sd)
+    snap = t.create_snapshot(FakeJitCode("jitcode", 0), 0, Frame([b1, c1]),
+                             False)
+    for env in [[b2, b3], [b2, b3], [b2, c2]]:
+        t.append(0) # descr index
+        snap1 = t.create_top_snapshot(FakeJitCode("jitcode", 0), 2,
+                                      Frame(env), False, [], [])
+        snap1.prev = snap
+
+    memo = ResumeDataLoopMemo(metainterp_sd)
+    iter = t.get_iter()
+    numbs = [memo.create_numbering(memo.number(FakeOptimizer(), i, iter))
+             for i in range(3)]
+    assert numbs[0] is numbs[1]
+    assert numbs[2] is not numbs[0]
+    assert unpack_numbering(numbs[0]) != unpack_numbering(numbs[2])
+    assert memo.nresumeshared == 1
+
+
 @given(strategies.lists(strategies.builds(IntFrontendOp, strategies.just(0)) | intconsts,
        min_size=1))
 def test_ResumeDataLoopMemo_random(lst):
@@ -2,6 +2,7 @@ import py
 from rpython.jit.metainterp import jitexc
 from rpython.jit.metainterp.warmspot import get_stats
 from rpython.rlib.jit import JitDriver, set_param, unroll_safe, jit_callback
+from rpython.rlib.jit import PARAMETERS
 from rpython.jit.backend.llgraph import runner
 
 from rpython.jit.metainterp.test.support import LLJitMixin
@@ -109,6 +110,147 @@ class TestLLWarmspot(LLJitMixin):
         assert res == 0
         self.check_resops(new_with_vtable=0)
 
+    def test_compile_interval(self):
+        mydriver = JitDriver(greens=['g'], reds=['m'])
+        def loop(g, m):
+            while m > 0:
+                mydriver.jit_merge_point(g=g, m=m)
+                m -= 1
+        def f(m, interval):
+            set_param(mydriver, 'compile_interval', interval)
+            loop(1, m)
+            loop(2, m)
+        self.meta_interp(f, [30, 0])
+        self.check_trace_count(2)
+        # with a very long interval, only the first loop is compiled
+        self.meta_interp(f, [30, 3600000])
+        self.check_trace_count(1)
+
+    def test_compile_interval_stack_almost_full(self, monkeypatch):
+        # a trace refused because the stack is almost full must not
+        # block tracing for the whole compile_interval
+        from rpython.rlib import rstack
+        class State:
+            refuse = 1
+        state = State()
+        def stack_almost_full():
+            if state.refuse > 0:
+                state.refuse -= 1
+                return True
+            return False
+        monkeypatch.setattr(rstack, 'stack_almost_full', stack_almost_full)
+        mydriver = JitDriver(greens=[], reds=['m'])
+        def f(m, interval):
+            set_param(mydriver, 'compile_interval', interval)
+            while m > 0:
+                mydriver.jit_merge_point(m=m)
+                m -= 1
+        self.meta_interp(f, [100, 3600000])
+        self.check_trace_count(1)
+
+    def test_baseline_threshold(self):
+        mydriver = JitDriver(greens=[], reds=['m', 'total'])
+        def loop(m):
+            total = 0
+            while m > 0:
+                mydriver.jit_merge_point(m=m, total=total)
+                total += m
+                m -= 1
+            return total
+        def f(n, m, baseline):
+            set_param(mydriver, 'threshold', 8)
+            set_param(mydriver, 'baseline_threshold', baseline)
+            total = 0
+            while n > 0:
+                total += loop(m)
+                n -= 1
+            return total
+        def labels():
+            return [len([op for op in loop.operations
+                         if op.getopname() == 'label'])
+                    for loop in get_stats().get_all_loops()]
+        res = self.meta_interp(f, [20, 10, 0])
+        assert res == 20 * 55
+        assert labels() == [2]      # unrolled
+        # with baseline_threshold, the first loop is not unrolled, and
+        # an unrolled one replaces it after 8 more iterations.  Here this
+        # happens near the end of a call, so the first new trace only
+        # sees the loop exit and gives an entry bridge
+        res = self.meta_interp(f, [20, 10, 3])
+        assert res == 20 * 55
+        assert labels() == [1, 0, 2]
+        # if the loop does not run often enough, it stays cheap
+        res = self.meta_interp(f, [1, 5, 3])
+        assert res == 15
+        assert labels() == [1]
+        # its counter is freed together with the machine code
+        [token] = [wr() for wr in get_stats().jitcell_token_wrefs]
+        assert token.baseline
+        clt = token.compiled_loop_token
+        assert clt.baseline_counter == token.baseline_counter
+        clt.__del__()
+        assert not clt.baseline_counter
+        # a loop entered only once but running for long is also replaced
+        res = self.meta_interp(f, [1, 1000, 3])
+        assert res == 1000 * 1001 // 2
+        assert labels() == [1, 2]
+
+    def test_guard_storm_limit(self, monkeypatch):
+        from rpython.jit.metainterp import compile
+        mydriver = JitDriver(greens=[], reds=['i', 'n', 'total'])
+        def f(n, storm):
+            set_param(mydriver, 'threshold', 8)
+            set_param(mydriver, 'trace_eagerness', 5)
+            set_param(mydriver, 'guard_storm_limit', storm)
+            i = 0
+            total = 0
+            while i < n:
+                mydriver.jit_merge_point(i=i, n=n, total=total)
+                # after 100 iterations, the guard of the first loop
+                # fails every time, and no bridge gets compiled
+                if i < 100:
+                    total += 1
+                else:
+                    total += 2
+                i += 1
+            return total
+        # the guard becomes hot, but we never manage to compile a bridge
+        monkeypatch.setattr(compile.AbstractResumeGuardDescr, 'must_compile',
+                            lambda *args: False)
+        res = self.meta_interp(f, [300, 0])
+        assert res == 100 + 200 * 2
+        assert len(get_stats().get_all_loops()) == 1
+        # with guard_storm_limit, the loop is traced again
+        res = self.meta_interp(f, [300, 10])
+        assert res == 100 + 200 * 2
+        assert len(get_stats().get_all_loops()) == 2
+
+    def test_guard_storm_limit_loop_exit(self):
+        mydriver = JitDriver(greens=[], reds=['m', 'total'])
+        def loop(m):
+            total = 0
+            while m > 0:
+                mydriver.jit_merge_point(m=m, total=total)
+                total += m
+                m -= 1
+            return total
+        def f(n, storm):
+            set_param(mydriver, 'threshold', 8)
+            set_param(mydriver, 'trace_eagerness',
+                      PARAMETERS['trace_eagerness'])
+            set_param(mydriver, 'guard_storm_limit', storm)
+            total = 0
+            while n > 0:
+                total += loop(20)
+                n -= 1
+            return total
+        # with the default trace_eagerness, the guard exiting the loop
+        # fails many times before it gets a bridge.  This is not a guard
+        # failure storm
+        res = self.meta_interp(f, [100, 10])
+        assert res == 100 * 210
+        assert len(get_stats().get_all_loops()) == 1
+
     def test_unwanted_loops(self):
         mydriver = JitDriver(reds = ['n', 'total', 'm'], greens = [])
 
@@ -641,6 +783,7 @@ class TestWarmspotDirect(object):
             fielddescrof = nodescr
             calldescrof  = nodescr
             sizeof       = nodescr
+            arraydescrof = nodescr
 
             def get_fail_descr_from_number(self, no):
                 return FakeFailDescr(no)
@@ -226,6 +226,14 @@ class BaseJitCell(object):
 
 
 class WarmEnterState(object):
+    _threshold = 0
+    _function_threshold = 0
+    _baseline_threshold = 0
+    guard_storm_limit = 0
+    trace_eagerness = 0
+    # how many times we retrace the same loop because of guard failure
+    # storms, before giving up and just growing bridges
+    MAX_STORM_RETRACES = 3
 
     def __init__(self, warmrunnerdesc, jitdriver_sd):
         "NOT_RPYTHON"
@@ -247,13 +255,42 @@ class WarmEnterState(object):
     def _compute_threshold(self, threshold):
         return self.warmrunnerdesc.jitcounter.compute_threshold(threshold)
 
-    def set_param_threshold(self, threshold):
+    def _update_thresholds(self):
+        # With 'baseline_threshold', the counters first reach the bound
+        # after 'baseline_threshold' runs, and we compile a cheap loop
+        # (see MetaInterp.baseline_tier).  Then we count again up to
+        # 'threshold' entries into this loop before compiling it fully.
+        threshold = self._threshold
+        function_threshold = self._function_threshold
+        baseline = self._baseline_threshold
+        if baseline > 0:
+            if threshold > baseline:
+                threshold = baseline
+            if function_threshold > baseline:
+                function_threshold = baseline
         self.increment_threshold = self._compute_threshold(threshold)
+        self.increment_function_threshold = self._compute_threshold(
+            function_threshold)
+        self.increment_baseline_upgrade = self._compute_threshold(
+            self._threshold)
+        # number of iterations of a baseline loop before we trace it again
+        # (see MetaInterp.count_baseline_iteration())
+        self.baseline_upgrade_limit = max(self._threshold, 2)
+
+    def set_param_threshold(self, threshold):
+        self._threshold = threshold
+        self._update_thresholds()
 
     def set_param_function_threshold(self, threshold):
-        self.increment_function_threshold = self._compute_threshold(threshold)
+        self._function_threshold = threshold
+        self._update_thresholds()
+
+    def set_param_baseline_threshold(self, threshold):
+        self._baseline_threshold = threshold
+        self._update_thresholds()
 
     def set_param_trace_eagerness(self, value):
+        self.trace_eagerness = value
         self.increment_trace_eagerness = self._compute_threshold(value)
 
     def set_param_trace_limit(self, value):
@@ -262,6 +299,16 @@ class WarmEnterState(object):
     def set_param_decay(self, decay):
         self.warmrunnerdesc.jitcounter.set_decay(decay)
 
+    def set_param_compile_interval(self, value):
+        # note: it's a global parameter, not a per-jitdriver one
+        self.warmrunnerdesc.jitcounter.set_compile_interval(value)
+
+    def set_param_guard_storm_limit(self, value):
+        self.guard_storm_limit = value
+        if (value > 0 and self.warmrunnerdesc is not None and
+            self.warmrunnerdesc.memory_manager is not None):   # all for tests
+            self.warmrunnerdesc.memory_manager.enable_guard_failure_counts()
+
     def set_param_inlining(self, value):
         self.inlining = value
 
@@ -289,6 +336,18 @@ class WarmEnterState(object):
             self.warmrunnerdesc.memory_manager is not None):   # all for tests
             self.warmrunnerdesc.memory_manager.set_max_age(value)
 
+    def set_param_max_code_memory(self, value):
+        # note: it's a global parameter, not a per-jitdriver one
+        if (self.warmrunnerdesc is not None and
+            self.warmrunnerdesc.memory_manager is not None):   # all for tests
+            self.warmrunnerdesc.memory_manager.set_max_code_memory(value)
+
+    def set_param_profile_guards(self, value):
+        # note: it's a global parameter, not a per-jitdriver one
+        if (self.warmrunnerdesc is not None and
+            self.warmrunnerdesc.memory_manager is not None):   # all for tests
+            self.warmrunnerdesc.memory_manager.set_profile_guards(value != 0)
+
     def set_param_retrace_limit(self, value):
         if self.warmrunnerdesc:
             if self.warmrunnerdesc.memory_manager:
@@ -331,12 +390,37 @@ class WarmEnterState(object):
         old_token = cell.get_procedure_token()
         cell.set_procedure_token(procedure_token)
         if old_token is not None:
+            procedure_token.storm_retraces = old_token.storm_retraces
             self.cpu.redirect_call_assembler(old_token, procedure_token)
             # procedure_token is also kept alive by any loop that used
             # to point to old_token.  Actually freeing old_token early
             # is a pointless optimization (it is tiny).
             old_token.record_jump_to(procedure_token)
 
+    def check_guard_storm(self, looptoken):
+        # Called when 'looptoken' had 'guard_storm_limit' failures of
+        # hot guards without a bridge since the last check.  If this is at
+        # least half the number of times it was entered from the
+        # interpreter in the same period, then most runs of the loop end
+        # with a failing guard: typically the data changed shape, and the
+        # loop and its bridges are specialized for the old one.  Instead
+        # of blackholing and growing ever more bridges, we trace the loop
+        # again from scratch the next time it is hot.
+        entries = looptoken.entry_count - looptoken.storm_entries
+        failures = looptoken.storm_failures
+        looptoken.storm_failures = 0
+        looptoken.storm_entries = looptoken.entry_count
+        if failures * 2 < entries or looptoken.must_be_replaced():
+            return
+        if looptoken.storm_retraces >= self.MAX_STORM_RETRACES:
+            return
+        looptoken.retrace_requested = True
+        looptoken.storm_retraces += 1
+        debug_start("jit-guard-storm")
+        debug_print("Guard failure storm in loop", looptoken.number)
+        debug_print("Failures:", failures, "entries:", entries)
+        debug_stop("jit-guard-storm")
+
     # ----------
 
     def make_entry_point(self):
@@ -390,6 +474,7 @@ class WarmEnterState(object):
             # Record in the memmgr that we just ran this loop,
             # so that it will keep it alive for a longer time
             warmrunnerdesc.memory_manager.keep_loop_alive(loop_token)
+            loop_token.entry_count += 1
             #
             # Handle the failure
             fail_descr = cpu.get_latest_descr(deadframe)
@@ -409,18 +494,43 @@ class WarmEnterState(object):
                     return fail_descr.get_result(cpu, deadframe)
             #
             # General case
+            if (self.guard_storm_limit > 0 and
+                    isinstance(fail_descr, compile.AbstractResumeGuardDescr)):
+                # count only the failures of guards that are hot but still
+                # have no bridge.  In particular, the guard that exits a
+                # loop which simply finished fails once per entry, and
+                # gets a bridge before it is counted here.
+                memmgr = self.warmrunnerdesc.memory_manager
+                if memmgr.get_guard_failures(fail_descr) >= self.trace_eagerness:
+                    loop_token.storm_failures += 1
+                    if loop_token.storm_failures >= self.guard_storm_limit:
+                        self.check_guard_storm(loop_token)
             fail_descr.handle_fail(deadframe, metainterp_sd, jitdriver_sd)
             assert 0, "should have raised"
 
         def bound_reached(hash, cell, *args):
             if not confirm_enter_jit(*args):
                 return
-            jitcounter.decay_all_counters()
             if rstack.stack_almost_full():
+                # check this before may_start_tracing(), which would
+                # otherwise block tracing for a whole compile_interval
+                jitcounter.decay_all_counters()
+                return
+            if not jitcounter.may_start_tracing():
+                jitcounter.postpone(hash)
                 return
+            jitcounter.decay_all_counters()
             # start tracing
             from rpython.jit.metainterp.pyjitpl import MetaInterp
             metainterp = MetaInterp(metainterp_sd, jitdriver_sd)
+            token = None
+            if cell is not None and not (cell.flags & JC_TEMPORARY):
+                token = cell.get_procedure_token()
+            if token is None:
+                if self._baseline_threshold > 0:
+                    metainterp.baseline_tier = True
+            elif token.must_be_replaced():
+                metainterp.replacing_loop = True
             greenargs = args[:num_green_args]
             if cell is None:
                 cell = JitCell(*greenargs)
@@ -484,6 +594,16 @@ class WarmEnterState(object):
                 # has been freed
                 jitcounter.cleanup_chain(hash)
                 return
+            if procedure_token.must_be_replaced():
+                # compiled by the baseline tier, or had a guard failure
+                # storm: count the entries, and for baseline loops also
+                # the iterations done inside the machine code, until it
+                # is time to trace it again.  If bound_reached() returns,
+                # we just run the current code.
+                if procedure_token.baseline_upgrade_due():
+                    bound_reached(hash, cell, *args)
+                elif jitcounter.tick(hash, self.increment_baseline_upgrade):
+                    bound_reached(hash, cell, *args)
             if not confirm_enter_jit(*args):
                 return
             # extract and unspecialize the red arguments to pass to
@@ -27,6 +27,7 @@ REGEXES = [
     (('nvirtuals',), '^nvirtuals:\s+(\d+)$'),
     (('nvholes',), '^nvholes:\s+(\d+)$'),
     (('nvreused',), '^nvreused:\s+(\d+)$'),
+    (('resume_shared',), '^resume shared:\s+(\d+)$'),
     (('vecopt_tried',), '^vecopt tried:\s+(\d+)$'),
     (('vecopt_success',), '^vecopt success:\s+(\d+)$'),
     (('total_compiled_loops',),   '^Total # of loops:\s+(\d+)$'),
@@ -60,6 +61,7 @@ class OutputInfo(object):
     nvirtuals = 0
     nvholes = 0
     nvreused = 0
+    resume_shared = 0
     vecopt_tried = 0
     vecopt_success = 0
 
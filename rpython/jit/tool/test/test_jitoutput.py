@@ -62,6 +62,7 @@ abort: force quasi-immut: 3
 nvirtuals:              13
 nvholes:                14
 nvreused:               15
+resume shared:          16
 vecopt tried:           12
 vecopt success:         4
 Total # of loops:       100
@@ -91,5 +92,6 @@ def test_parse():
     assert info.nvirtuals == 13
     assert info.nvholes == 14
     assert info.nvreused == 15
+    assert info.resume_shared == 16
     assert info.vecopt_tried == 12
     assert info.vecopt_success == 4
@@ -9,6 +9,19 @@ Environment variables can be used to fine-tune the following parameters:
  PYPY_GC_NURSERY_DEBUG   If set to non-zero, will fill nursery with garbage,
                          to help debugging.
 
+ PYPY_GC_NURSERY_MAX     If set, e.g. to '16MB', the size of the nursery is
+                         adapted at runtime: it starts at PYPY_GC_NURSERY
+                         and grows up to this value while few objects
+                         survive the minor collections, or shrinks back
+                         when many do, or when a minor collection takes
+                         longer than PYPY_GC_MAX_PAUSE_MS.  This much
+                         memory is reserved for the nursery.  Off by
+                         default.
+
+ PYPY_GC_NURSERY_MIN     With PYPY_GC_NURSERY_MAX, the lower bound for the
+                         size of the nursery.  Defaults to 1/4 of
+                         PYPY_GC_NURSERY.
+
  PYPY_GC_INCREMENT_STEP  The size of memory marked during the marking step.
                          Default is size of nursery * 2. If you mark it too high
                          your GC is not incremental at all. The minimum is set
@@ -52,6 +65,40 @@ Environment variables can be used to fine-tune the following parameters:
                          in time.  Defaults to a conservative value depending
                          on nursery size and maximum object size inside the
                          nursery.  Useful for debugging by setting it to 0.
+
+ PYPY_GC_MAX_PAUSE_MS    Target for the duration of a major collection step,
+                         in milliseconds (e.g. '2' or '0.5').  If set, the
+                         amount of marking and sweeping done per step is
+                         adapted at runtime to stay below it, and steps that
+                         still take longer are reported in the
+                         'gc-pause-overrun' debug section.  Off by default.
+
+ PYPY_GC_AGING           Size of the aging space, e.g. '4MB'.  If set,
+                         objects surviving a minor collection are first
+                         copied there instead of being made old directly,
+                         so that medium-lived objects can die without
+                         filling the old generation.  Twice this amount of
+                         memory is reserved.  Off by default.
+
+ PYPY_GC_AGING_MINORS    With PYPY_GC_AGING, the number of minor collections
+                         that an object must survive before it is made old.
+                         Between 2 and 4; defaults to 2.
+
+ PYPY_GC_HUGEPAGES       If set to non-zero, allocate the nursery and the
+                         arenas with mmap(), aligned to 2MB and asking the
+                         OS for transparent huge pages (Linux only), which
+                         reduces the TLB misses.  The memory of empty arenas
+                         is given back to the OS with MADV_FREE.  Off by
+                         default.
+
+ PYPY_GC_COMPACT         A fraction, e.g. '0.5'.  If set, at the end of a
+                         major collection, if the objects use less than
+                         this fraction of the memory of the arenas, the
+                         objects in the pages that are at most 1/4 used are
+                         moved to other pages, so that these pages and then
+                         possibly whole arenas are freed.  Objects whose
+                         address was exposed (id(), hash(), non-moving
+                         buffers...) are never moved.  Off by default.
 """
 # XXX Should find a way to bound the major collection threshold by the
 # XXX total addressable size.  Maybe by keeping some minimarkpage arenas
@@ -62,6 +109,7 @@ Environment variables can be used to fine-tune the following parameters:
 # XXX old_objects_pointing_to_young (IRC 2014-10-22, fijal and gregor_w)
 import sys
 import os
+import time
 from rpython.rtyper.lltypesystem import lltype, llmemory, llarena, llgroup
 from rpython.rtyper.lltypesystem.lloperation import llop
 from rpython.rtyper.lltypesystem.llmemory import raw_malloc_usage
@@ -69,9 +117,12 @@ from rpython.memory.gc.base import GCBase, MovingGCBase
 from rpython.memory.gc import env
 from rpython.memory.support import mangle_hash
 from rpython.rlib.rarithmetic import ovfcheck, LONG_BIT, intmask, r_uint
+from rpython.rlib.rarithmetic import r_longlong
 from rpython.rlib.rarithmetic import LONG_BIT_SHIFT
 from rpython.rlib.debug import ll_assert, debug_print, debug_start, debug_stop
 from rpython.rlib.objectmodel import specialize
+from rpython.rlib import rgc
+from rpython.rlib import rtime     # needed for time.time() to be RPython
 from rpython.memory.gc.minimarkpage import out_of_memory
 
 #
@@ -85,6 +136,13 @@ from rpython.memory.gc.minimarkpage import out_of_memory
 #    - and pinned objects are kept at their place inside the nursery and stay
 #      young.
 #
+#  * optionally, aging objects: with PYPY_GC_AGING, the surviving objects
+#    from the nursery are first copied to one half of the aging space.
+#    Every minor collection copies them again to the other half, until they
+#    survived 'aging_minors' minor collections and are made old.  They are
+#    young objects: they move, and they are not seen by major collections,
+#    which only start after a minor collection that made all of them old.
+#
 #  * old objects: never move again.  These objects are either allocated by
 #    minimarkpage.py (if they are small), or raw-malloced (if they are not
 #    small).  Collected by regular mark-n-sweep during major collections.
@@ -160,7 +218,29 @@ GCFLAG_IGNORE_FINALIZER = first_gcflag << 10
 # It does not need an additional copy in trace out
 GCFLAG_SHADOW_INITIALIZED   = first_gcflag << 11
 
-_GCFLAG_FIRST_UNUSED = first_gcflag << 12    # the first unused bit
+# The following two bits count the minor collections survived by objects
+# in the aging space (see PYPY_GC_AGING).  They are zero on all other
+# objects.
+GCFLAG_AGE_ONE  = first_gcflag << 12
+GCFLAG_AGE_MASK = GCFLAG_AGE_ONE * 3
+AGING_MAX_MINORS = 4     # objects get at most 3 minor collections of aging
+
+# The following flag is set only on old objects, during a minor collection,
+# so we can reuse one of the GCFLAG_AGE bits.  If this flag is set, the
+# object was found to point to the aging space and is already an element
+# of 'old_objects_pointing_to_aging'.
+GCFLAG_AGING_PARENT = GCFLAG_AGE_ONE
+
+# With PYPY_GC_COMPACT, this flag is set on the objects whose address
+# is exposed, by id() or hash() or because can_move() returned False
+# (or on the young objects whose shadow will be such an object).  They
+# are never moved by compact_arenas().
+GCFLAG_NO_COMPACT = first_gcflag << 14
+
+_GCFLAG_FIRST_UNUSED = first_gcflag << 15    # the first unused bit
+# the bits above, computed here because on 32-bit machines they include
+# the sign bit
+_GCFLAG_UNUSED_BITS = intmask(-_GCFLAG_FIRST_UNUSED)
 
 
 # States for the incremental GC
@@ -182,6 +262,22 @@ STATE_FINALIZING = 3
 
 GC_STATES = ['SCANNING', 'MARKING', 'SWEEPING', 'FINALIZING']
 
+# Bounds on 'pause_step_factor' when PYPY_GC_MAX_PAUSE_MS is set: steps
+# can be made 64 times smaller than the default, or 4 times larger
+PAUSE_STEP_FACTOR_MIN = 1.0 / 64
+PAUSE_STEP_FACTOR_MAX = 4.0
+
+# With PYPY_GC_NURSERY_MAX, the size of the nursery is doubled after a
+# minor collection if less than this fraction of it survived, and halved
+# if more than the other fraction survived
+NURSERY_SURVIVAL_LOW = 0.05
+NURSERY_SURVIVAL_HIGH = 0.25
+
+def _microseconds(seconds):
+    # for get_stats().  Wraps around on 32-bit machines, but the users
+    # only look at the difference between two values.
+    return intmask(r_longlong(seconds * 1000000.0))
+
 
 FORWARDSTUB = lltype.GcStruct('forwarding_stub',
                               ('forw', llmemory.Address))
@@ -272,6 +368,8 @@ class IncrementalMiniMarkGC(MovingGCBase):
     def __init__(self, config,
                  read_from_env=False,
                  nursery_size=32*WORD,
+                 nursery_min_size=0,
+                 nursery_max_size=0,
                  nursery_cleanup=9*WORD,
                  page_size=16*WORD,
                  arena_size=64*WORD,
@@ -280,6 +378,10 @@ class IncrementalMiniMarkGC(MovingGCBase):
                  growth_rate_max=2.5,   # for tests
                  card_page_indices=0,
                  large_object=8*WORD,
+                 aging_size=0,
+                 aging_minors=2,
+                 huge_pages=False,
+                 compact_ratio=0.0,
                  ArenaCollectionClass=None,
                  **kwds):
         "NOT_RPYTHON"
@@ -287,6 +389,16 @@ class IncrementalMiniMarkGC(MovingGCBase):
         assert small_request_threshold % WORD == 0
         self.read_from_env = read_from_env
         self.nursery_size = nursery_size
+        # With nursery_max_size > 0, the nursery is allocated with that
+        # size, but only the first 'nursery_cur_size' bytes are used; see
+        # tune_nursery_size().  Otherwise both sizes are equal.
+        self.nursery_cur_size = nursery_size
+        self.nursery_min_size = nursery_min_size
+        self.nursery_max_size = nursery_max_size
+        self.huge_pages = huge_pages
+        self.compact_ratio = compact_ratio
+        self.num_compacted_objects = 0
+        self.frozen_total_size = r_uint(0)     # see freeze()
 
         self.small_request_threshold = small_request_threshold
         self.major_collection_threshold = major_collection_threshold
@@ -298,6 +410,36 @@ class IncrementalMiniMarkGC(MovingGCBase):
         self.max_delta = float(r_uint(-1))
         self.max_number_of_pinned_objects = 0      # computed later
         #
+        # PYPY_GC_MAX_PAUSE_MS support: 'max_pause' is the target in
+        # seconds, or 0.0 if disabled.  The amount of work done by the
+        # marking and sweeping steps is multiplied by 'pause_step_factor',
+        # which adapt_pause_step_factor() adjusts after every step.
+        self.max_pause = 0.0
+        self.pause_step_factor = 1.0
+        self.pause_overruns = 0
+        self.pause_step_at_floor = False
+        #
+        # Statistics for get_stats(), and the callback invoked after
+        # collections if set_event_callback() was called.
+        self.num_minor_collects = 0
+        self.num_major_steps = 0
+        self.total_minor_time = 0.0
+        self.total_major_time = 0.0
+        self.current_major_collection_time = 0.0
+        self.total_major_collections_time = 0.0
+        self.gc_event_callback = lltype.nullptr(rgc.GC_EVENT_CALLBACK.TO)
+        self.gc_events_pending = False
+        #
+        # Allocation sampling, see set_allocation_sampling().  While it is
+        # enabled, 'nursery_top' may be lowered to the point where the next
+        # sample is due; the real top is then in 'alloc_sample_real_top'.
+        self.alloc_sample_interval = 0
+        self.alloc_sample_callback = lltype.nullptr(
+            rgc.ALLOCATION_SAMPLE_CALLBACK.TO)
+        self.alloc_sample_left = 0
+        self.alloc_sample_start = llmemory.NULL
+        self.alloc_sample_real_top = llmemory.NULL
+        #
         self.card_page_indices = card_page_indices
         if self.card_page_indices > 0:
             self.card_page_shift = 0
@@ -312,6 +454,24 @@ class IncrementalMiniMarkGC(MovingGCBase):
         self.nursery_free = llmemory.NULL
         self.nursery_top  = llmemory.NULL
         self.debug_tiny_nursery = -1
+        #
+        # The aging space, if 'aging_size' > 0: two halves of 'aging_size'
+        # bytes.  The objects currently in the aging space are between
+        # 'aging_start' and 'aging_end', in one of the halves.  During a
+        # minor collection, the surviving ones are copied to the other
+        # half, from 'aging_copy_start' to 'aging_copy_free', as long as
+        # 'aging_copy_room' bytes are left; see start_aging_copy().
+        self.aging_size = aging_size & ~(WORD-1)
+        self.aging_minors = aging_minors
+        self.aging_space      = llmemory.NULL
+        self.aging_space_end  = llmemory.NULL
+        self.aging_start      = llmemory.NULL
+        self.aging_end        = llmemory.NULL
+        self.aging_copy_start = llmemory.NULL
+        self.aging_copy_free  = llmemory.NULL
+        self.aging_copy_room = 0
+        self.aging_max_age = 0
+        self.aging_promote_all = False
         self.debug_rotating_nurseries = lltype.nullptr(NURSARRAY)
         self.extra_threshold = 0
         #
@@ -331,6 +491,12 @@ class IncrementalMiniMarkGC(MovingGCBase):
         # minor collection.
         self.old_objects_pointing_to_young = self.AddressStack()
         #
+        # Used by minor collections with the aging space: the old objects
+        # found to point to objects in the aging space.  At the end of the
+        # minor collection, they are moved to 'old_objects_pointing_to_young',
+        # because the next minor collection will move these objects again.
+        self.old_objects_pointing_to_aging = self.AddressStack()
+        #
         # Similar to 'old_objects_pointing_to_young', but lists objects
         # that have the GCFLAG_CARDS_SET bit.  For large arrays.  Note
         # that it is possible for an object to be listed both in here
@@ -425,14 +591,20 @@ class IncrementalMiniMarkGC(MovingGCBase):
         # up the env var, which requires the GC; and then really
         # allocate the nursery of the final size.
         if not self.read_from_env:
-            self.allocate_nursery()
+            if self.huge_pages:
+                self.ac.use_huge_pages()
             self.gc_increment_step = self.nursery_size * 4
+            self.setup_nursery_tuning()
+            self.allocate_nursery()
             self.gc_nursery_debug = False
         else:
             #
             defaultsize = self.nursery_size
             minsize = 2 * (self.nonlarge_max + 1)
             self.nursery_size = minsize
+            self.nursery_cur_size = minsize
+            huge_pages = self.huge_pages
+            self.huge_pages = False     # not for this nursery, freed below
             self.allocate_nursery()
             #
             # From there on, the GC is fully initialized and the code
@@ -453,6 +625,13 @@ class IncrementalMiniMarkGC(MovingGCBase):
                 self.debug_tiny_nursery = newsize & ~(WORD-1)
                 newsize = minsize
             #
+            nursery_max_size = env.read_from_env('PYPY_GC_NURSERY_MAX')
+            if nursery_max_size > 0:
+                self.nursery_max_size = nursery_max_size
+            nursery_min_size = env.read_from_env('PYPY_GC_NURSERY_MIN')
+            if nursery_min_size > 0:
+                self.nursery_min_size = nursery_min_size
+            #
             major_coll = env.read_float_from_env('PYPY_GC_MAJOR_COLLECT')
             if major_coll > 1.0:
                 self.major_collection_threshold = major_coll
@@ -484,6 +663,24 @@ class IncrementalMiniMarkGC(MovingGCBase):
             else:
                 self.gc_increment_step = newsize * 4
             #
+            max_pause_ms = env.read_float_from_env('PYPY_GC_MAX_PAUSE_MS')
+            if max_pause_ms > 0.0:
+                self.max_pause = max_pause_ms / 1000.0
+            #
+            aging_size = env.read_from_env('PYPY_GC_AGING')
+            if aging_size > 0:
+                self.aging_size = aging_size & ~(WORD-1)
+            aging_minors = env.read_uint_from_env('PYPY_GC_AGING_MINORS')
+            if aging_minors > 0:
+                self.aging_minors = aging_minors
+            #
+            if env.read_uint_from_env('PYPY_GC_HUGEPAGES') > 0:
+                huge_pages = True
+            #
+            compact_ratio = env.read_float_from_env('PYPY_GC_COMPACT')
+            if compact_ratio > 0.0:
+                self.compact_ratio = compact_ratio
+            #
             nursery_debug = env.read_uint_from_env('PYPY_GC_NURSERY_DEBUG')
             if nursery_debug > 0:
                 self.gc_nursery_debug = True
@@ -491,7 +688,11 @@ class IncrementalMiniMarkGC(MovingGCBase):
                 self.gc_nursery_debug = False
             self._minor_collection()    # to empty the nursery
             llarena.arena_free(self.nursery)
+            self.huge_pages = huge_pages
+            if self.huge_pages:
+                self.ac.use_huge_pages()
             self.nursery_size = newsize
+            self.setup_nursery_tuning()
             self.allocate_nursery()
         #
         env_max_number_of_pinned_objects = os.environ.get('PYPY_GC_MAX_PINNED')
@@ -507,6 +708,9 @@ class IncrementalMiniMarkGC(MovingGCBase):
             # Estimate this number conservatively
             bigobj = self.nonlarge_max + 1
             self.max_number_of_pinned_objects = self.nursery_size / (bigobj * 2)
+        #
+        if self.aging_size > 0:
+            self.allocate_aging_space()
 
     def _nursery_memory_size(self):
         extra = self.nonlarge_max + 1
@@ -517,21 +721,49 @@ class IncrementalMiniMarkGC(MovingGCBase):
         # the nursery than really needed, to simplify pointer arithmetic
         # in malloc_fixedsize().  The few extra pages are never used
         # anyway so it doesn't even count.
-        nursery = llarena.arena_malloc(self._nursery_memory_size(), 0)
+        nursery = self._arena_malloc(self._nursery_memory_size())
         if not nursery:
             out_of_memory("cannot allocate nursery")
         return nursery
 
+    def _arena_malloc(self, size):
+        # with PYPY_GC_HUGEPAGES, the memory is never freed
+        if self.huge_pages:
+            return llarena.arena_mmap(size)
+        return llarena.arena_malloc(size, 0)
+
+    def setup_nursery_tuning(self):
+        # Called before allocate_nursery(), with 'nursery_size' set to the
+        # initial size.  If 'nursery_max_size' is larger, make the nursery
+        # that big, and only use the initial size of it for now.
+        self.nursery_cur_size = self.nursery_size
+        if self.nursery_max_size > self.nursery_size:
+            minsize = 2 * (self.nonlarge_max + 1)
+            if self.nursery_min_size <= 0:
+                self.nursery_min_size = self.nursery_size // 4
+            if self.nursery_min_size < minsize:
+                self.nursery_min_size = minsize
+            elif self.nursery_min_size > self.nursery_size:
+                self.nursery_min_size = self.nursery_size
+            self.nursery_min_size &= ~(WORD-1)
+            self.nursery_max_size &= ~(WORD-1)
+            self.nursery_size = self.nursery_max_size
+        else:
+            self.nursery_max_size = 0     # disabled
+
     def allocate_nursery(self):
         debug_start("gc-set-nursery-size")
-        debug_print("nursery size:", self.nursery_size)
+        debug_print("nursery size:", self.nursery_cur_size)
+        if self.nursery_max_size > 0:
+            debug_print("nursery size bounds:", self.nursery_min_size,
+                        self.nursery_max_size)
         self.nursery = self._alloc_nursery()
         # the current position in the nursery:
         self.nursery_free = self.nursery
         # the end of the nursery:
-        self.nursery_top = self.nursery + self.nursery_size
+        self.nursery_top = self.nursery + self.nursery_cur_size
         # initialize the threshold
-        self.min_heap_size = max(self.min_heap_size, self.nursery_size *
+        self.min_heap_size = max(self.min_heap_size, self.nursery_cur_size *
                                               self.major_collection_threshold)
         # the following two values are usually equal, but during raw mallocs
         # with memory pressure accounting, next_major_collection_threshold
@@ -544,6 +776,24 @@ class IncrementalMiniMarkGC(MovingGCBase):
         debug_stop("gc-set-nursery-size")
 
 
+    def allocate_aging_space(self):
+        if self.aging_minors < 2:
+            self.aging_minors = 2
+        elif self.aging_minors > AGING_MAX_MINORS:
+            self.aging_minors = AGING_MAX_MINORS
+        debug_start("gc-set-aging-size")
+        debug_print("aging space size:", self.aging_size,
+                    "minor collections before old:", self.aging_minors)
+        self.aging_space = self._arena_malloc(2 * self.aging_size)
+        if not self.aging_space:
+            out_of_memory("cannot allocate aging space")
+        self.aging_space_end = self.aging_space + 2 * self.aging_size
+        self.aging_start = self.aging_space
+        self.aging_end = self.aging_space
+        # objects whose age is below this value stay in the aging space
+        self.aging_max_age = GCFLAG_AGE_ONE * (self.aging_minors - 1)
+        debug_stop("gc-set-aging-size")
+
     def set_major_threshold_from(self, threshold, reserving_size=0):
         # Set the next_major_collection_threshold.
         threshold_max = (self.next_major_collection_initial *
@@ -602,7 +852,7 @@ class IncrementalMiniMarkGC(MovingGCBase):
             #
             llarena.arena_protect(newnurs, self._nursery_memory_size(), False)
             self.nursery = newnurs
-            self.nursery_top = self.nursery + self.nursery_size
+            self.nursery_top = self.nursery + self.nursery_cur_size
             debug_print("switching from nursery", oldnurs,
                         "to nursery", self.nursery,
                         "size", self.nursery_size)
@@ -750,6 +1000,7 @@ class IncrementalMiniMarkGC(MovingGCBase):
         else:
             self.minor_and_major_collection()
         self.rrc_invoke_callback()
+        self.invoke_gc_event_callback()
 
 
     def minor_collection_with_major_progress(self, extrasize=0):
@@ -768,7 +1019,7 @@ class IncrementalMiniMarkGC(MovingGCBase):
         #
         # Within a major collection cycle, every call to
         # major_collection_step() increments
-        # 'threshold_objects_made_old' by nursery_size/2.
+        # 'threshold_objects_made_old' by nursery_cur_size/2.
 
         if self.gc_state != STATE_SCANNING or self.threshold_reached(extrasize):
             self.major_collection_step(extrasize)
@@ -787,6 +1038,7 @@ class IncrementalMiniMarkGC(MovingGCBase):
                 self.major_collection_step(extrasize)
 
         self.rrc_invoke_callback()
+        self.invoke_gc_event_callback()
 
 
     def collect_and_reserve(self, totalsize):
@@ -795,7 +1047,14 @@ class IncrementalMiniMarkGC(MovingGCBase):
         jump over the pinned object and try again to reserve totalsize.
         Otherwise do a minor collection, and possibly some steps of a
         major collection, and finally reserve totalsize bytes.
+        With allocation sampling, we also come here when nursery_top was
+        only lowered to take the next sample.
         """
+        if self.alloc_sample_interval > 0:
+            self.alloc_sample_count(totalsize)
+            if self.nursery_free <= self.nursery_top:
+                self.alloc_sample_lower_top()
+                return self.nursery_free - totalsize
 
         minor_collection_count = 0
         while True:
@@ -858,6 +1117,8 @@ class IncrementalMiniMarkGC(MovingGCBase):
                               "Calling minor_collection() twice is not "
                               "enough. Too many pinned objects?")
                     self._minor_collection()
+                if self.alloc_sample_interval > 0:
+                    self.alloc_sample_restore_top()
             #
             # Tried to do something about nursery_free overflowing
             # nursery_top before this point. Try to reserve totalsize now.
@@ -873,6 +1134,8 @@ class IncrementalMiniMarkGC(MovingGCBase):
             if self.nursery_top - self.nursery_free > self.debug_tiny_nursery:
                 self.nursery_free = self.nursery_top - self.debug_tiny_nursery
         #
+        if self.alloc_sample_interval > 0:
+            self.alloc_sample_lower_top()
         return result
     collect_and_reserve._dont_inline_ = True
 
@@ -918,7 +1181,7 @@ class IncrementalMiniMarkGC(MovingGCBase):
         # MemoryError.
         if self.threshold_reached(raw_malloc_usage(totalsize)):
             self.minor_collection_with_major_progress(
-                raw_malloc_usage(totalsize) + self.nursery_size // 2)
+                raw_malloc_usage(totalsize) + self.nursery_cur_size // 2)
         #
         # Check if the object would fit in the ArenaCollection.
         # Also, an object allocated from ArenaCollection must be old.
@@ -1031,7 +1294,10 @@ class IncrementalMiniMarkGC(MovingGCBase):
         if self.next_major_collection_threshold < 0:
             # cannot trigger a full collection now, but we can ensure
             # that one will occur very soon
+            if self.alloc_sample_interval > 0:
+                self.alloc_sample_count(0)
             self.nursery_free = self.nursery_top
+            self.alloc_sample_start = self.nursery_free
 
     def can_optimize_clean_setarrayitems(self):
         if self.card_page_indices > 0:
@@ -1040,7 +1306,12 @@ class IncrementalMiniMarkGC(MovingGCBase):
 
     def can_move(self, obj):
         """Overrides the parent can_move()."""
-        return self.is_in_nursery(obj)
+        if self.is_in_nursery(obj) or self.is_in_aging(obj):
+            return True
+        if self.compact_ratio > 0.0:
+            # the caller will rely on the address of 'obj' not changing
+            self.header(obj).tid |= GCFLAG_NO_COMPACT
+        return False
 
     def pin(self, obj):
         if self.pinned_objects_in_nursery >= self.max_number_of_pinned_objects:
@@ -1048,7 +1319,8 @@ class IncrementalMiniMarkGC(MovingGCBase):
         if not self.is_in_nursery(obj):
             # old objects are already non-moving, therefore pinning
             # makes no sense. If you run into this case, you may forgot
-            # to check can_move(obj).
+            # to check can_move(obj).  Objects in the aging space can't
+            # be pinned either.
             return False
         if self._is_pinned(obj):
             # already pinned, we do not allow to pin it again.
@@ -1134,12 +1406,16 @@ class IncrementalMiniMarkGC(MovingGCBase):
                   "odd-valued (i.e. tagged) pointer unexpected here")
         return self.nursery <= addr < self.nursery + self.nursery_size
 
+    def is_in_aging(self, addr):
+        # Note that this is False for all objects if there is no aging space
+        return self.aging_space <= addr < self.aging_space_end
+
     def is_young_object(self, addr):
         # Check if the object at 'addr' is young.
         if not self.is_valid_gc_object(addr):
             return False     # filter out tagged pointers explicitly.
-        if self.is_in_nursery(addr):
-            return True      # addr is in the nursery
+        if self.is_in_nursery(addr) or self.is_in_aging(addr):
+            return True      # addr is in the nursery or the aging space
         # Else, it may be in the set 'young_rawmalloced_objects'
         return (bool(self.young_rawmalloced_objects) and
                 self.young_rawmalloced_objects.contains(addr))
@@ -1149,11 +1425,11 @@ class IncrementalMiniMarkGC(MovingGCBase):
                 and not self.is_young_object(addr))
 
     def is_forwarded(self, obj):
-        """Returns True if the nursery obj is marked as forwarded.
+        """Returns True if the nursery or aging obj is marked as forwarded.
         Implemented a bit obscurely by checking an unrelated flag
         that can never be set on a young object -- except if tid == -42.
         """
-        ll_assert(self.is_in_nursery(obj),
+        ll_assert(self.is_in_nursery(obj) or self.is_in_aging(obj),
                   "Can't forward an object outside the nursery.")
         tid = self.header(obj).tid
         result = (tid & GCFLAG_FINALIZATION_ORDERING != 0)
@@ -1161,19 +1437,21 @@ class IncrementalMiniMarkGC(MovingGCBase):
             ll_assert(tid == -42, "bogus header for young obj")
         else:
             ll_assert(bool(tid), "bogus header (1)")
-            ll_assert(tid & -_GCFLAG_FIRST_UNUSED == 0, "bogus header (2)")
+            ll_assert(tid & _GCFLAG_UNUSED_BITS == 0, "bogus header (2)")
         return result
 
     def get_forwarding_address(self, obj):
         return llmemory.cast_adr_to_ptr(obj, FORWARDSTUBPTR).forw
 
     def get_possibly_forwarded_type_id(self, obj):
-        if self.is_in_nursery(obj) and self.is_forwarded(obj):
+        if ((self.is_in_nursery(obj) or self.is_in_aging(obj)) and
+                self.is_forwarded(obj)):
             obj = self.get_forwarding_address(obj)
         return self.get_type_id(obj)
 
     def get_possibly_forwarded_tid(self, obj):
-        if self.is_in_nursery(obj) and self.is_forwarded(obj):
+        if ((self.is_in_nursery(obj) or self.is_in_aging(obj)) and
+                self.is_forwarded(obj)):
             obj = self.get_forwarding_address(obj)
         return self.header(obj).tid
 
@@ -1187,6 +1465,89 @@ class IncrementalMiniMarkGC(MovingGCBase):
         return (self.next_major_collection_threshold -
                 float(self.get_total_memory_used())) < float(extra)
 
+    def get_stats(self, stat_no):
+        """Implementation of rgc.get_stats()."""
+        if stat_no == rgc.TOTAL_MEMORY:
+            return intmask(self.get_total_memory_used())
+        elif stat_no == rgc.ARENA_MEMORY:
+            return intmask(self.ac.total_memory_used)
+        elif stat_no == rgc.ARENA_ALLOCATED:
+            return self.ac.num_arenas * self.ac.arena_size
+        elif stat_no == rgc.RAWMALLOCED_MEMORY:
+            return intmask(self.rawmalloced_total_size)
+        elif stat_no == rgc.NURSERY_SIZE:
+            return self.nursery_cur_size
+        elif stat_no == rgc.NURSERY_USED:
+            return self.nursery_free - self.nursery
+        elif stat_no == rgc.PINNED_OBJECTS:
+            return self.pinned_objects_in_nursery
+        elif stat_no == rgc.MINOR_COLLECTIONS:
+            return self.num_minor_collects
+        elif stat_no == rgc.MINOR_COLLECTIONS_TIME:
+            return _microseconds(self.total_minor_time)
+        elif stat_no == rgc.MAJOR_STEPS:
+            return self.num_major_steps
+        elif stat_no == rgc.MAJOR_STEPS_TIME:
+            return _microseconds(self.total_major_time)
+        elif stat_no == rgc.MAJOR_COLLECTIONS:
+            return self.num_major_collects
+        elif stat_no == rgc.MAJOR_COLLECTIONS_TIME:
+            return _microseconds(self.total_major_collections_time)
+        elif stat_no == rgc.GC_STATE:
+            return self.gc_state
+        return -1
+
+    def set_event_callback(self, callback):
+        """Implementation of rgc.set_gc_event_callback()."""
+        self.gc_event_callback = callback
+
+    def invoke_gc_event_callback(self):
+        if self.gc_events_pending:
+            self.gc_events_pending = False
+            self.gc_event_callback()
+
+    def set_allocation_sampling(self, interval, callback):
+        """Implementation of rgc.set_allocation_sampling()."""
+        self.alloc_sample_restore_top()
+        if interval <= 0 or not callback:
+            interval = 0
+            callback = lltype.nullptr(rgc.ALLOCATION_SAMPLE_CALLBACK.TO)
+        self.alloc_sample_interval = interval
+        self.alloc_sample_callback = callback
+        self.alloc_sample_left = interval
+        if interval > 0:
+            self.alloc_sample_lower_top()
+
+    def alloc_sample_restore_top(self):
+        if self.alloc_sample_real_top:
+            self.nursery_top = self.alloc_sample_real_top
+            self.alloc_sample_real_top = llmemory.NULL
+
+    def alloc_sample_lower_top(self):
+        # Called when 'nursery_free' and 'nursery_top' were just set.  Lower
+        # 'nursery_top' so that the allocation that crosses the point where
+        # the next sample is due goes to collect_and_reserve().  This works
+        # for the allocations inlined by the JIT too.
+        self.alloc_sample_start = self.nursery_free
+        if self.alloc_sample_left < self.nursery_top - self.nursery_free:
+            self.alloc_sample_real_top = self.nursery_top
+            self.nursery_top = self.nursery_free + self.alloc_sample_left
+
+    def alloc_sample_count(self, totalsize):
+        # Count the bytes allocated since alloc_sample_lower_top(), and
+        # take a sample if the allocation of 'totalsize' bytes that just
+        # bumped 'nursery_free' crossed the sampling point.
+        self.alloc_sample_restore_top()
+        self.alloc_sample_left -= self.nursery_free - self.alloc_sample_start
+        self.alloc_sample_start = self.nursery_free
+        if self.alloc_sample_left < 0:
+            interval = self.alloc_sample_interval
+            self.alloc_sample_left += (
+                (-self.alloc_sample_left - 1) // interval + 1) * interval
+            size = raw_malloc_usage(totalsize)
+            if size > 0:
+                self.alloc_sample_callback(size)
+
     def card_marking_words_for_length(self, length):
         # --- Unoptimized version:
         #num_bits = ((length-1) >> self.card_page_shift) + 1
@@ -1209,7 +1570,9 @@ class IncrementalMiniMarkGC(MovingGCBase):
         if self.DEBUG:
             ll_assert(not self.young_rawmalloced_objects,
                       "young raw-malloced objects in a major collection")
-            ll_assert(not self.young_objects_with_weakrefs.non_empty(),
+            # (old weakrefs to objects in the aging space stay in this list)
+            ll_assert(self.aging_start != self.aging_end or
+                      not self.young_objects_with_weakrefs.non_empty(),
                       "young objects with weakrefs in a major collection")
 
             if self.raw_malloc_might_sweep.non_empty():
@@ -1227,6 +1590,13 @@ class IncrementalMiniMarkGC(MovingGCBase):
                 MovingGCBase.debug_check_consistency(self)
                 self._debug_objects_to_trace_dict2.delete()
                 self._debug_objects_to_trace_dict1.delete()
+            elif self.aging_start != self.aging_end:
+                # the old objects pointing to the aging space are in
+                # 'old_objects_pointing_to_young' (see finish_aging_copy())
+                self._debug_aging_parents = \
+                            self.old_objects_pointing_to_young.stack2dict()
+                MovingGCBase.debug_check_consistency(self)
+                self._debug_aging_parents.delete()
             else:
                 MovingGCBase.debug_check_consistency(self)
 
@@ -1248,6 +1618,14 @@ class IncrementalMiniMarkGC(MovingGCBase):
         else:
             ll_assert(self.is_in_nursery(obj),
                       "pinned object not in nursery")
+        if self.is_in_aging(obj):
+            ll_assert(self.header(obj).tid & GCFLAG_AGE_MASK != 0,
+                      "object in the aging space without GCFLAG_AGE_xxx")
+            ll_assert(self.gc_state == STATE_SCANNING,
+                      "object in the aging space during a major collection")
+        else:
+            ll_assert(self.header(obj).tid & GCFLAG_AGE_MASK == 0,
+                      "GCFLAG_AGE_xxx outside the aging space")
 
         if self.gc_state == STATE_SCANNING:
             self._debug_check_object_scanning(obj)
@@ -1297,10 +1675,12 @@ class IncrementalMiniMarkGC(MovingGCBase):
         # but this flag is progressively removed in the sweeping phase.
 
         # All objects should have this flag, except if they
-        # don't have any GC pointer or are pinned objects
+        # don't have any GC pointer or are pinned objects, or are
+        # in the aging space or point to it
         typeid = self.get_type_id(obj)
         if self.has_gcptr(typeid) and not self._is_pinned(obj):
-            ll_assert(self.header(obj).tid & GCFLAG_TRACK_YOUNG_PTRS != 0,
+            ll_assert(self.header(obj).tid & GCFLAG_TRACK_YOUNG_PTRS != 0 or
+                      self._debug_is_aging_or_parent(obj),
                       "missing GCFLAG_TRACK_YOUNG_PTRS")
         # the GCFLAG_FINALIZATION_ORDERING should not be set between coll.
         ll_assert(self.header(obj).tid & GCFLAG_FINALIZATION_ORDERING == 0,
@@ -1331,6 +1711,12 @@ class IncrementalMiniMarkGC(MovingGCBase):
                           "the card marker bits are not cleared")
                 i -= 1
 
+    def _debug_is_aging_or_parent(self, obj):
+        if self.gc_state != STATE_SCANNING or self.aging_start == self.aging_end:
+            return False
+        return (self.is_in_aging(obj) or
+                self._debug_aging_parents.contains(obj))
+
     def _debug_check_object_finalizing(self, obj):
         # Same invariants as STATE_SCANNING.
         self._debug_check_object_scanning(obj)
@@ -1620,6 +2006,20 @@ class IncrementalMiniMarkGC(MovingGCBase):
         that remain alive and move them out."""
         #
         debug_start("gc-minor")
+        start_time = self.read_gc_clock()
+        #
+        # With allocation sampling, count what was allocated since the last
+        # call to collect_and_reserve(), unless we are called from there
+        # (then nursery_free is NULL).
+        if self.alloc_sample_interval > 0 and self.nursery_free:
+            self.alloc_sample_count(0)
+        #
+        # How much of the nursery was used, for tune_nursery_size().  If
+        # we are called from collect_and_reserve(), it is full.
+        if self.nursery_free:
+            nursery_used = self.nursery_free - self.nursery
+        else:
+            nursery_used = self.nursery_cur_size
         #
         # All nursery barriers are invalid from this point on.  They
         # are evaluated anew as part of the minor collection.
@@ -1636,6 +2036,11 @@ class IncrementalMiniMarkGC(MovingGCBase):
         self.pinned_objects_in_nursery = 0
         self.any_pinned_object_kept = False
         #
+        # Prepare the other half of the aging space, if any, to receive the
+        # surviving objects.
+        if self.aging_space:
+            self.start_aging_copy()
+        #
         # Before everything else, remove from 'old_objects_pointing_to_young'
         # the young arrays.
         if self.young_rawmalloced_objects:
@@ -1744,6 +2149,16 @@ class IncrementalMiniMarkGC(MovingGCBase):
         if self.young_rawmalloced_objects:
             self.free_young_rawmalloced_objects()
         #
+        # All live objects of the previous half of the aging space are
+        # out of it too.  Switch to the other half.
+        if self.aging_space:
+            self.finish_aging_copy()
+        #
+        # Adapt the part of the nursery used from now on.
+        if self.nursery_max_size > 0:
+            self.tune_nursery_size(nursery_used,
+                                   self.read_gc_clock() - start_time)
+        #
         # All live nursery objects are out of the nursery or pinned inside
         # the nursery.  Create nursery barriers to protect the pinned objects,
         # fill the rest of the nursery with zeros and reset the current nursery
@@ -1789,14 +2204,21 @@ class IncrementalMiniMarkGC(MovingGCBase):
         else:
             llarena.arena_reset(prev, self.nursery + self.nursery_size - prev, 0)
         #
-        # always add the end of the nursery to the list
-        nursery_barriers.append(self.nursery + self.nursery_size)
+        # always add the end of the nursery to the list.  With a nursery
+        # of adaptive size, it is the end of the part in use, or the end of
+        # the last pinned object if that is further.
+        nursery_end = self.nursery + self.nursery_cur_size
+        if nursery_barriers.non_empty() and nursery_end < prev:
+            nursery_end = prev
+        nursery_barriers.append(nursery_end)
         #
         self.nursery_barriers = nursery_barriers
         self.surviving_pinned_objects.delete()
         #
         self.nursery_free = self.nursery
         self.nursery_top = self.nursery_barriers.popleft()
+        if self.alloc_sample_interval > 0:
+            self.alloc_sample_lower_top()
         #
         # clear GCFLAG_PINNED_OBJECT_PARENT_KNOWN from all parents in the list.
         self.old_objects_pointing_to_pinned.foreach(
@@ -1810,11 +2232,17 @@ class IncrementalMiniMarkGC(MovingGCBase):
                     self.get_total_memory_used())
         debug_print("number of pinned objects:",
                     self.pinned_objects_in_nursery)
+        if self.aging_space:
+            debug_print("aging space used:", self.aging_end - self.aging_start)
         if self.DEBUG >= 2:
             self.debug_check_consistency()     # expensive!
         #
         self.root_walker.finished_minor_collection()
         #
+        self.num_minor_collects += 1
+        self.total_minor_time += self.read_gc_clock() - start_time
+        if self.gc_event_callback:
+            self.gc_events_pending = True
         debug_stop("gc-minor")
 
     def _reset_flag_old_objects_pointing_to_pinned(self, obj, ignore):
@@ -1840,8 +2268,10 @@ class IncrementalMiniMarkGC(MovingGCBase):
         # earlier", i.e. created earlier than the previous minor
         # collection, then we can't use the "is_minor=True" optimization.
         # We really need to walk the complete stack to be sure we still
-        # see them.
-        use_jit_frame_stoppers = not any_pinned_object_from_earlier
+        # see them.  The same is true for objects in the aging space, which
+        # were all created earlier than the previous minor collection.
+        use_jit_frame_stoppers = (not any_pinned_object_from_earlier and
+                                  self.aging_start == self.aging_end)
         #
         self.root_walker.walk_roots(
             callback,     # stack roots
@@ -1937,8 +2367,11 @@ class IncrementalMiniMarkGC(MovingGCBase):
                       "GCFLAG_TRACK_YOUNG_PTRS")
             #
             # Add the flag GCFLAG_TRACK_YOUNG_PTRS.  All live objects should
-            # have this flag set after a nursery collection.
-            self.header(obj).tid |= GCFLAG_TRACK_YOUNG_PTRS
+            # have this flag set after a nursery collection, apart from the
+            # ones in the aging space: like nursery objects, they are
+            # always traced when they move at the next minor collection.
+            if not self.is_in_aging(obj):
+                self.header(obj).tid |= GCFLAG_TRACK_YOUNG_PTRS
             #
             # Trace the 'obj' to replace pointers to nursery with pointers
             # outside the nursery, possibly forcing nursery objects out
@@ -1986,37 +2419,61 @@ class IncrementalMiniMarkGC(MovingGCBase):
         #print '_trace_drag_out(%x: %r)' % (hash(obj.ptr._obj), obj)
         #
         # If 'obj' is not in the nursery, nothing to change -- expect
-        # that we must set GCFLAG_VISITED_RMY on young raw-malloced objects.
+        # that we must set GCFLAG_VISITED_RMY on young raw-malloced objects,
+        # and that objects in the aging space move too.
         if not self.is_in_nursery(obj):
-            # cache usage trade-off: I think that it is a better idea to
-            # check if 'obj' is in young_rawmalloced_objects with an access
-            # to this (small) dictionary, rather than risk a lot of cache
-            # misses by reading a flag in the header of all the 'objs' that
-            # arrive here.
-            if (bool(self.young_rawmalloced_objects)
-                and self.young_rawmalloced_objects.contains(obj)):
-                self._visit_young_rawmalloced_object(obj)
-            return
+            if not self.is_in_aging(obj):
+                # cache usage trade-off: I think that it is a better idea to
+                # check if 'obj' is in young_rawmalloced_objects with an
+                # access to this (small) dictionary, rather than risk a lot
+                # of cache misses by reading a flag in the header of all the
+                # 'objs' that arrive here.
+                if (bool(self.young_rawmalloced_objects)
+                    and self.young_rawmalloced_objects.contains(obj)):
+                    self._visit_young_rawmalloced_object(obj)
+                return
+            if self.aging_copy_start <= obj < self.aging_copy_free:
+                # already copied by the current minor collection
+                self._record_aging_parent(parent)
+                return
+            # else, 'obj' is in the previous half of the aging space:
+            # continue below as if it was a nursery object.
         # copy the contents of the object? usually yes, but not for some
         # shadow objects
         copy = True
+        aging = False
         #
         size_gc_header = self.gcheaderbuilder.size_gc_header
-        if self.header(obj).tid & (GCFLAG_HAS_SHADOW | GCFLAG_PINNED) == 0:
+        tid = self.header(obj).tid
+        if tid & (GCFLAG_HAS_SHADOW | GCFLAG_PINNED) == 0:
             #
             # Common case: 'obj' was not already forwarded (otherwise
             # tid == -42, containing all flags), and it doesn't have the
-            # HAS_SHADOW flag either.  We must move it out of the nursery,
-            # into a new nonmovable location.
+            # HAS_SHADOW flag either.  We must move it to the other half
+            # of the aging space, if it is not too old and if there is
+            # room there, or else out of the nursery, into a new
+            # nonmovable location.
             totalsize = size_gc_header + self.get_size(obj)
-            self.nursery_surviving_size += raw_malloc_usage(totalsize)
-            newhdr = self._malloc_out_of_nursery(totalsize)
+            rawtotalsize = raw_malloc_usage(totalsize)
+            if ((tid & GCFLAG_AGE_MASK) < self.aging_max_age and
+                    rawtotalsize <= self.aging_copy_room):
+                newhdr = self.aging_copy_free
+                self.aging_copy_free = newhdr + totalsize
+                self.aging_copy_room -= rawtotalsize
+                llarena.arena_reserve(newhdr, totalsize)
+                aging = True
+            else:
+                self.nursery_surviving_size += rawtotalsize
+                newhdr = self._malloc_out_of_nursery(totalsize)
             #
         elif self.is_forwarded(obj):
             #
             # 'obj' was already forwarded.  Change the original reference
             # to point to its forwarding address, and we're done.
-            root.address[0] = self.get_forwarding_address(obj)
+            newobj = self.get_forwarding_address(obj)
+            root.address[0] = newobj
+            if self.is_in_aging(newobj):
+                self._record_aging_parent(parent)
             return
             #
         elif self._is_pinned(obj):
@@ -2028,8 +2485,11 @@ class IncrementalMiniMarkGC(MovingGCBase):
             # to the same pinned object). In such a case we need all parents
             # of the pinned object in the list. Otherwise he pinned object could
             # become dead and be removed just because the first parent of it
-            # is dead and collected.
+            # is dead and collected.  Parents in the aging space are not
+            # recorded: if they survive, the next minor collection traces
+            # them again anyway.
             if parent != llmemory.NULL and \
+                not self.is_in_aging(parent) and \
                 not self.header(parent).tid & GCFLAG_PINNED_OBJECT_PARENT_KNOWN:
                 #
                 self.old_objects_pointing_to_pinned.append(parent)
@@ -2081,6 +2541,14 @@ class IncrementalMiniMarkGC(MovingGCBase):
         newobj = newhdr + size_gc_header
         llmemory.cast_adr_to_ptr(obj, FORWARDSTUBPTR).forw = newobj
         #
+        # Count one more minor collection survived in the aging space, or
+        # clear the count if the object is now old.
+        if aging:
+            self.header(newobj).tid += GCFLAG_AGE_ONE
+            self._record_aging_parent(parent)
+        else:
+            self.header(newobj).tid &= ~GCFLAG_AGE_MASK
+        #
         # Change the original pointer to this object.
         root.address[0] = newobj
         #
@@ -2094,6 +2562,17 @@ class IncrementalMiniMarkGC(MovingGCBase):
 
     _trace_drag_out._always_inline_ = True
 
+    def _record_aging_parent(self, parent):
+        # 'parent' points to an object that is now in the aging space.
+        # Unless it is in the aging space itself, record it: the next
+        # minor collection must trace it again, because that object will
+        # move again.
+        if parent and not self.is_in_aging(parent):
+            hdr = self.header(parent)
+            if hdr.tid & GCFLAG_AGING_PARENT == 0:
+                hdr.tid |= GCFLAG_AGING_PARENT
+                self.old_objects_pointing_to_aging.append(parent)
+
     def _visit_young_rawmalloced_object(self, obj):
         # 'obj' points to a young, raw-malloced object.
         # Any young rawmalloced object never seen by the code here
@@ -2134,6 +2613,8 @@ class IncrementalMiniMarkGC(MovingGCBase):
         if (r_uint(raw_malloc_usage(totalsize)) <=
             r_uint(self.small_request_threshold)):
             # most common path
+            if self.gc_state == STATE_SWEEPING:
+                self.ac.sweep_for_malloc(totalsize, self._free_if_unvisited)
             return self.ac.malloc(totalsize)
         else:
             # for nursery objects that are not small
@@ -2158,6 +2639,58 @@ class IncrementalMiniMarkGC(MovingGCBase):
         self.old_rawmalloced_objects.append(arena + size_gc_header)
         return arena
 
+    def start_aging_copy(self):
+        # The surviving objects can be copied to the half of the aging
+        # space that is not in use.  But not during a major collection,
+        # which must only see old objects; nor with rawrefcount, which
+        # doesn't know about the aging space; nor if we are emptying the
+        # aging space, see promote_aging_objects().
+        if self.aging_start == self.aging_space:
+            self.aging_copy_start = self.aging_space + self.aging_size
+        else:
+            self.aging_copy_start = self.aging_space
+        self.aging_copy_free = self.aging_copy_start
+        if (self.gc_state == STATE_SCANNING and not self.aging_promote_all
+                and not self.rrc_enabled):
+            self.aging_copy_room = self.aging_size
+        else:
+            self.aging_copy_room = 0
+
+    def finish_aging_copy(self):
+        # The objects left in the previous half of the aging space are
+        # dead or forwarded.  Clear it and switch to the other half.
+        size = self.aging_end - self.aging_start
+        if size > 0:
+            if self.gc_nursery_debug:
+                llarena.arena_reset(self.aging_start, size, 3)
+            else:
+                llarena.arena_reset(self.aging_start, size, 0)
+        self.aging_start = self.aging_copy_start
+        self.aging_end = self.aging_copy_free
+        self.aging_copy_start = llmemory.NULL
+        self.aging_copy_free = llmemory.NULL
+        self.aging_copy_room = 0
+        #
+        # The old objects pointing to the aging space must be traced by
+        # the next minor collection, like the old objects modified by
+        # the write barrier.
+        while self.old_objects_pointing_to_aging.non_empty():
+            obj = self.old_objects_pointing_to_aging.pop()
+            hdr = self.header(obj)
+            ll_assert(hdr.tid & GCFLAG_TRACK_YOUNG_PTRS != 0,
+                      "object pointing to the aging space without "
+                      "GCFLAG_TRACK_YOUNG_PTRS")
+            hdr.tid &= ~(GCFLAG_AGING_PARENT | GCFLAG_TRACK_YOUNG_PTRS)
+            self.old_objects_pointing_to_young.append(obj)
+
+    def promote_aging_objects(self):
+        """Do a minor collection that makes all the objects of the aging
+        space old, if there are any."""
+        if self.aging_start != self.aging_end:
+            self.aging_promote_all = True
+            self._minor_collection()
+            self.aging_promote_all = False
+
     def free_young_rawmalloced_objects(self):
         self.young_rawmalloced_objects.foreach(
             self._free_young_rawmalloced_obj, None)
@@ -2216,6 +2749,91 @@ class IncrementalMiniMarkGC(MovingGCBase):
     # Note - minor collections seem fast enough so that one
     # is done before every major collection step
     def major_collection_step(self, reserving_size=0):
+        start_state = self.gc_state
+        start_major_collects = self.num_major_collects
+        start_time = self.read_gc_clock()
+        self.pause_step_at_floor = False
+        self._major_collection_step(reserving_size)
+        elapsed = self.read_gc_clock() - start_time
+        self.num_major_steps += 1
+        self.total_major_time += elapsed
+        if self.gc_event_callback:
+            self.gc_events_pending = True
+        # don't count the FINALIZING step in the duration of the major
+        # collection, and don't adapt to it: it runs finalizers, i.e.
+        # user code, and its duration doesn't depend on the GC
+        if start_state != STATE_FINALIZING:
+            self.current_major_collection_time += elapsed
+            if self.num_major_collects != start_major_collects:
+                self.total_major_collections_time += (
+                    self.current_major_collection_time)
+                self.current_major_collection_time = 0.0
+            if self.max_pause > 0.0:
+                self.adapt_pause_step_factor(start_state, elapsed)
+
+    def read_gc_clock(self):
+        # this is called around every minor collection too, even if no
+        # one looks at the times: it is cheap compared to the collection
+        return time.time()
+
+    def adapt_pause_step_factor(self, state, elapsed):
+        """Called after a major collection step that took 'elapsed'
+        seconds, if PYPY_GC_MAX_PAUSE_MS is set.  Halve the amount of
+        work done by the next steps if we are above the target, and
+        grow it slowly again when we are well below."""
+        if elapsed > self.max_pause:
+            self.pause_step_factor = max(self.pause_step_factor * 0.5,
+                                         PAUSE_STEP_FACTOR_MIN)
+            if (self.pause_step_factor <= PAUSE_STEP_FACTOR_MIN or
+                    state == STATE_SCANNING or self.pause_step_at_floor):
+                # Can't do better: either the steps are already as small
+                # as we allow, or this was the non-incremental scanning
+                # of the roots, or a marking step that had to keep up
+                # with the objects surviving the minor collections.
+                self.pause_overruns += 1
+                debug_start("gc-pause-overrun")
+                debug_print("step in gc state", GC_STATES[state],
+                            "took", elapsed * 1000.0, "ms, target is",
+                            self.max_pause * 1000.0, "ms")
+                if self.pause_step_at_floor:
+                    debug_print("step raised to the nursery survivors:",
+                                self.nursery_surviving_size * 2, "bytes")
+                debug_print("total overruns:", self.pause_overruns)
+                debug_stop("gc-pause-overrun")
+        elif elapsed < self.max_pause * 0.5:
+            self.pause_step_factor = min(self.pause_step_factor * 1.25,
+                                         PAUSE_STEP_FACTOR_MAX)
+
+    def tune_nursery_size(self, nursery_used, elapsed):
+        """Called during a minor collection that took 'elapsed' seconds
+        so far, if PYPY_GC_NURSERY_MAX is set.  If few objects survived,
+        double the part of the nursery used: the next minor collections
+        will cost about the same but be needed less often.  If many
+        objects survived, or if PYPY_GC_MAX_PAUSE_MS is exceeded, halve
+        it, to have shorter pauses and stay in the cache."""
+        cursize = self.nursery_cur_size
+        if nursery_used < cursize // 2:
+            return    # e.g. explicit collection with a mostly empty nursery
+        survival = (float(self.nursery_surviving_size) /
+                    float(nursery_used))
+        too_slow = self.max_pause > 0.0 and elapsed > self.max_pause
+        if survival > NURSERY_SURVIVAL_HIGH or too_slow:
+            newsize = max(cursize // 2, self.nursery_min_size)
+        elif survival < NURSERY_SURVIVAL_LOW and (
+                self.max_pause == 0.0 or elapsed < self.max_pause * 0.5):
+            newsize = min(cursize * 2, self.nursery_max_size)
+        else:
+            return
+        newsize &= ~(WORD-1)
+        if newsize != cursize:
+            debug_start("gc-nursery-tune")
+            debug_print("survival rate:", survival, "minor collection:",
+                        elapsed * 1000.0, "ms")
+            debug_print("nursery size:", cursize, "->", newsize)
+            debug_stop("gc-nursery-tune")
+            self.nursery_cur_size = newsize
+
+    def _major_collection_step(self, reserving_size):
         debug_start("gc-collect-step")
         debug_print("starting gc state: ", GC_STATES[self.gc_state])
         # Debugging checks
@@ -2238,7 +2856,7 @@ class IncrementalMiniMarkGC(MovingGCBase):
         #  (A1)  gc_state == STATE_SCANNING   (i.e. major GC cycle ended)
         #  (A2)  size_objects_made_old <= threshold_objects_made_old
         #
-        # Every call to major_collection_step() adds nursery_size//2
+        # Every call to major_collection_step() adds nursery_cur_size//2
         # to 'threshold_objects_made_old'.
         # In the common case, this is larger than the size of all
         # objects that survive a minor collection.  After a few
@@ -2259,13 +2877,17 @@ class IncrementalMiniMarkGC(MovingGCBase):
         #   collection steps must be done immediately, until we
         #   restore the target invariant (A2).
         #
-        self.threshold_objects_made_old += r_uint(self.nursery_size // 2)
+        self.threshold_objects_made_old += r_uint(self.nursery_cur_size // 2)
 
 
         if self.gc_state == STATE_SCANNING:
+            # the major collection only sees old objects
+            self.promote_aging_objects()
+            #
             # starting a major GC cycle: reset these two counters
             self.size_objects_made_old = r_uint(0)
-            self.threshold_objects_made_old = r_uint(self.nursery_size // 2)
+            self.threshold_objects_made_old = r_uint(
+                self.nursery_cur_size // 2)
 
             self.objects_to_trace = self.AddressStack()
             self.collect_roots()
@@ -2277,11 +2899,16 @@ class IncrementalMiniMarkGC(MovingGCBase):
                         self.objects_to_trace.length(),
                         "plus",
                         self.more_objects_to_trace.length())
-            estimate = self.gc_increment_step
-            estimate_from_nursery = self.nursery_surviving_size * 2
+            estimate = intmask(self.gc_increment_step)
+            if self.max_pause > 0.0:
+                estimate = self.scale_pause_step(estimate)
+            # never mark less than what a minor collection makes old, or
+            # the major collection could fall behind the allocations and
+            # never finish, even if this step is then above 'max_pause'
+            estimate_from_nursery = intmask(self.nursery_surviving_size * 2)
             if estimate_from_nursery > estimate:
                 estimate = estimate_from_nursery
-            estimate = intmask(estimate)
+                self.pause_step_at_floor = self.max_pause > 0.0
             remaining = self.visit_all_objects_step(estimate)
             #
             if remaining >= estimate // 2:
@@ -2365,6 +2992,8 @@ class IncrementalMiniMarkGC(MovingGCBase):
                 # a total object size of at least '3 * nursery_size' bytes
                 # is processed.
                 limit = 3 * self.nursery_size // self.small_request_threshold
+                if self.max_pause > 0.0:
+                    limit = self.scale_pause_step(limit)
                 self.free_unvisited_rawmalloc_objects_step(limit)
                 done = False    # the 2nd half below must still be done
             else:
@@ -2373,6 +3002,8 @@ class IncrementalMiniMarkGC(MovingGCBase):
                 # GCFLAG_VISITED on the others.  Visit at most '3 *
                 # nursery_size' bytes.
                 limit = 3 * self.nursery_size // self.ac.page_size
+                if self.max_pause > 0.0:
+                    limit = self.scale_pause_step(limit)
                 done = self.ac.mass_free_incremental(self._free_if_unvisited,
                                                      limit)
             # XXX tweak the limits above
@@ -2383,6 +3014,9 @@ class IncrementalMiniMarkGC(MovingGCBase):
                 # We also need to reset the GCFLAG_VISITED on prebuilt GC objects.
                 self.prebuilt_root_objects.foreach(self._reset_gcflag_visited, None)
                 #
+                if self.compact_ratio > 0.0:
+                    self.maybe_compact_arenas()
+                #
                 # Set the threshold for the next major collection to be when we
                 # have allocated 'major_collection_threshold' times more than
                 # we currently have -- but no more than 'max_delta' more than
@@ -2434,6 +3068,12 @@ class IncrementalMiniMarkGC(MovingGCBase):
         debug_print("stopping, now in gc state: ", GC_STATES[self.gc_state])
         debug_stop("gc-collect-step")
 
+    def scale_pause_step(self, amount):
+        amount = int(amount * self.pause_step_factor)
+        if amount < 1:
+            amount = 1
+        return amount
+
     def _sweep_old_objects_pointing_to_pinned(self, obj, new_list):
         if self.header(obj).tid & GCFLAG_VISITED:
             new_list.append(obj)
@@ -2493,6 +3133,237 @@ class IncrementalMiniMarkGC(MovingGCBase):
         return nobjects
 
 
+    # ----------
+    # Compaction of the ArenaCollection (PYPY_GC_COMPACT)
+
+    def maybe_compact_arenas(self):
+        # Called at the end of a major collection.  There are no young
+        # objects here, apart from the pinned ones, which don't contain
+        # GC pointers.  Not done with rawrefcount, where the PyObjects
+        # contain the address of the objects.
+        if self.rrc_enabled:
+            return
+        arenas_size = float(self.ac.num_arenas) * float(self.ac.arena_size)
+        # don't count the pages frozen by rgc.freeze()
+        arenas_size -= (float(self.ac.num_frozen_pages) *
+                        float(self.ac.page_size))
+        if float(self.ac.total_memory_used) < self.compact_ratio * arenas_size:
+            self.compact_arenas()
+
+    def compact_arenas(self):
+        """Move the objects out of the sparsely used pages of the
+        ArenaCollection, and update all references to them.  The pages
+        are then freed, and so are the arenas that become empty.
+        """
+        ll_assert(not self.old_objects_pointing_to_young.non_empty(),
+                  "compact_arenas: old_objects_pointing_to_young not empty")
+        ll_assert(not self.old_objects_with_cards_set.non_empty(),
+                  "compact_arenas: old_objects_with_cards_set not empty")
+        debug_start("gc-compact")
+        num_arenas = self.ac.num_arenas
+        self.num_compacted_objects = 0
+        npages = self.ac.compact_prepare()
+        if npages > 0:
+            # Copy the objects, leaving a forwarding stub behind
+            self.ac.compact_walk(self._compact_move_object)
+            #
+            # Update the references from the roots and from all objects
+            self.root_walker.walk_roots(
+                IncrementalMiniMarkGC._compact_update_ref_stk,  # stack roots
+                IncrementalMiniMarkGC._compact_update_ref_stk,  # static
+                None)
+            self.prebuilt_root_objects.foreach(self._compact_update_fields,
+                                               None)
+            self.old_rawmalloced_objects.foreach(self._compact_update_fields,
+                                                 None)
+            self.ac.mass_free(self._compact_update_object)
+            #
+            # Update the lists of objects that the GC keeps
+            self.old_objects_with_weakrefs = self._compact_update_stack(
+                self.old_objects_with_weakrefs)
+            self.old_objects_with_weakrefs.foreach(
+                self._compact_update_weakref, None)
+            self.old_objects_with_destructors = self._compact_update_stack(
+                self.old_objects_with_destructors)
+            self.old_objects_pointing_to_pinned = self._compact_update_stack(
+                self.old_objects_pointing_to_pinned)
+            self._compact_update_finalizers()
+            self.copy_pending_finalizers(self._compact_new_address)
+            #
+            # Free the copied objects, and update the ones left in place
+            self.ac.compact_finish(self._compact_free_if_moved)
+        debug_print("compacted pages:", npages)
+        debug_print("moved objects:", self.num_compacted_objects)
+        debug_print("freed arenas:", num_arenas - self.ac.num_arenas)
+        debug_stop("gc-compact")
+
+    def _compact_move_object(self, hdr):
+        size_gc_header = self.gcheaderbuilder.size_gc_header
+        obj = hdr + size_gc_header
+        if self.header(obj).tid & GCFLAG_NO_COMPACT:
+            return False
+        totalsize = size_gc_header + self.get_size(obj)
+        newhdr = self.ac.malloc(totalsize)
+        llmemory.raw_memcopy(hdr, newhdr, totalsize)
+        #
+        # Same forwarding stub as in _trace_drag_out()
+        llarena.arena_reset(hdr, totalsize, 0)
+        llarena.arena_reserve(hdr,
+                              size_gc_header + llmemory.sizeof(FORWARDSTUB))
+        self.header(obj).tid = -42
+        newobj = newhdr + size_gc_header
+        llmemory.cast_adr_to_ptr(obj, FORWARDSTUBPTR).forw = newobj
+        self.num_compacted_objects += 1
+        return False
+
+    def _compact_is_moved(self, obj):
+        # like is_forwarded(): GCFLAG_FINALIZATION_ORDERING is never set
+        # on the other objects here
+        tid = self.header(obj).tid
+        result = (tid & GCFLAG_FINALIZATION_ORDERING != 0)
+        if result:
+            ll_assert(tid == -42, "bogus header for moved obj")
+        return result
+
+    def _compact_new_address(self, obj):
+        if self._compact_is_moved(obj):
+            return self.get_forwarding_address(obj)
+        return obj
+
+    def _compact_update_ref(self, root, ignored):
+        root.address[0] = self._compact_new_address(root.address[0])
+
+    def _compact_update_ref_stk(self, root):
+        if self.points_to_valid_gc_object(root):
+            self._compact_update_ref(root, None)
+
+    def _compact_update_fields(self, obj, ignored):
+        self.trace(obj, self._compact_update_ref, None)
+
+    def _compact_update_object(self, hdr):
+        size_gc_header = self.gcheaderbuilder.size_gc_header
+        self._compact_update_fields(hdr + size_gc_header, None)
+        return False
+
+    def _compact_free_if_moved(self, hdr):
+        size_gc_header = self.gcheaderbuilder.size_gc_header
+        obj = hdr + size_gc_header
+        if self._compact_is_moved(obj):
+            return True
+        self._compact_update_fields(obj, None)
+        return False
+
+    def _compact_update_weakref(self, obj, ignored):
+        offset = self.weakpointer_offset(self.get_type_id(obj))
+        pointing_to = (obj + offset).address[0]
+        if pointing_to:
+            (obj + offset).address[0] = self._compact_new_address(pointing_to)
+
+    def _compact_update_stack(self, oldlist):
+        newlist = self.AddressStack()
+        while oldlist.non_empty():
+            newlist.append(self._compact_new_address(oldlist.pop()))
+        oldlist.delete()
+        return newlist
+
+    def _compact_update_finalizers(self):
+        # 'old_objects_with_finalizers' contains pairs (obj, fq_index)
+        new_with_finalizer = self.AddressDeque()
+        while self.old_objects_with_finalizers.non_empty():
+            obj = self.old_objects_with_finalizers.popleft()
+            fq_nr = self.old_objects_with_finalizers.popleft()
+            new_with_finalizer.append(self._compact_new_address(obj))
+            new_with_finalizer.append(fq_nr)
+        self.old_objects_with_finalizers.delete()
+        self.old_objects_with_finalizers = new_with_finalizer
+
+
+    # ----------
+    # Freezing the objects currently alive (rgc.freeze())
+
+    def freeze(self):
+        """Make all the objects currently alive immortal.  They get the
+        flag GCFLAG_NO_HEAP_PTRS, like prebuilt objects: the major
+        collections don't mark them, and if one of them is modified, the
+        write barrier adds it to 'prebuilt_root_objects'.  The pages and
+        the raw-malloced blocks that contain them are never swept again.
+        """
+        self.collect()
+        # the finalizers may have allocated objects: make them old too
+        self._minor_collection()
+        self.promote_aging_objects()
+        ll_assert(self.gc_state == STATE_SCANNING, "freeze: bad gc_state")
+        debug_start("gc-freeze")
+        #
+        self.ac.mass_free(self._freeze_arena_object)
+        frozen_size = self.ac.freeze_pages()
+        #
+        size_gc_header = self.gcheaderbuilder.size_gc_header
+        new_rawmalloced_objects = self.AddressStack()
+        while self.old_rawmalloced_objects.non_empty():
+            obj = self.old_rawmalloced_objects.pop()
+            if self.header(obj).tid & GCFLAG_HAS_CARDS:
+                # the write barrier doesn't expect GCFLAG_NO_HEAP_PTRS
+                # on arrays with cards.  Keep this one as a normal object,
+                # but it is now a root, because the frozen objects that
+                # point to it are not traced any more.
+                new_rawmalloced_objects.append(obj)
+                self.prebuilt_root_objects.append(obj)
+            else:
+                self.header(obj).tid |= GCFLAG_NO_HEAP_PTRS
+                totalsize = size_gc_header + self.get_size(obj)
+                allocsize = r_uint(raw_malloc_usage(totalsize))
+                self.rawmalloced_total_size -= allocsize
+                frozen_size += allocsize
+        self.old_rawmalloced_objects.delete()
+        self.old_rawmalloced_objects = new_rawmalloced_objects
+        #
+        # the objects that point to pinned objects must still be traced
+        self.old_objects_pointing_to_pinned.foreach(self._freeze_as_root,
+                                                    None)
+        #
+        # forget the frozen objects with weakrefs, destructors or
+        # finalizers: they never die
+        self.old_objects_with_weakrefs = self._remove_frozen_objects(
+            self.old_objects_with_weakrefs)
+        self.old_objects_with_destructors = self._remove_frozen_objects(
+            self.old_objects_with_destructors)
+        new_with_finalizer = self.AddressDeque()
+        while self.old_objects_with_finalizers.non_empty():
+            obj = self.old_objects_with_finalizers.popleft()
+            fq_nr = self.old_objects_with_finalizers.popleft()
+            if self.header(obj).tid & GCFLAG_NO_HEAP_PTRS == 0:
+                new_with_finalizer.append(obj)
+                new_with_finalizer.append(fq_nr)
+        self.old_objects_with_finalizers.delete()
+        self.old_objects_with_finalizers = new_with_finalizer
+        #
+        self.frozen_total_size += frozen_size
+        debug_print("frozen size:", frozen_size)
+        debug_print("total frozen size:", self.frozen_total_size)
+        debug_stop("gc-freeze")
+
+    def _freeze_arena_object(self, hdr):
+        size_gc_header = self.gcheaderbuilder.size_gc_header
+        self.header(hdr + size_gc_header).tid |= GCFLAG_NO_HEAP_PTRS
+        return False     # survives
+
+    def _freeze_as_root(self, obj, ignored):
+        hdr = self.header(obj)
+        if hdr.tid & GCFLAG_NO_HEAP_PTRS:
+            hdr.tid &= ~GCFLAG_NO_HEAP_PTRS
+            self.prebuilt_root_objects.append(obj)
+
+    def _remove_frozen_objects(self, oldlist):
+        newlist = self.AddressStack()
+        while oldlist.non_empty():
+            obj = oldlist.pop()
+            if self.header(obj).tid & GCFLAG_NO_HEAP_PTRS == 0:
+                newlist.append(obj)
+        oldlist.delete()
+        return newlist
+
+
     def collect_nonstack_roots(self):
         # Non-stack roots: first, the objects from 'prebuilt_root_objects'
         self.prebuilt_root_objects.foreach(self._collect_obj, None)
@@ -2621,6 +3492,12 @@ class IncrementalMiniMarkGC(MovingGCBase):
         # the next major collection, at which point we want
         # it to look valid (but ready to be freed).
         shadow = shadowhdr + size_gc_header
+        if self.compact_ratio > 0.0:
+            # the address of the shadow is exposed, don't move it later.
+            # Also clear it: compact_arenas() might trace it even if it
+            # is the shadow of an object that died young.
+            self.header(obj).tid |= GCFLAG_NO_COMPACT
+            llmemory.raw_memclear(shadowhdr, size_gc_header + size)
         self.header(shadow).tid = self.header(obj).tid
         typeid = self.get_type_id(obj)
         if self.is_varsize(typeid):
@@ -2640,8 +3517,8 @@ class IncrementalMiniMarkGC(MovingGCBase):
     def _find_shadow(self, obj):
         #
         # The object is not a tagged pointer, and it is still in the
-        # nursery.  Find or allocate a "shadow" object, which is
-        # where the object will be moved by the next minor
+        # nursery or the aging space.  Find or allocate a "shadow" object,
+        # which is where the object will be moved by the next minor
         # collection
         if self.header(obj).tid & GCFLAG_HAS_SHADOW:
             shadow = self.nursery_objects_shadows.get(obj)
@@ -2660,7 +3537,7 @@ class IncrementalMiniMarkGC(MovingGCBase):
         """
         obj = llmemory.cast_ptr_to_adr(gcobj)
         if self.is_valid_gc_object(obj):
-            if self.is_in_nursery(obj):
+            if self.can_move(obj):
                 obj = self._find_shadow(obj)
         return llmemory.cast_adr_to_int(obj)
     id_or_identityhash._always_inline_ = True
@@ -2679,13 +3556,19 @@ class IncrementalMiniMarkGC(MovingGCBase):
         anything fancy and *just* call them. Among other things
         they won't resurrect objects
         """
+        aging_objects = self.AddressStack()
         while self.young_objects_with_destructors.non_empty():
             obj = self.young_objects_with_destructors.pop()
             if not self.is_forwarded(obj):
                 self.call_destructor(obj)
             else:
                 obj = self.get_forwarding_address(obj)
-                self.old_objects_with_destructors.append(obj)
+                if self.is_in_aging(obj):
+                    aging_objects.append(obj)
+                else:
+                    self.old_objects_with_destructors.append(obj)
+        self.young_objects_with_destructors.delete()
+        self.young_objects_with_destructors = aging_objects
 
     def deal_with_old_objects_with_destructors(self):
         """We can reasonably assume that destructors don't do
@@ -2705,6 +3588,7 @@ class IncrementalMiniMarkGC(MovingGCBase):
         self.old_objects_with_destructors = new_objects
 
     def deal_with_young_objects_with_finalizers(self):
+        aging_objects = self.AddressDeque()
         while self.probably_young_objects_with_finalizers.non_empty():
             obj = self.probably_young_objects_with_finalizers.popleft()
             fq_nr = self.probably_young_objects_with_finalizers.popleft()
@@ -2713,8 +3597,14 @@ class IncrementalMiniMarkGC(MovingGCBase):
             self.singleaddr.address[0] = obj
             self._trace_drag_out1(self.singleaddr)
             obj = self.singleaddr.address[0]
-            self.old_objects_with_finalizers.append(obj)
-            self.old_objects_with_finalizers.append(fq_nr)
+            if self.is_in_aging(obj):
+                aging_objects.append(obj)
+                aging_objects.append(fq_nr)
+            else:
+                self.old_objects_with_finalizers.append(obj)
+                self.old_objects_with_finalizers.append(fq_nr)
+        self.probably_young_objects_with_finalizers.delete()
+        self.probably_young_objects_with_finalizers = aging_objects
 
     def deal_with_objects_with_finalizers(self):
         # Walk over list of objects with finalizers.
@@ -2853,14 +3743,20 @@ class IncrementalMiniMarkGC(MovingGCBase):
         # walk over the list of objects that contain weakrefs and are in the
         # nursery.  if the object it references survives then update the
         # weakref; otherwise invalidate the weakref
+        # With the aging space, this list also contains old weakrefs to
+        # objects in the aging space, and weakrefs in the aging space.
+        # They stay in the list as long as one of them is there.
+        aging_weakrefs = self.AddressStack()
         while self.young_objects_with_weakrefs.non_empty():
             obj = self.young_objects_with_weakrefs.pop()
-            if not self.is_forwarded(obj):
-                continue # weakref itself dies
-            obj = self.get_forwarding_address(obj)
+            if self.is_in_nursery(obj) or self.is_in_aging(obj):
+                if not self.is_forwarded(obj):
+                    continue # weakref itself dies
+                obj = self.get_forwarding_address(obj)
             offset = self.weakpointer_offset(self.get_type_id(obj))
             pointing_to = (obj + offset).address[0]
-            if self.is_in_nursery(pointing_to):
+            if (self.is_in_nursery(pointing_to) or
+                    self.is_in_aging(pointing_to)):
                 if self.is_forwarded(pointing_to):
                     (obj + offset).address[0] = self.get_forwarding_address(
                         pointing_to)
@@ -2893,7 +3789,13 @@ class IncrementalMiniMarkGC(MovingGCBase):
                 # the weakref into 'old_objects_with_weakrefs'.
                 continue
             #
+            if self.is_in_aging(obj) or self.is_in_aging(
+                                            (obj + offset).address[0]):
+                aging_weakrefs.append(obj)
+                continue
             self.old_objects_with_weakrefs.append(obj)
+        self.young_objects_with_weakrefs.delete()
+        self.young_objects_with_weakrefs = aging_weakrefs
 
     def invalidate_old_weakrefs(self):
         """Called during a major collection."""
@@ -2965,7 +3867,7 @@ class IncrementalMiniMarkGC(MovingGCBase):
         self._pyobj(pyobject).ob_pypy_link = objint
         #
         lst = self.rrc_p_list_young
-        if self.is_in_nursery(obj):
+        if self.can_move(obj):
             dct = self.rrc_p_dict_nurs
         else:
             dct = self.rrc_p_dict
@@ -2993,7 +3895,7 @@ class IncrementalMiniMarkGC(MovingGCBase):
 
     def rawrefcount_from_obj(self, gcobj):
         obj = llmemory.cast_ptr_to_adr(gcobj)
-        if self.is_in_nursery(obj):
+        if self.can_move(obj):
             dct = self.rrc_p_dict_nurs
         else:
             dct = self.rrc_p_dict
@@ -3048,7 +3950,9 @@ class IncrementalMiniMarkGC(MovingGCBase):
     def _rrc_minor_free(self, pyobject, surviving_list, surviving_dict):
         intobj = self._pyobj(pyobject).ob_pypy_link
         obj = llmemory.cast_int_to_adr(intobj)
-        if self.is_in_nursery(obj):
+        if self.can_move(obj):
+            # (objects in the aging space only show up here in the first
+            # minor collection after rawrefcount_init())
             if self.is_forwarded(obj):
                 # Common case: survives and moves
                 obj = self.get_forwarding_address(obj)
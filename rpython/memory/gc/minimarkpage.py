@@ -1,7 +1,7 @@
 import sys
 from rpython.rtyper.lltypesystem import lltype, llmemory, llarena, rffi
 from rpython.rlib.rarithmetic import LONG_BIT, r_uint
-from rpython.rlib.objectmodel import we_are_translated
+from rpython.rlib.objectmodel import we_are_translated, specialize
 from rpython.rlib.debug import ll_assert, fatalerror
 
 WORD = LONG_BIT // 8
@@ -18,8 +18,11 @@ assert 1 << WORD_POWER_2 == WORD
 
 ARENA_PTR = lltype.Ptr(lltype.ForwardReference())
 ARENA = lltype.Struct('ArenaReference',
-    # -- The address of the arena, as returned by malloc()
+    # -- The address of the arena, as returned by malloc(), or inside
+    #    a chunk returned by arena_mmap() (see use_huge_pages())
     ('base', llmemory.Address),
+    # -- True if the arena is part of such a chunk
+    ('in_chunk', lltype.Bool),
     # -- The number of free and the total number of pages in the arena
     ('nfreepages', lltype.Signed),
     ('totalpages', lltype.Signed),
@@ -34,7 +37,10 @@ ARENA_NULL = lltype.nullptr(ARENA)
 # The idea is that when we need a free page, we take it from the arena
 # which currently has the *lowest* number of free pages.  This allows
 # arenas with a lot of free pages to eventually become entirely free, at
-# which point they are returned to the OS.  If an arena has a total of
+# which point they are returned to the OS.  (With huge pages, arenas are
+# cut out of bigger chunks of memory; then only the memory of an empty
+# arena is returned to the OS, and its address range is reused for the
+# next arena.)  If an arena has a total of
 # 64 pages, then we have 64 global lists, arenas_lists[0] to
 # arenas_lists[63], such that arenas_lists[i] contains exactly those
 # arenas that have 'nfreepages == i'.  We allocate pages out of the
@@ -85,6 +91,12 @@ PAGE_NULL = lltype.nullptr(PAGE_HEADER)
 # ----------
 
 
+# number of pages freed by sweep_for_malloc() at once, and in total between
+# two steps of mass_free_incremental(), i.e. during one minor collection
+SWEEP_FOR_MALLOC_PAGES = 4
+SWEEP_FOR_MALLOC_BUDGET = 32
+
+
 class ArenaCollection(object):
     _alloc_flavor_ = "raw"
 
@@ -104,6 +116,8 @@ class ArenaCollection(object):
         self.full_page_for_size     = self._new_page_ptr_list(length)
         self.old_page_for_size      = self._new_page_ptr_list(length)
         self.old_full_page_for_size = self._new_page_ptr_list(length)
+        # the pages detached by compact_prepare()
+        self.compact_page_for_size  = self._new_page_ptr_list(length)
         self.nblocks_for_size = lltype.malloc(rffi.CArray(lltype.Signed),
                                               length, flavor='raw',
                                               immortal=True)
@@ -137,9 +151,31 @@ class ArenaCollection(object):
         # part of current_arena might still contain uninitialized pages
         self.num_uninitialized_pages = 0
         #
+        # the number of arenas currently allocated
+        self.num_arenas = 0
+        #
+        # the number of pages forgotten by freeze_pages()
+        self.num_frozen_pages = 0
+        #
+        # with huge pages: the part of the last chunk not used so far,
+        # and a chained list of the empty arenas that were given back
+        # to the OS (see use_huge_pages())
+        self.huge_pages = False
+        self.chunk_size = 0
+        self.chunk_free = NULL
+        self.chunk_end = NULL
+        self.released_arenas = ARENA_NULL
+        #
         # the total memory used, counting every block in use, without
         # the additional bookkeeping stuff.
         self.total_memory_used = r_uint(0)
+        #
+        # during an incremental mass_free, the size classes above this
+        # one have already been fully processed
+        self.size_class_with_old_pages = -1
+        # the number of pages that sweep_for_malloc() may still process
+        # before the next call to mass_free_incremental()
+        self.sweep_for_malloc_budget = 0
 
 
     def _new_page_ptr_list(self, length):
@@ -292,9 +328,17 @@ class ArenaCollection(object):
         #
         # 'arena_base' points to the start of malloced memory; it might not
         # be a page-aligned address
-        arena_base = llarena.arena_malloc(self.arena_size, False)
-        if not arena_base:
-            out_of_memory("out of memory: couldn't allocate the next arena")
+        if self.huge_pages:
+            arena = self._allocate_arena_in_chunk()
+            arena_base = arena.base
+        else:
+            arena_base = llarena.arena_malloc(self.arena_size, False)
+            if not arena_base:
+                out_of_memory("out of memory: couldn't allocate the next "
+                              "arena")
+            arena = lltype.malloc(ARENA, flavor='raw', track_allocation=False)
+            arena.base = arena_base
+            arena.in_chunk = False
         arena_end = arena_base + self.arena_size
         #
         # 'firstpage' points to the first unused page
@@ -303,17 +347,51 @@ class ArenaCollection(object):
         # 'npages' is the number of full pages just allocated
         npages = (arena_end - firstpage) // self.page_size
         #
-        # Allocate an ARENA object and initialize it
-        arena = lltype.malloc(ARENA, flavor='raw', track_allocation=False)
-        arena.base = arena_base
+        # Initialize the ARENA object
         arena.nfreepages = 0        # they are all uninitialized pages
         arena.totalpages = npages
         arena.freepages = firstpage
         self.num_uninitialized_pages = npages
         self.current_arena = arena
+        self.num_arenas += 1
         #
     allocate_new_arena._dont_inline_ = True
 
+    def _allocate_arena_in_chunk(self):
+        # Reuse the address range of an arena given back to the OS, or
+        # else take the next one in the current chunk, or else get a
+        # new chunk.  Returns an ARENA object with only 'base' and
+        # 'in_chunk' initialized.
+        arena = self.released_arenas
+        if arena != ARENA_NULL:
+            self.released_arenas = arena.nextarena
+            return arena
+        if self.chunk_free == self.chunk_end:
+            chunk = llarena.arena_mmap(self.chunk_size)
+            if not chunk:
+                out_of_memory("out of memory: couldn't allocate the next "
+                              "arena")
+            self.chunk_free = chunk
+            self.chunk_end = chunk + self.chunk_size
+        arena = lltype.malloc(ARENA, flavor='raw', track_allocation=False)
+        arena.base = self.chunk_free
+        arena.in_chunk = True
+        self.chunk_free += self.arena_size
+        return arena
+
+    def use_huge_pages(self):
+        """From now on, cut the new arenas out of chunks of at least
+        HUGEPAGE_SIZE bytes, allocated with llarena.arena_mmap(): they
+        are aligned and backed by transparent huge pages if the OS
+        supports it, which reduces the TLB misses.  Arenas that become
+        empty are not freed but given back to the OS with MADV_FREE,
+        and their address range is kept for the next arenas.
+        """
+        self.huge_pages = True
+        arenas_per_chunk = ((llarena.HUGEPAGE_SIZE + self.arena_size - 1) //
+                            self.arena_size)
+        self.chunk_size = arenas_per_chunk * self.arena_size
+
 
     def mass_free_prepare(self):
         """Prepare calls to mass_free_incremental(): moves the chained lists
@@ -323,6 +401,7 @@ class ArenaCollection(object):
         #
         size_class = self.small_request_threshold >> WORD_POWER_2
         self.size_class_with_old_pages = size_class
+        self.sweep_for_malloc_budget = SWEEP_FOR_MALLOC_BUDGET
         #
         while size_class >= 1:
             self.old_page_for_size[size_class]      = (
@@ -334,12 +413,14 @@ class ArenaCollection(object):
             size_class -= 1
 
 
+    @specialize.arg(1)
     def mass_free_incremental(self, ok_to_free_func, max_pages):
         """For each object, if ok_to_free_func(obj) returns True, then free
         the object.  This returns True if complete, or False if the limit
         'max_pages' is reached.
         """
         size_class = self.size_class_with_old_pages
+        self.sweep_for_malloc_budget = SWEEP_FOR_MALLOC_BUDGET
         #
         while size_class >= 1:
             #
@@ -364,6 +445,30 @@ class ArenaCollection(object):
         return True
 
 
+    @specialize.arg(2)
+    def sweep_for_malloc(self, size, ok_to_free_func):
+        """Called between the calls to mass_free_incremental(), before
+        malloc(size).  If there is no page with free blocks for this size,
+        first try to free objects in a few of the pages not processed so
+        far, so that malloc() can reuse them instead of taking a new page.
+        This does part of the work of mass_free_incremental() in advance,
+        while the pages are needed anyway.  At most SWEEP_FOR_MALLOC_BUDGET
+        pages are processed this way between two calls to
+        mass_free_incremental(), so that a single minor collection cannot
+        do a large part of the sweeping.
+        """
+        size_class = llmemory.raw_malloc_usage(size) >> WORD_POWER_2
+        if (self.page_for_size[size_class] == PAGE_NULL and
+                size_class <= self.size_class_with_old_pages and
+                self.sweep_for_malloc_budget > 0):
+            max_pages = min(SWEEP_FOR_MALLOC_PAGES,
+                            self.sweep_for_malloc_budget)
+            pages_left = self.mass_free_in_pages(size_class, ok_to_free_func,
+                                                 max_pages)
+            self.sweep_for_malloc_budget -= max_pages - pages_left
+
+
+    @specialize.arg(1)
     def mass_free(self, ok_to_free_func):
         """For each object, if ok_to_free_func(obj) returns True, then free
         the object.
@@ -396,8 +501,15 @@ class ArenaCollection(object):
                     #
                     # The whole arena is empty.  Free it.
                     llarena.arena_reset(arena.base, self.arena_size, 4)
-                    llarena.arena_free(arena.base)
-                    lltype.free(arena, flavor='raw', track_allocation=False)
+                    if arena.in_chunk:
+                        # keep its address range for the next arenas
+                        arena.nextarena = self.released_arenas
+                        self.released_arenas = arena
+                    else:
+                        llarena.arena_free(arena.base)
+                        lltype.free(arena, flavor='raw',
+                                    track_allocation=False)
+                    self.num_arenas -= 1
                     #
                 else:
                     # Insert 'arena' in the correct arenas_lists[n]
@@ -413,6 +525,7 @@ class ArenaCollection(object):
         self.min_empty_nfreepages = 1
 
 
+    @specialize.arg(2)
     def mass_free_in_pages(self, size_class, ok_to_free_func, max_pages):
         nblocks = self.nblocks_for_size[size_class]
         block_size = size_class * WORD
@@ -492,6 +605,7 @@ class ArenaCollection(object):
         arena.freepages = pageaddr
 
 
+    @specialize.arg(3)
     def walk_page(self, page, block_size, ok_to_free_func):
         """Walk over all objects in a page, and ask ok_to_free_func()."""
         #
@@ -556,6 +670,137 @@ class ArenaCollection(object):
         return surviving
 
 
+    def compact_prepare(self):
+        """Prepare the compaction of the sparsely used pages: for each
+        size class, moves the non-full pages that are at most 1/4 used
+        out of 'page_for_size' into 'compact_page_for_size', but keeps
+        one of them if there is no other non-full page.  Returns the
+        number of pages moved.  The caller then uses compact_walk()
+        to copy the objects of these pages into blocks from malloc(),
+        and compact_finish() to free the blocks copied.
+        """
+        npages = 0
+        size_class = self.small_request_threshold >> WORD_POWER_2
+        while size_class >= 1:
+            nblocks = self.nblocks_for_size[size_class]
+            remaining_pages = PAGE_NULL
+            compact_pages = PAGE_NULL
+            page = self.page_for_size[size_class]
+            while page != PAGE_NULL:
+                nextpage = page.nextpage
+                nused = self._nused(page, size_class)
+                if nused * 4 <= nblocks:
+                    page.nextpage = compact_pages
+                    compact_pages = page
+                    npages += 1
+                    self.total_memory_used -= r_uint(nused * size_class * WORD)
+                else:
+                    page.nextpage = remaining_pages
+                    remaining_pages = page
+                page = nextpage
+            #
+            if remaining_pages == PAGE_NULL and compact_pages != PAGE_NULL:
+                # keep one page, to copy the objects of the others into it
+                page = compact_pages
+                compact_pages = page.nextpage
+                page.nextpage = PAGE_NULL
+                remaining_pages = page
+                npages -= 1
+                nused = self._nused(page, size_class)
+                self.total_memory_used += r_uint(nused * size_class * WORD)
+            #
+            self.page_for_size[size_class] = remaining_pages
+            self.compact_page_for_size[size_class] = compact_pages
+            size_class -= 1
+        return npages
+
+
+    @specialize.arg(1)
+    def compact_walk(self, callback):
+        """Call callback(obj) for each object in the pages moved by
+        compact_prepare().  The callback must return False.
+        """
+        size_class = self.small_request_threshold >> WORD_POWER_2
+        while size_class >= 1:
+            block_size = size_class * WORD
+            page = self.compact_page_for_size[size_class]
+            while page != PAGE_NULL:
+                surviving = self.walk_page(page, block_size, callback)
+                # walk_page() counted these objects again
+                self.total_memory_used -= r_uint(surviving * block_size)
+                page = page.nextpage
+            size_class -= 1
+
+
+    @specialize.arg(1)
+    def compact_finish(self, ok_to_free_func):
+        """For each object in the pages moved by compact_prepare(), if
+        ok_to_free_func(obj) returns True, then free the object.  Pages
+        completely freed are freed, and so are the arenas that become
+        empty; the other pages are put back in 'page_for_size'.
+        """
+        size_class = self.small_request_threshold >> WORD_POWER_2
+        while size_class >= 1:
+            block_size = size_class * WORD
+            page = self.compact_page_for_size[size_class]
+            self.compact_page_for_size[size_class] = PAGE_NULL
+            while page != PAGE_NULL:
+                surviving = self.walk_page(page, block_size, ok_to_free_func)
+                nextpage = page.nextpage
+                if surviving > 0:
+                    page.nextpage = self.page_for_size[size_class]
+                    self.page_for_size[size_class] = page
+                else:
+                    self.free_page(page)
+                page = nextpage
+            size_class -= 1
+        #
+        self._rehash_arenas_lists()
+
+
+    def freeze_pages(self):
+        """Forget all the pages currently in use.  Their objects are never
+        freed, and the pages are never walked again, so that they are not
+        written to any more.  Returns the total size of these objects.
+        """
+        ll_assert(self.size_class_with_old_pages < 0,
+                  "freeze_pages() during an incremental mass_free")
+        size_class = self.small_request_threshold >> WORD_POWER_2
+        while size_class >= 1:
+            self.num_frozen_pages += self._count_pages(
+                self.page_for_size[size_class])
+            self.num_frozen_pages += self._count_pages(
+                self.full_page_for_size[size_class])
+            self.page_for_size[size_class] = PAGE_NULL
+            self.full_page_for_size[size_class] = PAGE_NULL
+            size_class -= 1
+        #
+        frozen_size = self.total_memory_used
+        self.total_memory_used = r_uint(0)
+        return frozen_size
+
+
+    def _count_pages(self, page):
+        count = 0
+        while page != PAGE_NULL:
+            count += 1
+            page = page.nextpage
+        return count
+
+
+    def _nused(self, page, size_class):
+        # the number of allocated blocks in a non-full page
+        freeblock = page.freeblock
+        i = page.nfree
+        while i > 0:
+            freeblock = freeblock.address[0]
+            i -= 1
+        pageaddr = llarena.getfakearenaaddress(llmemory.cast_ptr_to_adr(page))
+        num_initialized_blocks = ((freeblock - pageaddr - self.hdrsize) //
+                                  (size_class * WORD))
+        return num_initialized_blocks - page.nfree
+
+
     def _nuninitialized(self, page, size_class):
         # Helper for debugging: count the number of uninitialized blocks
         freeblock = page.freeblock
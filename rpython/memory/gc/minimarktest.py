@@ -20,6 +20,8 @@ class SimpleArenaCollection(object):
         self.small_request_threshold = small_request_threshold
         self.all_objects = []
         self.total_memory_used = 0
+        self.num_arenas = 0
+        self.num_frozen_pages = 0
 
     def malloc(self, size):
         nsize = raw_malloc_usage(size)
@@ -52,6 +54,21 @@ class SimpleArenaCollection(object):
                 return False
         return True
 
+    def sweep_for_malloc(self, size, ok_to_free_func):
+        pass
+
+    def use_huge_pages(self):
+        pass
+
+    def compact_prepare(self):
+        return 0     # the objects are never moved
+
+    def freeze_pages(self):
+        frozen_size = self.total_memory_used
+        self.all_objects = []
+        self.total_memory_used = 0
+        return frozen_size
+
     def mass_free(self, ok_to_free_func):
         self.mass_free_prepare()
         res = self.mass_free_incremental(ok_to_free_func, sys.maxint)
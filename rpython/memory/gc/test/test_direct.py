@@ -7,7 +7,7 @@ see as the list of roots (stack and prebuilt objects).
 # XXX VERY INCOMPLETE, low coverage
 
 import py
-from rpython.rtyper.lltypesystem import lltype, llmemory
+from rpython.rtyper.lltypesystem import lltype, llmemory, llarena
 from rpython.memory.gctypelayout import TypeLayoutBuilder, FIN_HANDLER_ARRAY
 from rpython.rlib.rarithmetic import LONG_BIT, is_valid_int
 from rpython.memory.gc import minimark, incminimark
@@ -671,6 +671,136 @@ class TestIncrementalMiniMarkGCSimple(TestMiniMarkGCSimple):
         self.gc.debug_gc_step_until(incminimark.STATE_SCANNING)
         assert self.stackroots[1].x == 13
 
+    def test_max_pause_adapts_step_factor(self):
+        self.gc.max_pause = 0.002
+        clock = [0.0]
+        def read_gc_clock():
+            clock[0] += 0.0025     # every step is 2.5ms long
+            return clock[0]
+        self.gc.read_gc_clock = read_gc_clock
+        for i in range(10):
+            self.stackroots.append(self.malloc(S))
+        self.gc.debug_gc_step_until(incminimark.STATE_MARKING)
+        # the SCANNING step can't be made shorter: it is an overrun
+        assert self.gc.pause_step_factor == 0.5
+        assert self.gc.pause_overruns == 1
+        assert self.gc.scale_pause_step(100) == 50
+        for i in range(10):
+            self.gc.adapt_pause_step_factor(incminimark.STATE_MARKING, 0.005)
+        assert self.gc.pause_step_factor == incminimark.PAUSE_STEP_FACTOR_MIN
+        assert self.gc.pause_overruns == 7
+        assert self.gc.scale_pause_step(10) == 1
+        # fast steps make the factor grow again, up to a bound
+        for i in range(100):
+            self.gc.adapt_pause_step_factor(incminimark.STATE_MARKING, 0.0)
+        assert self.gc.pause_step_factor == incminimark.PAUSE_STEP_FACTOR_MAX
+        assert self.gc.pause_overruns == 7
+        # a marking step raised to what the minor collections make old
+        # is an overrun too, even if the factor could still go down
+        self.gc.pause_step_at_floor = True
+        self.gc.adapt_pause_step_factor(incminimark.STATE_MARKING, 0.005)
+        assert self.gc.pause_overruns == 8
+        self.gc.debug_gc_step_until(incminimark.STATE_SCANNING)
+
+    def test_max_pause_keeps_marking_up_with_the_nursery(self):
+        self.gc.max_pause = 0.002
+        self.gc.pause_step_factor = incminimark.PAUSE_STEP_FACTOR_MIN
+        self.gc.gc_increment_step = 64
+        for i in range(10):
+            self.stackroots.append(self.malloc(S))
+        self.gc.debug_gc_step_until(incminimark.STATE_MARKING)
+        self.gc.nursery_surviving_size = 1000
+        steps = []
+        orig_visit_all_objects_step = self.gc.visit_all_objects_step
+        def visit_all_objects_step(size_to_track):
+            steps.append(size_to_track)
+            return orig_visit_all_objects_step(size_to_track)
+        self.gc.visit_all_objects_step = visit_all_objects_step
+        self.gc.major_collection_step()
+        # not 64 * PAUSE_STEP_FACTOR_MIN == 1
+        assert steps == [2000]
+        assert self.gc.pause_step_at_floor
+        self.gc.debug_gc_step_until(incminimark.STATE_SCANNING)
+
+
+    def test_get_stats_and_event_callback(self):
+        from rpython.rlib import rgc
+        events = []
+        self.gc.set_event_callback(lambda: events.append(
+            self.gc.get_stats(rgc.MINOR_COLLECTIONS)))
+        assert self.gc.get_stats(rgc.MINOR_COLLECTIONS) == 0
+        for i in range(5):
+            self.stackroots.append(self.malloc(S))
+        assert self.gc.get_stats(rgc.NURSERY_USED) > 0
+        self.gc.collect(0)
+        assert self.gc.get_stats(rgc.MINOR_COLLECTIONS) == 1
+        assert self.gc.get_stats(rgc.NURSERY_USED) == 0
+        assert self.gc.get_stats(rgc.MAJOR_STEPS) == 0
+        assert events == [1]
+        self.gc.collect()
+        assert self.gc.get_stats(rgc.MAJOR_STEPS) > 0
+        assert self.gc.get_stats(rgc.MAJOR_COLLECTIONS) == 1
+        assert self.gc.get_stats(rgc.GC_STATE) == incminimark.STATE_SCANNING
+        assert self.gc.get_stats(rgc.MINOR_COLLECTIONS_TIME) >= 0
+        assert (self.gc.get_stats(rgc.TOTAL_MEMORY) ==
+                self.gc.get_stats(rgc.ARENA_MEMORY) +
+                self.gc.get_stats(rgc.RAWMALLOCED_MEMORY) > 0)
+        assert self.gc.get_stats(rgc.NURSERY_SIZE) == self.gc.nursery_size
+        assert self.gc.get_stats(12345) == -1
+        assert len(events) == 2
+
+    def test_get_stats_times(self):
+        from rpython.rlib import rgc
+        clock = [0.0]
+        def read_gc_clock():
+            clock[0] += 0.5        # every collection or step is 500ms long
+            return clock[0]
+        self.gc.read_gc_clock = read_gc_clock
+        for i in range(5):
+            self.stackroots.append(self.malloc(S))
+        self.gc.collect(0)
+        assert self.gc.get_stats(rgc.MINOR_COLLECTIONS_TIME) == 500000
+        self.gc.debug_gc_step_until(incminimark.STATE_MARKING)
+        steps = self.gc.get_stats(rgc.MAJOR_STEPS)
+        assert steps > 0
+        assert self.gc.get_stats(rgc.MAJOR_STEPS_TIME) == 500000 * steps
+        # the major collection is not finished yet
+        assert self.gc.get_stats(rgc.MAJOR_COLLECTIONS_TIME) == 0
+        self.gc.debug_gc_step_until(incminimark.STATE_SCANNING)
+        steps = self.gc.get_stats(rgc.MAJOR_STEPS)
+        assert self.gc.get_stats(rgc.MAJOR_COLLECTIONS) == 1
+        assert self.gc.get_stats(rgc.MAJOR_STEPS_TIME) == 500000 * steps
+        # the FINALIZING step, which runs the finalizers, is not counted
+        assert self.gc.get_stats(rgc.MAJOR_COLLECTIONS_TIME) == (
+            500000 * (steps - 1))
+
+    def test_allocation_sampling(self):
+        from rpython.rlib import rgc
+        self.malloc(S)
+        size = self.gc.get_stats(rgc.NURSERY_USED)
+        samples = []
+        self.gc.set_allocation_sampling(2 * size, samples.append)
+        assert self.gc.nursery_top == self.gc.nursery_free + 2 * size
+        for i in range(5):
+            self.malloc(S)
+        assert samples == [size] * 2
+        self.gc.collect(0)
+        self.malloc(S)
+        self.malloc(S)
+        assert samples == [size] * 3
+        # also when the nursery is full
+        for i in range(20):
+            self.malloc(S)
+        assert self.gc.get_stats(rgc.MINOR_COLLECTIONS) > 2
+        assert samples == [size] * 13
+        self.gc.set_allocation_sampling(0, samples.append)
+        assert self.gc.nursery_top == self.gc.nursery + self.gc.nursery_size
+        del samples[:]
+        for i in range(100):
+            self.malloc(S)
+        assert samples == []
+
+
 class TestIncrementalMiniMarkGCFull(DirectGCTest):
     from rpython.memory.gc.incminimark import IncrementalMiniMarkGC as GCClass
     def test_malloc_fixedsize_no_cleanup(self):
@@ -728,6 +858,57 @@ class TestIncrementalMiniMarkGCFull(DirectGCTest):
             assert arr_of_ptr_struct[i].prev == lltype.nullptr(S)
             assert arr_of_ptr_struct[i].next == lltype.nullptr(S)
 
+    def _hdr(self, p):
+        return self.gc.header(llmemory.cast_ptr_to_adr(p))
+
+    def test_freeze(self):
+        array = self.malloc(VAR, 20)
+        self.stackroots.append(array)
+        for i in range(20):
+            p = self.malloc(S)
+            p.x = i
+            self.writearray(array, i, p)
+        self.gc.freeze()
+        array = self.stackroots[0]
+        assert self.gc.ac.total_memory_used == 0
+        assert self.gc.frozen_total_size > 0
+        for i in range(20):
+            assert self._hdr(array[i]).tid & incminimark.GCFLAG_NO_HEAP_PTRS
+        #
+        # the frozen objects are not marked any more, and they stay alive
+        # even when they are no longer reachable
+        p = array[5]
+        self.writearray(array, 5, lltype.nullptr(S))
+        newobj = self.malloc(S)
+        self.stackroots.append(newobj)
+        self.gc.debug_gc_step_until(incminimark.STATE_SWEEPING)
+        newobj = self.stackroots[1]
+        assert self._hdr(newobj).tid & incminimark.GCFLAG_VISITED
+        assert self._hdr(p).tid & incminimark.GCFLAG_VISITED == 0
+        self.gc.debug_gc_step_until(incminimark.STATE_SCANNING)
+        self.gc.collect()
+        assert p.x == 5
+        for i in range(20):
+            if i != 5:
+                assert array[i].x == i
+
+    def test_freeze_then_modify(self):
+        p = self.malloc(S)
+        p.x = 42
+        self.stackroots.append(p)
+        self.gc.freeze()
+        p = self.stackroots[0]
+        assert self._hdr(p).tid & incminimark.GCFLAG_NO_HEAP_PTRS
+        # writing into a frozen object makes it a root, like a prebuilt one
+        newobj = self.malloc(S)
+        newobj.x = 43
+        self.write(p, 'next', newobj)
+        del self.stackroots[:]
+        self.gc.collect()
+        assert self._hdr(p).tid & incminimark.GCFLAG_NO_HEAP_PTRS == 0
+        assert p.x == 42
+        assert p.next.x == 43
+
     #fail for now
     def xxx_test_malloc_array_of_ptr_arr(self):
         ARR_OF_PTR_ARR = lltype.GcArray(lltype.Ptr(lltype.GcArray(lltype.Ptr(S))))
@@ -748,3 +929,201 @@ class TestIncrementalMiniMarkGCFull(DirectGCTest):
                 assert elem.next == lltype.nullptr(S)
 
             
+
+
+class TestIncrementalMiniMarkGCHugePages(TestIncrementalMiniMarkGCFull):
+    GC_PARAMS = {'huge_pages': True}
+
+    def test_arenas_in_chunks(self):
+        p = self.malloc(S)
+        self.stackroots.append(p)
+        self.gc.collect()
+        assert self.gc.ac.huge_pages
+        assert self.gc.ac.current_arena.in_chunk
+        chunk = self.gc.ac.current_arena.base.arena
+        assert chunk.nbytes >= llarena.HUGEPAGE_SIZE
+
+
+class TestIncrementalMiniMarkGCCompact(TestIncrementalMiniMarkGCFull):
+    GC_PARAMS = {'compact_ratio': 1.0,
+                 'page_size': 32*WORD,
+                 'arena_size': 128*WORD}
+
+    def _fragment(self, n):
+        # make 'n' old objects, and keep only one out of 7 of them alive
+        array = self.malloc(VAR, n)
+        self.stackroots.append(array)
+        for i in range(n):
+            p = self.malloc(S)
+            p.x = i
+            self.writearray(array, i, p)
+        self.gc.collect()
+        for i in range(n):
+            if i % 7 != 0:
+                self.writearray(array, i, lltype.nullptr(S))
+        return array
+
+    def test_compact_arenas(self):
+        array = self._fragment(70)
+        for i in range(0, 63, 7):
+            self.write(array[i], 'next', array[i + 7])
+        num_arenas = self.gc.ac.num_arenas
+        self.gc.collect()
+        assert self.gc.num_compacted_objects > 0
+        assert self.gc.ac.num_arenas < num_arenas
+        p = array[0]
+        for i in range(0, 70, 7):
+            assert p == array[i]
+            assert p.x == i
+            p = p.next
+        assert not p
+
+    def test_compact_not_if_address_exposed(self):
+        array = self._fragment(70)
+        gcrefs = [lltype.cast_opaque_ptr(llmemory.GCREF, array[i])
+                  for i in range(0, 70, 7)]
+        ids = [self.gc.id(gcref) for gcref in gcrefs]
+        del gcrefs
+        self.gc.collect()
+        assert self.gc.num_compacted_objects == 0
+        for i in range(0, 70, 7):
+            gcref = lltype.cast_opaque_ptr(llmemory.GCREF, array[i])
+            assert self.gc.id(gcref) == ids[i // 7]
+
+    def test_compact_not_above_ratio(self):
+        self.gc.compact_ratio = 0.01
+        array = self._fragment(70)
+        self.gc.collect()
+        assert self.gc.num_compacted_objects == 0
+        for i in range(0, 70, 7):
+            assert array[i].x == i
+
+
+class TestIncrementalMiniMarkGCNurseryTuning(TestIncrementalMiniMarkGCFull):
+    GC_PARAMS = {'nursery_size': 32*WORD,
+                 'nursery_min_size': 16*WORD,
+                 'nursery_max_size': 128*WORD}
+
+    def test_nursery_grows(self):
+        assert self.gc.nursery_size == 128*WORD
+        assert self.gc.nursery_cur_size == 32*WORD
+        assert self.gc.nursery_top == self.gc.nursery + 32*WORD
+        for i in range(200):
+            self.malloc(S).x = i
+        assert self.gc.nursery_cur_size == 128*WORD
+        assert self.gc.nursery_top <= self.gc.nursery + 128*WORD
+
+    def test_nursery_shrinks(self):
+        for i in range(200):
+            p = self.malloc(S)
+            p.x = i
+            self.stackroots.append(p)
+        assert self.gc.nursery_cur_size == 16*WORD
+        assert self.gc.nursery_top <= self.gc.nursery + 16*WORD
+        for i in range(200):
+            assert self.stackroots[i].x == i
+
+    def test_nursery_not_tuned_by_explicit_collect(self):
+        self.malloc(S)
+        self.gc.collect()
+        assert self.gc.nursery_cur_size == 32*WORD
+
+
+class TestIncrementalMiniMarkGCAging(TestIncrementalMiniMarkGCSimple):
+    from rpython.memory.gc.minimarktest import SimpleArenaCollection
+    GC_PARAMS = {'ArenaCollectionClass': SimpleArenaCollection,
+                 'aging_size': 64*WORD}
+
+    def _adr(self, p):
+        return llmemory.cast_ptr_to_adr(p)
+
+    def test_aging_promotes_after_two_minors(self):
+        p = self.malloc(S)
+        p.x = 42
+        self.stackroots.append(p)
+        self.gc._minor_collection()
+        p = self.stackroots[0]
+        assert self.gc.is_in_aging(self._adr(p))
+        assert self.gc.can_move(self._adr(p))
+        self.gc.debug_check_consistency()
+        self.gc._minor_collection()
+        p = self.stackroots[0]
+        assert not self.gc.can_move(self._adr(p))
+        assert self.gc.header(self._adr(p)).tid & incminimark.GCFLAG_AGE_MASK == 0
+        assert p.x == 42
+        assert self.gc.aging_start == self.gc.aging_end
+
+    def test_aging_minors(self):
+        p = self.malloc(S)
+        self.stackroots.append(p)
+        for i in range(3):
+            self.gc._minor_collection()
+            assert self.gc.is_in_aging(self._adr(self.stackroots[0]))
+        self.gc._minor_collection()
+        assert not self.gc.can_move(self._adr(self.stackroots[0]))
+    test_aging_minors.GC_PARAMS = {'aging_minors': 4}
+
+    def test_aging_objects_die_young(self):
+        p = self.malloc(S)
+        self.stackroots.append(p)
+        self.gc._minor_collection()
+        used = self.gc.get_total_memory_used()
+        self.stackroots.pop()
+        self.gc._minor_collection()
+        assert self.gc.aging_start == self.gc.aging_end
+        assert self.gc.get_total_memory_used() == used
+
+    def test_aging_old_object_pointing_to_aging(self):
+        oldobj = self.malloc(S)
+        self.stackroots.append(oldobj)
+        self.gc._minor_collection()
+        self.gc._minor_collection()
+        oldobj = self.stackroots[0]
+        assert not self.gc.can_move(self._adr(oldobj))
+        newobj = self.malloc(S)
+        newobj.x = 5
+        self.write(oldobj, 'next', newobj)
+        self.gc._minor_collection()
+        # 'oldobj' is traced again by the next minor collection
+        assert self.gc.is_in_aging(self._adr(oldobj.next))
+        oldhdr = self.gc.header(self._adr(oldobj))
+        assert oldhdr.tid & incminimark.GCFLAG_TRACK_YOUNG_PTRS == 0
+        assert oldhdr.tid & incminimark.GCFLAG_AGING_PARENT == 0
+        assert self._adr(oldobj) in self.gc.old_objects_pointing_to_young.tolist()
+        self.gc.debug_check_consistency()
+        self.gc._minor_collection()
+        assert not self.gc.can_move(self._adr(oldobj.next))
+        assert oldobj.next.x == 5
+        assert oldhdr.tid & incminimark.GCFLAG_TRACK_YOUNG_PTRS != 0
+        self.gc.debug_check_consistency()
+
+    def test_aging_space_full(self):
+        for i in range(20):
+            self.stackroots.append(self.malloc(S))
+        self.gc._minor_collection()
+        # the objects that don't fit in the aging space are made old
+        in_aging = [self.gc.is_in_aging(self._adr(p))
+                    for p in self.stackroots]
+        assert True in in_aging and False in in_aging
+        self.gc.debug_check_consistency()
+    test_aging_space_full.GC_PARAMS = {'aging_size': 16*WORD,
+                                       'nursery_size': 128*WORD}
+
+    def test_aging_emptied_by_major_collection(self):
+        for i in range(3):
+            p = self.malloc(S)
+            p.x = i
+            self.stackroots.append(p)
+        self.gc._minor_collection()
+        assert self.gc.aging_start != self.gc.aging_end
+        self.gc.debug_gc_step_until(incminimark.STATE_MARKING)
+        assert self.gc.aging_start == self.gc.aging_end
+        # no aging during the major collection
+        self.stackroots.append(self.malloc(S))
+        self.gc._minor_collection()
+        assert not self.gc.can_move(self._adr(self.stackroots[-1]))
+        self.gc.debug_gc_step_until(incminimark.STATE_SCANNING)
+        assert [p.x for p in self.stackroots[:3]] == [0, 1, 2]
+        self.stackroots.append(self.malloc(S))
+        self.gc._minor_collection()
+        assert self.gc.is_in_aging(self._adr(self.stackroots[-1]))
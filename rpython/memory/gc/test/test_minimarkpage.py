@@ -1,6 +1,6 @@
 import py
 from rpython.memory.gc.minimarkpage import ArenaCollection
-from rpython.memory.gc.minimarkpage import PAGE_HEADER, PAGE_PTR
+from rpython.memory.gc.minimarkpage import PAGE_HEADER, PAGE_PTR, ARENA
 from rpython.memory.gc.minimarkpage import PAGE_NULL, WORD
 from rpython.memory.gc.minimarkpage import _dummy_size
 from rpython.rtyper.lltypesystem import lltype, llmemory, llarena
@@ -340,6 +340,41 @@ def test_mass_free_full_is_partially_emptied():
     assert freepages(ac) == NULL
     assert ac.full_page_for_size[2] == PAGE_NULL
 
+def test_sweep_for_malloc():
+    pagesize = hdrsize + 7*WORD
+    ac = arena_collection_for_test(pagesize, "#", fill_with_objects=2)
+    ac.mass_free_prepare()
+    ok_to_free = OkToFree(ac, 0.5)
+    ac.sweep_for_malloc(2*WORD, ok_to_free)
+    assert ok_to_free.seen == {hdrsize + 0*WORD: False,
+                               hdrsize + 2*WORD: True,
+                               hdrsize + 4*WORD: False}
+    # malloc() reuses the block just freed instead of a new page
+    obj = ac.malloc(2*WORD); chkob(ac, 0, 2*WORD, obj)
+    assert ac.full_page_for_size[2] == getpage(ac, 0)
+    # the page is not processed again
+    assert ac.mass_free_incremental(ok_to_free, 10)
+    assert len(ok_to_free.seen) == 3
+    assert ac.total_memory_used == 3*2*WORD
+
+def test_sweep_for_malloc_budget():
+    pagesize = hdrsize + 7*WORD
+    ac = arena_collection_for_test(pagesize, "#" * 12, fill_with_objects=2)
+    ac.mass_free_prepare()
+    ac.sweep_for_malloc_budget = 6
+    ok_to_free = OkToFree(ac, False)
+    ac.sweep_for_malloc(2*WORD, ok_to_free)
+    assert len(ok_to_free.seen) == 4 * 3
+    ac.sweep_for_malloc(2*WORD, ok_to_free)
+    assert len(ok_to_free.seen) == 6 * 3
+    # the budget is exhausted until the next step of mass_free_incremental()
+    ac.sweep_for_malloc(2*WORD, ok_to_free)
+    assert len(ok_to_free.seen) == 6 * 3
+    assert not ac.mass_free_incremental(ok_to_free, 1)
+    assert len(ok_to_free.seen) == 7 * 3
+    ac.sweep_for_malloc(2*WORD, ok_to_free)
+    assert len(ok_to_free.seen) == 11 * 3
+
 def test_mass_free_half_page_remains():
     pagesize = hdrsize + 24*WORD
     ac = arena_collection_for_test(pagesize, "/", fill_with_objects=2)
@@ -477,3 +512,58 @@ def test_random(incremental=False):
 
 def test_random_incremental():
     test_random(incremental=True)
+
+def test_huge_pages():
+    pagesize = hdrsize + 2*WORD
+    ac = ArenaCollection(4*pagesize, pagesize, 2*WORD)
+    ac.use_huge_pages()
+    for i in range(6):      # one object per page, 3 pages per arena
+        ac.malloc(2*WORD)
+    arenas = list(ac._all_arenas())
+    assert len(arenas) == ac.num_arenas == 2
+    assert arenas[0].in_chunk and arenas[1].in_chunk
+    chunk = arenas[0].base.arena
+    assert chunk.nbytes == ac.chunk_size >= llarena.HUGEPAGE_SIZE
+    assert sorted([a.base.offset for a in arenas]) == [0, 4*pagesize]
+    #
+    # the empty arenas are given back, but their address range is kept
+    ac.mass_free(lambda obj: True)
+    assert ac.num_arenas == 0
+    released = ac.released_arenas
+    assert released.nextarena.nextarena == lltype.nullptr(ARENA)
+    assert sorted([released.base.offset,
+                   released.nextarena.base.offset]) == [0, 4*pagesize]
+    assert not chunk.freed
+    chunk_free = ac.chunk_free
+    #
+    # and reused for the next arenas
+    ac.malloc(2*WORD)
+    assert ac.num_arenas == 1
+    assert ac.current_arena == released
+    assert ac.chunk_free == chunk_free
+
+def test_compact():
+    pagesize = hdrsize + 16*WORD
+    ac = ArenaCollection(4*pagesize, pagesize, 2*WORD)
+    objs = [ac.malloc(2*WORD) for i in range(48)]   # 8 objects per page
+    assert ac.num_arenas == 2
+    keep = objs[::8]
+    ac.mass_free(lambda obj: obj not in keep)
+    assert ac.total_memory_used == 6 * 2*WORD
+    #
+    # all 6 pages are 1/8 used; one of them is kept to receive the objects
+    assert ac.compact_prepare() == 5
+    assert ac.total_memory_used == 1 * 2*WORD
+    moved = []
+    def move(obj):
+        moved.append(obj)
+        ac.malloc(2*WORD)
+        return False
+    ac.compact_walk(move)
+    assert len(moved) == 5
+    assert ac.total_memory_used == 6 * 2*WORD
+    #
+    ac.compact_finish(lambda obj: obj in moved)
+    assert ac.num_arenas == 1
+    assert ac.total_memory_used == 6 * 2*WORD
+    assert ac.page_for_size[2].nextpage == PAGE_NULL
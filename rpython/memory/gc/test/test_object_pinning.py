@@ -1035,3 +1035,23 @@ class TestIncminimark(PinningGCTest):
 
         self.gc.DEBUG = 2
         self.gc.minor_collection()
+
+
+class TestIncminimarkNurseryTuning(TestIncminimark):
+    GC_PARAMS = {'nursery_max_size': 128*WORD}
+
+    def test_full_pinned_nursery_pin_fail(self):
+        # the pinned objects don't count as surviving, so instead of
+        # failing, the next malloc() makes the nursery grow
+        typeid = self.get_type_id(T)
+        size = self.gc.fixed_size(typeid) + self.gc.gcheaderbuilder.size_gc_header
+        raw_size = llmemory.raw_malloc_usage(size)
+        cur_size = self.gc.nursery_cur_size
+        for instance_nr in xrange(cur_size // raw_size):
+            ptr = self.malloc(T)
+            ptr.someInt = 100 + instance_nr
+            self.stackroots.append(ptr)
+            self.gc.pin(llmemory.cast_ptr_to_adr(ptr))
+        self.malloc(T)
+        assert self.gc.nursery_cur_size > cur_size
+    test_full_pinned_nursery_pin_fail.max_number_of_pinned_objects = 50
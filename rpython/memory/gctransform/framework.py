@@ -465,6 +465,26 @@ class BaseFrameworkGCTransformer(GCTransformer):
                                             annmodel.SomeInteger(nonneg=True)],
                                            annmodel.s_None)
 
+        if hasattr(GCClass, 'get_stats'):
+            self.get_stats_ptr = getfn(GCClass.get_stats.im_func,
+                                       [s_gc, annmodel.SomeInteger()],
+                                       annmodel.SomeInteger())
+            self.set_event_callback_ptr = getfn(
+                GCClass.set_event_callback.im_func,
+                [s_gc, SomePtr(rgc.GC_EVENT_CALLBACK)],
+                annmodel.s_None)
+
+        if hasattr(GCClass, 'freeze'):
+            self.freeze_ptr = getfn(GCClass.freeze.im_func, [s_gc],
+                                    annmodel.s_None)
+
+        if hasattr(GCClass, 'set_allocation_sampling'):
+            self.set_allocation_sampling_ptr = getfn(
+                GCClass.set_allocation_sampling.im_func,
+                [s_gc, annmodel.SomeInteger(),
+                 SomePtr(rgc.ALLOCATION_SAMPLE_CALLBACK)],
+                annmodel.s_None)
+
         if hasattr(GCClass, 'rawrefcount_init'):
             self.rawrefcount_init_ptr = getfn(
                 GCClass.rawrefcount_init,
@@ -1129,6 +1149,40 @@ class BaseFrameworkGCTransformer(GCTransformer):
                                   self.c_const_gc,
                                   v_size])
 
+    def gct_gc_get_stats(self, hop):
+        if not hasattr(self, 'get_stats_ptr'):
+            return GCTransformer.gct_gc_get_stats(self, hop)
+        [v_stat_no] = hop.spaceop.args
+        hop.genop("direct_call",
+                  [self.get_stats_ptr, self.c_const_gc, v_stat_no],
+                  resultvar=hop.spaceop.result)
+
+    def gct_gc_set_event_callback(self, hop):
+        if not hasattr(self, 'set_event_callback_ptr'):
+            return
+        [v_callback] = hop.spaceop.args
+        hop.genop("direct_call",
+                  [self.set_event_callback_ptr, self.c_const_gc, v_callback])
+
+    def gct_gc_set_allocation_sampling(self, hop):
+        if not hasattr(self, 'set_allocation_sampling_ptr'):
+            return
+        v_interval, v_callback = hop.spaceop.args
+        hop.genop("direct_call",
+                  [self.set_allocation_sampling_ptr, self.c_const_gc,
+                   v_interval, v_callback])
+
+    def gct_gc_freeze(self, hop):
+        livevars = self.push_roots(hop)
+        if hasattr(self, 'freeze_ptr'):
+            hop.genop("direct_call", [self.freeze_ptr, self.c_const_gc])
+        else:
+            # at least do the full collection that freeze() starts with
+            v_gen = rmodel.inputconst(lltype.Signed, 9)
+            hop.genop("direct_call", [self.collect_ptr, self.c_const_gc,
+                                      v_gen])
+        self.pop_roots(hop, livevars)
+
     def gct_gc_pin(self, hop):
         if not hasattr(self, 'pin_ptr'):
             c_false = rmodel.inputconst(lltype.Bool, False)
@@ -373,6 +373,21 @@ class BaseGCTransformer(object):
                   [rmodel.inputconst(lltype.Bool, False)],
                   resultvar=op.result)
 
+    def gct_gc_get_stats(self, hop):
+        op = hop.spaceop
+        hop.genop("same_as",
+                  [rmodel.inputconst(lltype.Signed, -1)],
+                  resultvar=op.result)
+
+    def gct_gc_set_event_callback(self, hop):
+        pass
+
+    def gct_gc_set_allocation_sampling(self, hop):
+        pass
+
+    def gct_gc_freeze(self, hop):
+        pass
+
     def gct_gc_identityhash(self, hop):
         # must be implemented in the various GCs
         raise NotImplementedError
@@ -0,0 +1,4 @@
+from rpython.memory.test import test_incminimark_gc
+
+class TestIncrementalMiniMarkGCAging(test_incminimark_gc.TestIncrementalMiniMarkGC):
+    GC_PARAMS = {'aging_size': 2048}
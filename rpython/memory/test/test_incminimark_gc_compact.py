@@ -0,0 +1,4 @@
+from rpython.memory.test import test_incminimark_gc
+
+class TestIncrementalMiniMarkGCCompact(test_incminimark_gc.TestIncrementalMiniMarkGC):
+    GC_PARAMS = {'compact_ratio': 1.0}
@@ -0,0 +1,6 @@
+from rpython.memory.test import test_incminimark_gc
+from rpython.memory.gc.incminimark import WORD
+
+class TestIncrementalMiniMarkGCNurseryTuning(
+        test_incminimark_gc.TestIncrementalMiniMarkGC):
+    GC_PARAMS = {'nursery_max_size': 256*WORD}
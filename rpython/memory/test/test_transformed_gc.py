@@ -1438,6 +1438,61 @@ class TestIncrementalMiniMarkGC(TestMiniMarkGC):
         res = run([])
         assert res
 
+    def define_gc_stats_and_events(cls):
+        from rpython.rtyper.annlowlevel import llhelper
+        S = lltype.GcStruct('S', ('x', lltype.Signed))
+        class State:
+            pass
+        state = State()
+        def callback():
+            state.events += 1
+        def f():
+            state.events = 0
+            rgc.set_gc_event_callback(llhelper(rgc.GC_EVENT_CALLBACK,
+                                               callback))
+            minor = rgc.get_stats(rgc.MINOR_COLLECTIONS)
+            for i in range(100):
+                lltype.malloc(S).x = i
+            rgc.collect()
+            res = (rgc.get_stats(rgc.MINOR_COLLECTIONS) - minor > 1 and
+                   rgc.get_stats(rgc.MAJOR_COLLECTIONS) >= 1 and
+                   rgc.get_stats(rgc.ARENA_ALLOCATED) > 0 and
+                   rgc.get_stats(rgc.NURSERY_SIZE) == 32*WORD and
+                   state.events > 1)
+            return res
+        return f
+
+    def test_gc_stats_and_events(self):
+        run = self.runner("gc_stats_and_events")
+        res = run([])
+        assert res
+
+    def define_freeze(cls):
+        S = lltype.GcStruct('S', ('x', lltype.Signed))
+        A = lltype.GcArray(lltype.Ptr(S))
+        def f():
+            a = lltype.malloc(A, 10)
+            for i in range(10):
+                a[i] = lltype.malloc(S)
+                a[i].x = i
+            rgc.freeze()
+            total = 0
+            for i in range(10):
+                lltype.malloc(S)
+                s = lltype.malloc(S)
+                s.x = 100
+                a[i] = s         # write into a frozen object
+                rgc.collect()
+            for i in range(10):
+                total += a[i].x
+            return total
+        return f
+
+    def test_freeze(self):
+        run = self.runner("freeze")
+        res = run([])
+        assert res == 1000
+
 # ________________________________________________________________
 # tagged pointers
 
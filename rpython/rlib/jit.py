@@ -561,6 +561,21 @@ PARAMETER_DOCS = {
     'vec_cost': 'threshold for which traces to bail. Unpacking increases the counter,'\
                 ' vector operation decrease the cost',
     'vec_all': 'try to vectorize trace loops that occur outside of the numpypy library',
+    'baseline_threshold': 'if non-zero, loops and functions that run this '
+                          'many times are first compiled cheaply, without '
+                          'unrolling, and only recompiled fully once they '
+                          'reach "threshold" (0=disabled)',
+    'max_code_memory': 'maximum number of bytes of machine code kept for '
+                       'loops and bridges; the least recently used loops '
+                       'are freed above that (0=unlimited)',
+    'compile_interval': 'minimum number of milliseconds between the start of '
+                        'two tracings; hot loops keep running in the '
+                        'interpreter meanwhile (0=no limit)',
+    'guard_storm_limit': 'number of guard failures after which a loop whose '
+                         'entries mostly end in the interpreter is traced '
+                         'again from scratch (0=never)',
+    'profile_guards': 'remember the guards of new loops and bridges, to '
+                      'report their failures in the loop profile (1/0)',
 }
 
 PARAMETERS = {'threshold': 1039, # just above 1024, prime
@@ -579,6 +594,11 @@ PARAMETERS = {'threshold': 1039, # just above 1024, prime
               'vec': 0,
               'vec_all': 0,
               'vec_cost': 0,
+              'compile_interval': 0,
+              'baseline_threshold': 0,
+              'max_code_memory': 0,
+              'guard_storm_limit': 0,
+              'profile_guards': 0,
               }
 unroll_parameters = unrolling_iterable(PARAMETERS.items())
 
@@ -1316,6 +1336,7 @@ class Counters(object):
     NVIRTUALS
     NVHOLES
     NVREUSED
+    NRESUME_SHARED
     TOTAL_COMPILED_LOOPS
     TOTAL_COMPILED_BRIDGES
     TOTAL_FREED_LOOPS
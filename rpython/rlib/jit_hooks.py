@@ -4,7 +4,7 @@ from rpython.rlib.objectmodel import specialize
 from rpython.rtyper.annlowlevel import (cast_instance_to_base_ptr,
     cast_base_ptr_to_instance, llstr)
 from rpython.rtyper.extregistry import ExtRegistryEntry
-from rpython.rtyper.lltypesystem import llmemory, lltype
+from rpython.rtyper.lltypesystem import llmemory, lltype, rstr
 from rpython.flowspace.model import Constant
 from rpython.rtyper import rclass
 
@@ -137,6 +137,35 @@ def stats_asmmemmgr_allocated(warmrunnerdesc):
 def stats_asmmemmgr_used(warmrunnerdesc):
     return warmrunnerdesc.metainterp_sd.cpu.asmmemmgr.get_stats()[1]
 
+@register_helper(annmodel.SomeInteger())
+def stats_memmgr_dropped_loops(warmrunnerdesc):
+    return warmrunnerdesc.memory_manager.dropped_loops
+
+@register_helper(annmodel.SomeInteger())
+def stats_memmgr_dropped_bytes(warmrunnerdesc):
+    return warmrunnerdesc.memory_manager.dropped_bytes
+
+LOOP_PROFILE_CONTAINER = lltype.GcArray(lltype.Struct('elem',
+                                      ('type', lltype.Char),
+                                      ('number', lltype.Signed),
+                                      ('bridge_no', lltype.Signed),
+                                      ('entries', lltype.Signed),
+                                      ('asmlen', lltype.Signed),
+                                      ('location', lltype.Ptr(rstr.STR))))
+
+GUARD_PROFILE_CONTAINER = lltype.GcArray(lltype.Struct('elem',
+                                       ('index', lltype.Signed),
+                                       ('hash', lltype.Unsigned),
+                                       ('failures', lltype.Signed)))
+
+@register_helper(lltype.Ptr(LOOP_PROFILE_CONTAINER))
+def stats_get_loop_profile(warmrunnerdesc):
+    return warmrunnerdesc.memory_manager.get_loop_profile()
+
+@register_helper(lltype.Ptr(GUARD_PROFILE_CONTAINER))
+def stats_get_guard_profile(warmrunnerdesc):
+    return warmrunnerdesc.memory_manager.get_guard_profile()
+
 # ---------------------- jitcell interface ----------------------
 
 def _new_hook(name, resulttype):
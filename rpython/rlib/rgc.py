@@ -143,7 +143,8 @@ def can_move(p):
     With some moving GCs like the SemiSpace GC, it is always True.
     With other moving GCs like the MiniMark GC, it can be True for some
     time, then False for the same object, when we are sure that it won't
-    move any more.
+    move any more.  If it returns False, the object will not move in the
+    future either, even if the GC compacts the old generation.
     """
     return True
 
@@ -615,6 +616,119 @@ class AddMemoryPressureEntry(ExtRegistryEntry):
         return hop.genop('gc_add_memory_pressure', [v_size],
                          resulttype=lltype.Void)
 
+# ____________________________________________________________
+# GC statistics and events
+
+# Numbers for get_stats().  Sizes are in bytes and times in microseconds.
+# The times are totals since the start of the process.  They may wrap
+# around on 32-bit machines: only use the difference between two values.
+(TOTAL_MEMORY,              # arena + rawmalloced memory, nursery excluded
+ ARENA_MEMORY,              # memory used by small objects in the arenas
+ ARENA_ALLOCATED,           # memory of all the arenas, including free space
+ RAWMALLOCED_MEMORY,        # memory used by raw-malloced objects
+ NURSERY_SIZE,
+ NURSERY_USED,
+ PINNED_OBJECTS,            # in the nursery, as of the last minor collection
+ MINOR_COLLECTIONS,
+ MINOR_COLLECTIONS_TIME,
+ MAJOR_STEPS,
+ MAJOR_STEPS_TIME,
+ MAJOR_COLLECTIONS,
+ MAJOR_COLLECTIONS_TIME,    # sum of the steps of the finished collections
+ GC_STATE,                  # GC-specific, e.g. incminimark.STATE_*
+ ) = range(14)
+
+def get_stats(stat_no):
+    """Return one of the statistics listed above, or -1 if the GC
+    doesn't support it."""
+    return -1
+
+class GetStatsEntry(ExtRegistryEntry):
+    _about_ = get_stats
+
+    def compute_result_annotation(self, s_stat_no):
+        from rpython.annotator import model as annmodel
+        return annmodel.SomeInteger()
+
+    def specialize_call(self, hop):
+        [v_stat_no] = hop.inputargs(lltype.Signed)
+        hop.exception_cannot_occur()
+        return hop.genop('gc_get_stats', [v_stat_no], resulttype=lltype.Signed)
+
+GC_EVENT_CALLBACK = lltype.Ptr(lltype.FuncType([], lltype.Void))
+
+def set_gc_event_callback(callback):
+    """Register a GC_EVENT_CALLBACK, called after a minor collection or
+    a major collection step has occurred, once the GC is done.  It is
+    called from the allocation that triggered the collection: it must not
+    do more than e.g. fire an action.  Ignored by GCs that don't support
+    it, and when not translated."""
+    pass
+
+class SetGcEventCallbackEntry(ExtRegistryEntry):
+    _about_ = set_gc_event_callback
+
+    def compute_result_annotation(self, s_callback):
+        from rpython.rtyper.llannotation import SomePtr
+        from rpython.annotator import model as annmodel
+        assert isinstance(s_callback, SomePtr)   # ll-ptr-to-function
+        return annmodel.s_None
+
+    def specialize_call(self, hop):
+        [v_callback] = hop.inputargs(hop.args_r[0])
+        hop.exception_cannot_occur()
+        return hop.genop('gc_set_event_callback', [v_callback],
+                         resulttype=lltype.Void)
+
+ALLOCATION_SAMPLE_CALLBACK = lltype.Ptr(lltype.FuncType([lltype.Signed],
+                                                        lltype.Void))
+
+def set_allocation_sampling(interval, callback):
+    """Ask the GC to call the ALLOCATION_SAMPLE_CALLBACK about once every
+    'interval' bytes allocated in the nursery, with the size of the
+    allocation that crossed the sampling point.  It is called from that
+    allocation, before the object is initialized: it must not allocate
+    GC objects nor raise.  An 'interval' of 0 disables sampling.  Ignored
+    by GCs that don't support it, and when not translated."""
+    pass
+
+class SetAllocationSamplingEntry(ExtRegistryEntry):
+    _about_ = set_allocation_sampling
+
+    def compute_result_annotation(self, s_interval, s_callback):
+        from rpython.rtyper.llannotation import SomePtr
+        from rpython.annotator import model as annmodel
+        assert isinstance(s_callback, SomePtr)   # ll-ptr-to-function
+        return annmodel.s_None
+
+    def specialize_call(self, hop):
+        v_interval, v_callback = hop.inputargs(lltype.Signed,
+                                               hop.args_r[1])
+        hop.exception_cannot_occur()
+        return hop.genop('gc_set_allocation_sampling',
+                         [v_interval, v_callback], resulttype=lltype.Void)
+
+def freeze():
+    """Do a full collection, then make all the objects still alive
+    immortal.  The following major collections don't look at them
+    any more, and so don't write to their memory, unless they are
+    modified.  Meant to be called in a process that is about to fork
+    workers, to keep these objects shared with copy-on-write.  Their
+    finalizers are never called.  GCs that don't support it, and the
+    untranslated version, only do the full collection."""
+    collect()
+
+class FreezeEntry(ExtRegistryEntry):
+    _about_ = freeze
+
+    def compute_result_annotation(self):
+        from rpython.annotator import model as annmodel
+        return annmodel.s_None
+
+    def specialize_call(self, hop):
+        hop.exception_cannot_occur()
+        return hop.genop('gc_freeze', [], resulttype=lltype.Void)
+
 
 @not_rpython
 def get_rpy_memory_usage(gcref):
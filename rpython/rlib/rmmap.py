@@ -77,6 +77,8 @@ if _POSIX:
         rffi_platform.DefinedConstantInteger('MADV_DONTNEED'))
     CConfig.MADV_FREE = (
         rffi_platform.DefinedConstantInteger('MADV_FREE'))
+    CConfig.MADV_HUGEPAGE = (
+        rffi_platform.DefinedConstantInteger('MADV_HUGEPAGE'))
 
 elif _MS_WINDOWS:
     constant_names = ['PAGE_READONLY', 'PAGE_READWRITE', 'PAGE_WRITECOPY',
@@ -805,6 +807,44 @@ if _POSIX:
         def madvise_free(addr, map_size):
             "No madvise() on this platform"
 
+    if has_madvise and MADV_HUGEPAGE is not None:
+        def madvise_hugepage(addr, map_size):
+            c_madvise_safe(rffi.cast(PTR, addr),
+                           rffi.cast(size_t, map_size),
+                           rffi.cast(rffi.INT, MADV_HUGEPAGE))
+    else:
+        def madvise_hugepage(addr, map_size):
+            "No transparent huge pages on this platform"
+
+    def alloc_hugepages(map_size, hugepage_size):
+        """Allocate zero-initialized, non-executable memory for the GC.
+        The result is aligned to 'hugepage_size', a power of two, and
+        we ask the OS to back it with transparent huge pages if it can.
+        Returns NULL if out of memory.
+        """
+        flags = MAP_PRIVATE | MAP_ANONYMOUS
+        prot = PROT_READ | PROT_WRITE
+        if we_are_translated():
+            flags = NonConstant(flags)
+            prot = NonConstant(prot)
+        # over-allocate, and then unmap the unaligned head and tail
+        res = c_mmap_safe(lltype.nullptr(PTR.TO), map_size + hugepage_size,
+                          prot, flags, -1, 0)
+        if res == rffi.cast(PTR, -1):
+            return lltype.nullptr(PTR.TO)
+        start = rffi.cast(lltype.Signed, res)
+        aligned = (start + hugepage_size - 1) & ~(hugepage_size - 1)
+        if aligned > start:
+            c_munmap_safe(res, rffi.cast(size_t, aligned - start))
+        tail = hugepage_size - (aligned - start)
+        if tail > 0:
+            c_munmap_safe(rffi.cast(PTR, aligned + map_size),
+                          rffi.cast(size_t, tail))
+        res = rffi.cast(PTR, aligned)
+        madvise_hugepage(res, map_size)
+        return res
+    alloc_hugepages._annenforceargs_ = (int, int)
+
 elif _MS_WINDOWS:
     def mmap(fileno, length, tagname="", access=_ACCESS_DEFAULT, offset=0):
         # XXX flags is or-ed into access by now.
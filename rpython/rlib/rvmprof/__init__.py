@@ -32,8 +32,10 @@ def get_unique_id(code):
         return code._vmprof_unique_id
     return 0
 
-def enable(fileno, interval, memory=0, native=0, real_time=0):
-    _get_vmprof().enable(fileno, interval, memory, native, real_time)
+def enable(fileno, interval, memory=0, native=0, real_time=0,
+           alloc_interval=0):
+    _get_vmprof().enable(fileno, interval, memory, native, real_time,
+                         alloc_interval)
 
 def disable():
     _get_vmprof().disable()
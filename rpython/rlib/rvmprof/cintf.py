@@ -123,6 +123,12 @@ def setup():
     vmprof_start_sampling = rffi.llexternal("vmprof_start_sampling", [],
                                               lltype.Void, compilation_info=eci,
                                               _nowrapper=True)
+    vmprof_stop_timer = rffi.llexternal("vmprof_stop_timer", [],
+                                        rffi.INT, compilation_info=eci,
+                                        _nowrapper=True)
+    vmprof_sample_stack_now = rffi.llexternal("vmprof_sample_stack_now", [],
+                                              rffi.INT, compilation_info=eci,
+                                              _nowrapper=True)
 
     return CInterface(locals())
 
@@ -4,6 +4,7 @@ from rpython.rlib import jit, rposix, rgc
 from rpython.rlib.rvmprof import cintf
 from rpython.rtyper.annlowlevel import cast_instance_to_gcref
 from rpython.rtyper.annlowlevel import cast_base_ptr_to_instance
+from rpython.rtyper.annlowlevel import llhelper
 from rpython.rtyper.lltypesystem import lltype, llmemory, rffi
 from rpython.rtyper.lltypesystem.lloperation import llop
 from rpython.rlib.rweaklist import RWeakListMixin
@@ -50,6 +51,7 @@ class VMProf(object):
 
     def _cleanup_(self):
         self.is_enabled = False
+        self.alloc_sampling = False
 
     @jit.dont_look_inside
     @specialize.argtype(1)
@@ -124,10 +126,14 @@ class VMProf(object):
         self._gather_all_code_objs = gather_all_code_objs
 
     @jit.dont_look_inside
-    def enable(self, fileno, interval, memory=0, native=0, real_time=0):
+    def enable(self, fileno, interval, memory=0, native=0, real_time=0,
+               alloc_interval=0):
         """Enable vmprof.  Writes go to the given 'fileno'.
         The sampling interval is given by 'interval' as a number of
         seconds, as a float which must be smaller than 1.0.
+        If 'alloc_interval' is positive, the samples are instead taken
+        about every 'alloc_interval' bytes allocated in the nursery, by
+        the GC (only supported by incminimark).
         Raises VMProfError if something goes wrong.
         """
         assert fileno >= 0
@@ -146,6 +152,12 @@ class VMProf(object):
         res = self.cintf.vmprof_enable(memory, native, real_time)
         if res < 0:
             raise VMProfError(os.strerror(rposix.get_saved_errno()))
+        if alloc_interval > 0:
+            # sample the allocations instead of the time
+            self.cintf.vmprof_stop_timer()
+            rgc.set_allocation_sampling(alloc_interval, llhelper(
+                rgc.ALLOCATION_SAMPLE_CALLBACK, _sample_allocation))
+            self.alloc_sampling = True
         self.is_enabled = True
 
     @jit.dont_look_inside
@@ -156,6 +168,10 @@ class VMProf(object):
         if not self.is_enabled:
             raise VMProfError("vmprof is not enabled")
         self.is_enabled = False
+        if self.alloc_sampling:
+            rgc.set_allocation_sampling(0, lltype.nullptr(
+                rgc.ALLOCATION_SAMPLE_CALLBACK.TO))
+            self.alloc_sampling = False
         res = self.cintf.vmprof_disable()
         if res < 0:
             raise VMProfError(os.strerror(rposix.get_saved_errno()))
@@ -230,6 +246,10 @@ def vmprof_execute_code(name, get_code_fn, result_class=None,
 
     return decorate
 
+def _sample_allocation(size):
+    # called by the GC, see rgc.set_allocation_sampling()
+    _get_vmprof().cintf.vmprof_sample_stack_now()
+
 @specialize.memo()
 def _was_registered(CodeClass):
     return hasattr(CodeClass, '_vmprof_unique_id')
@@ -45,3 +45,42 @@ void vmprof_start_sampling(void)
 {
     vmprof_ignore_signals(0);
 }
+
+#ifdef VMPROF_UNIX
+int vmprof_stop_timer(void)
+{
+    return remove_sigprof_timer();
+}
+
+int vmprof_sample_stack_now(void)
+{
+    /* Write a stack trace sample of the current thread now, like the
+       signal handler does.  Used by the allocation sampling. */
+    int commit = 0;
+    long val = vmprof_enter_signal();
+
+    if (val == 0) {
+        int fd = vmp_profile_fileno();
+        struct profbuf_s *p = reserve_buffer(fd);
+        if (p != NULL) {
+            commit = _vmprof_sample_stack(p, NULL, NULL);
+            if (commit)
+                commit_buffer(fd, p);
+            else
+                cancel_buffer(p);
+        }
+    }
+    vmprof_exit_signal();
+    return commit;
+}
+#else
+int vmprof_stop_timer(void)
+{
+    return -1;
+}
+
+int vmprof_sample_stack_now(void)
+{
+    return 0;
+}
+#endif
@@ -93,7 +93,9 @@ int _vmprof_sample_stack(struct profbuf_s *p, PY_THREAD_STATE_T * tstate, uconte
     st->marker = MARKER_STACKTRACE;
     st->count = 1;
 #ifdef RPYTHON_VMPROF
-    depth = get_stack_trace(get_vmprof_stack(), st->stack, MAX_STACK_DEPTH-1, (intptr_t)GetPC(uc));
+    // 'uc' is NULL when not called from the signal handler
+    depth = get_stack_trace(get_vmprof_stack(), st->stack, MAX_STACK_DEPTH-1,
+                            uc != NULL ? (intptr_t)GetPC(uc) : 0);
 #else
     depth = get_stack_trace(tstate, st->stack, MAX_STACK_DEPTH-1, (intptr_t)NULL);
 #endif
@@ -196,3 +196,54 @@ class TestNative(RVMProfSamplingTest):
                     del not_found[i]
                     break
         assert not_found == []
+
+
+class TestAllocationSampling(RVMProfSamplingTest):
+
+    ENTRY_POINT_ARGS = (int, int)
+
+    @pytest.fixture
+    def init(self, tmpdir):
+        self.tmpdir = tmpdir
+        self.tmpfile = tmpdir.join('profile.vmprof')
+        self.tmpfilename = str(self.tmpfile)
+        self.register()
+        self.rpy_entry_point = compile(self.entry_point, self.ENTRY_POINT_ARGS,
+                                       gcpolicy='incminimark')
+
+    @rvmprof.vmprof_execute_code("xcode1", lambda self, code, count: code)
+    def main(self, code, count):
+        lst = []
+        for i in range(count):
+            lst.append([i])
+            if len(lst) > 100:
+                lst = []
+        return len(lst)
+
+    def entry_point(self, count, alloc_interval):
+        code = self.MyCode('py:code:52:test_alloc')
+        rvmprof.register_code(code, self.MyCode.get_name)
+        fd = os.open(self.tmpfilename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC,
+                     0666)
+        rvmprof.enable(fd, self.SAMPLING_INTERVAL,
+                       alloc_interval=alloc_interval)
+        res = self.main(code, count)
+        rvmprof.disable()
+        os.close(fd)
+        return res
+
+    def test(self):
+        assert self.rpy_entry_point(0, 10000) == 0
+        empty_size = self.tmpfile.size()
+        assert self.rpy_entry_point(10**6, 10000) == 100
+        # every list and its items take 48 bytes or more, so there should
+        # be more than 4000 samples of at least 4 words each
+        assert self.tmpfile.size() > empty_size + 4000 * 4 * 8
+        try:
+            from vmprof import read_profile
+        except ImportError:
+            return
+        prof = read_profile(self.tmpfilename)
+        tree = prof.get_tree()
+        assert tree.name == 'py:code:52:test_alloc'
+        assert tree.count > 4000
@@ -500,3 +500,18 @@ def test_compile_alloc_free():
 
     fn = compile(test_alloc_free, [], gcpolicy='boehm')
     fn()
+
+@py.test.mark.skipif("os.name != 'posix'")
+def test_alloc_hugepages():
+    from rpython.rlib.rmmap import alloc_hugepages
+    hugepage_size = 2 * 1024 * 1024
+    map_size = 65536
+    data = alloc_hugepages(map_size, hugepage_size)
+    assert rffi.cast(lltype.Signed, data) & (hugepage_size - 1) == 0
+    for i in range(0, map_size, 171):
+        assert data[i] == '\x00'
+        data[i] = chr(i & 0xff)
+    for i in range(0, map_size, 171):
+        assert data[i] == chr(i & 0xff)
+    madvise_free(data, map_size)
+    free(data, map_size)
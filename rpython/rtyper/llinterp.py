@@ -898,6 +898,18 @@ class LLFrame(object):
     def op_gc_set_max_heap_size(self, maxsize):
         raise NotImplementedError("gc_set_max_heap_size")
 
+    def op_gc_get_stats(self, stat_no):
+        raise NotImplementedError("gc_get_stats")
+
+    def op_gc_set_event_callback(self, callback):
+        raise NotImplementedError("gc_set_event_callback")
+
+    def op_gc_set_allocation_sampling(self, interval, callback):
+        raise NotImplementedError("gc_set_allocation_sampling")
+
+    def op_gc_freeze(self):
+        raise NotImplementedError("gc_freeze")
+
     def op_gc_asmgcroot_static(self, index):
         raise NotImplementedError("gc_asmgcroot_static")
 
@@ -319,6 +319,14 @@ def arena_malloc(nbytes, zero):
     """Allocate and return a new arena, optionally zero-initialized."""
     return Arena(nbytes, zero).getaddr(0)
 
+def arena_mmap(nbytes):
+    """Allocate and return a new arena, aligned to HUGEPAGE_SIZE and
+    backed by transparent huge pages if the OS supports it.  Returns
+    NULL if out of memory.  The arena cannot be released with
+    arena_free(), but arena_reset() with 'zero=4' on parts of it gives
+    the memory back to the OS."""
+    return Arena(nbytes, False).getaddr(0)
+
 def arena_free(arena_addr):
     """Release an arena."""
     assert isinstance(arena_addr, fakearenaaddress)
@@ -400,6 +408,9 @@ from rpython.rtyper.tool.rffi_platform import memory_alignment
 
 MEMORY_ALIGNMENT = memory_alignment()
 
+# the size of a (transparent) huge page, at least on x86-64 Linux
+HUGEPAGE_SIZE = 2 * 1024 * 1024
+
 if os.name == 'posix':
     # The general Posix solution to clear a large range of memory that
     # was obtained with mmap() is to call mmap() again with MAP_FIXED.
@@ -530,6 +541,20 @@ register_external(arena_free, [llmemory.Address], None, 'll_arena.arena_free',
                   llfakeimpl=arena_free,
                   sandboxsafe=True)
 
+if os.name == 'posix':
+    def llimpl_arena_mmap(nbytes):
+        from rpython.rlib import rmmap
+        return rffi.cast(llmemory.Address,
+                         rmmap.alloc_hugepages(nbytes, HUGEPAGE_SIZE))
+else:
+    def llimpl_arena_mmap(nbytes):
+        return llimpl_calloc(nbytes, 1)
+register_external(arena_mmap, [int], llmemory.Address,
+                  'll_arena.arena_mmap',
+                  llimpl=llimpl_arena_mmap,
+                  llfakeimpl=arena_mmap,
+                  sandboxsafe=True)
+
 def llimpl_arena_reset(arena_addr, size, zero):
     if zero:
         if zero == 1:
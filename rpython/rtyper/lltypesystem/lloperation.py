@@ -460,7 +460,13 @@ LL_OPERATIONS = {
     'gc_id':                LLOp(sideeffects=False, canmallocgc=True),
     'gc_obtain_free_space': LLOp(),
     'gc_set_max_heap_size': LLOp(),
-    'gc_can_move'         : LLOp(sideeffects=False),
+    'gc_get_stats': LLOp(),
+    'gc_set_event_callback': LLOp(),
+    'gc_set_allocation_sampling': LLOp(),
+    'gc_freeze':            LLOp(canmallocgc=True),
+    # not 'sideeffects=False': with compaction enabled, incminimark marks
+    # the object as not movable any more, even if the result is unused
+    'gc_can_move'         : LLOp(),
     'gc_thread_run'       : LLOp(),
     'gc_thread_start'     : LLOp(),
     'gc_thread_die'       : LLOp(),
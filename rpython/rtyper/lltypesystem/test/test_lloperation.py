@@ -49,6 +49,21 @@ def test_llop_with_voids_interp():
     res = interpret(llf, [], policy=LowLevelAnnotatorPolicy())
     assert res == 5
 
+def test_gc_can_move_not_removed():
+    # with compaction, incminimark's can_move() has a side effect: the
+    # object stops being movable, even if the result is not used
+    from rpython.rlib import rgc
+    from rpython.rtyper.test.test_llinterp import gengraph
+    class A(object):
+        pass
+    def f():
+        a = A()
+        rgc.can_move(a)
+        return a
+    t, typer, graph = gengraph(f, [], backendopt=True)
+    assert [op for block in graph.iterblocks() for op in block.operations
+               if op.opname == 'gc_can_move']
+
 def test_is_pure():
     from rpython.flowspace.model import Variable, Constant
     assert llop.bool_not.is_pure([Variable()])